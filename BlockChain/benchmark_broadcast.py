@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+from typing import Optional
+from block import Block
+from blockchain import Blockchain
+from network_node import BlockchainNode
+from peer_transport import PeerConnection, encode_frames
+from transaction import Transaction
+
+
+class SimulatedPeers:
+    """Peer servers on their own event loop thread, recording when blocks arrive"""
+
+    def __init__(self, count: int, stalled: int = 0):
+        self.arrivals = []
+        self._lock = threading.Lock()
+        self._stalled = stalled
+        self.loop = asyncio.new_event_loop()
+        self.ports = []
+        self._servers = []
+        self._writers = []
+        self._closing: Optional[asyncio.Event] = None
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(count, ready), daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run(self, count: int, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+
+        async def start():
+            self._closing = asyncio.Event()
+            for position in range(count):
+                handler = self._ignore if position < self._stalled else self._receive
+                server = await asyncio.start_server(handler, '127.0.0.1', 0, backlog=1024)
+                self._servers.append(server)
+                self.ports.append(server.sockets[0].getsockname()[1])
+
+        self.loop.run_until_complete(start())
+        ready.set()
+        self.loop.run_forever()
+
+    async def _receive(self, reader, writer):
+        self._writers.append(writer)
+        connection = PeerConnection(reader, writer)
+        connection.start()
+        async for message in connection:
+            if message.type == 'new_block':
+                await message.read()
+                with self._lock:
+                    self.arrivals.append(time.perf_counter())
+            elif message.type == 'ping':
+                connection.send({'type': 'pong', 'id': message.header['id']})
+        await connection.close()
+
+    async def _ignore(self, reader, writer):
+        # Never reads, like a peer that has hung
+        self._writers.append(writer)
+        await self._closing.wait()
+
+    def wait_for(self, total: int, timeout: float = 60.0) -> float:
+        """Wait until `total` blocks have arrived in all; returns when the last did"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self._lock:
+                if len(self.arrivals) >= total:
+                    return self.arrivals[total - 1]
+            time.sleep(0.0005)
+        raise TimeoutError(f"Only {len(self.arrivals)} of {total} blocks arrived")
+
+    def stop(self):
+        async def shutdown():
+            for server in self._servers:
+                server.close()
+            self._closing.set()
+            for writer in self._writers:
+                writer.transport.abort()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if tasks:
+                await asyncio.wait(tasks, timeout=5)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+def broadcast_with_fresh_connections(ports, block: Block) -> None:
+    """The previous broadcast: a new connection per peer per message, one peer at a time"""
+    data = b"".join(encode_frames({'type': 'new_block'}, block.to_bytes()))
+    for port in ports:
+        with socket.create_connection(('127.0.0.1', port)) as sock:
+            sock.sendall(data)
+
+
+def measure(peers: int, rounds: int, block: Block, pooled: bool, stalled: int) -> float:
+    """Median seconds from broadcast until every live peer has the block"""
+    simulated = SimulatedPeers(peers + stalled, stalled if pooled else 0)
+    live_ports = simulated.ports[stalled:] if not pooled else simulated.ports
+    node = None
+    if pooled:
+        node = BlockchainNode(0, Blockchain(difficulty=1), host='127.0.0.1', send_timeout=2.0)
+        node.start()
+        for port in simulated.ports:
+            node.connect_to_peer('127.0.0.1', port)
+
+    times = []
+    try:
+        for round_number in range(1, rounds + 1):
+            started = time.perf_counter()
+            if pooled:
+                node.broadcast_block(block)
+            else:
+                broadcast_with_fresh_connections(live_ports, block)
+            times.append(simulated.wait_for(round_number * peers) - started)
+    finally:
+        if node is not None:
+            node.stop(timeout=5)
+        simulated.stop()
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark block propagation time against peer count")
+    parser.add_argument("--peers", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--stalled", type=int, default=1,
+                        help="Peers that never read, added to the pooled runs")
+    args = parser.parse_args()
+
+    block = Block(1, [Transaction(f"User{i}", "Bob", 1.0) for i in range(args.transactions)], "0" * 64)
+    print(f"Block of {len(block.to_bytes()):,} bytes; pooled runs include {args.stalled} stalled peer(s)")
+    print(f"{'peers':>6} {'fresh ms':>10} {'pooled ms':>10} {'speed-up':>9}")
+    for peers in args.peers:
+        fresh = measure(peers, args.rounds, block, pooled=False, stalled=0)
+        pooled = measure(peers, args.rounds, block, pooled=True, stalled=args.stalled)
+        print(f"{peers:>6} {fresh * 1000:>10.1f} {pooled * 1000:>10.1f} {fresh / pooled:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
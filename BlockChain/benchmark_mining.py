@@ -0,0 +1,63 @@
+import argparse
+import os
+import time
+from block import Block
+from miner import ParallelMiner
+from transaction import Transaction
+
+
+def build_block(num_transactions: int) -> Block:
+    """Create a block template with some dummy transactions"""
+    transactions = [
+        Transaction(f"User{i}", f"User{i + 1}", 1.0)
+        for i in range(num_transactions)
+    ]
+    return Block(1, transactions, "0" * 64)
+
+
+def measure_hash_rate(workers: int, nonces: int, num_transactions: int) -> float:
+    """Return hashes per second for a fixed nonce range that cannot succeed"""
+    block = build_block(num_transactions)
+    # 64 leading zeros is unreachable, so every nonce in the range is tried
+    with ParallelMiner(workers=workers, chunk_size=max(nonces // (workers * 4), 1),
+                       min_parallel_difficulty=0) as miner:
+        # Warm up the pool so process start-up is not counted
+        miner.search(block._hash_prefix(), 64, start=0, stop=workers)
+
+        start_time = time.perf_counter()
+        miner.search(block._hash_prefix(), 64, start=0, stop=nonces)
+        elapsed = time.perf_counter() - start_time
+
+    return nonces / elapsed
+
+
+def measure_mining_time(workers: int, difficulty: int, num_transactions: int) -> float:
+    """Return the wall-clock time to mine one block at the given difficulty"""
+    block = build_block(num_transactions)
+    with ParallelMiner(workers=workers, min_parallel_difficulty=0) as miner:
+        miner.search(block._hash_prefix(), 64, start=0, stop=workers)
+
+        start_time = time.perf_counter()
+        block.mine_block(difficulty, miner=miner)
+        return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel proof-of-work miner")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--nonces", type=int, default=400_000)
+    parser.add_argument("--transactions", type=int, default=10)
+    parser.add_argument("--difficulty", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'hashes/sec':>14} {'speed-up':>9} {'mine time (s)':>14}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rate = measure_hash_rate(workers, args.nonces, args.transactions)
+        mining_time = measure_mining_time(workers, args.difficulty, args.transactions)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>14,.0f} {rate / baseline:>8.2f}x {mining_time:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
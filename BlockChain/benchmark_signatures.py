@@ -0,0 +1,57 @@
+import argparse
+import os
+import time
+import signatures
+from signatures import KeyPair, SignatureCache, SignatureVerifier
+from transaction import Transaction
+
+
+def build_transactions(count: int, num_keys: int = 16):
+    """Create `count` transactions signed by a handful of keys"""
+    keys = [KeyPair((i + 1).to_bytes(32, "big")) for i in range(num_keys)]
+    transactions = []
+    for i in range(count):
+        key = keys[i % num_keys]
+        transaction = Transaction(key.address, f"User{i}", 1.0)
+        transaction.sign(key)
+        transactions.append(transaction)
+    return transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched transaction signature verification")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--transactions", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    backend = "cryptography" if signatures.HAVE_CRYPTOGRAPHY else "pure Python"
+    print(f"Ed25519 backend: {backend}")
+    transactions = build_transactions(args.transactions)
+
+    print(f"{'workers':>8} {'verified/sec':>14} {'speed-up':>9} {'cached/sec':>14}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        cache = SignatureCache()
+        with SignatureVerifier(workers=workers, cache=cache, batch_size=args.batch_size,
+                               min_parallel=0) as verifier:
+            # Warm up the pool so process start-up is not counted
+            verifier.verify_transactions(transactions[:workers])
+            cache.clear()
+
+            start_time = time.perf_counter()
+            verifier.verify_transactions(transactions)
+            rate = len(transactions) / (time.perf_counter() - start_time)
+
+            # Everything is cached now, as for a block whose transactions were
+            # verified on admission
+            start_time = time.perf_counter()
+            verifier.verify_transactions(transactions)
+            cached_rate = len(transactions) / (time.perf_counter() - start_time)
+
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>14,.0f} {rate / baseline:>8.2f}x {cached_rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
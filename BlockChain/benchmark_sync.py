@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from block import Block
+from blockchain import Blockchain
+from blockchain_db import BlockchainDB
+from network_node import BlockchainNode
+from peer_transport import open_peer_connection
+from serialization import ChainStreamDecoder
+from transaction import COINBASE_SENDER, Transaction
+
+
+def build_chain(db_file: str, blocks: int, difficulty: int, batch: int = 1000) -> Block:
+    """Mine a chain of blocks that each pay a block reward, saved in batches; returns its genesis"""
+    db = BlockchainDB(db_file)
+    genesis = Block(0, [], "0")
+    genesis.mine_block(difficulty)
+    previous, pending = genesis, [genesis]
+    for index in range(1, blocks):
+        block = Block(index, [Transaction(COINBASE_SENDER, f"Miner{index % 10}", 10.0)], previous.hash)
+        block.mine_block(difficulty)
+        pending.append(block)
+        previous = block
+        if len(pending) == batch:
+            db.save_blocks(pending)
+            pending = []
+    db.save_blocks(pending)
+    db.close()
+    return genesis
+
+
+def new_node(db_file: str, genesis: Block, difficulty: int) -> BlockchainNode:
+    """A node on its own database, starting from the shared genesis block"""
+    db = BlockchainDB(db_file)
+    if genesis is not None:
+        db.save_block(genesis)
+    return BlockchainNode(0, Blockchain(difficulty=difficulty, db=db), host='127.0.0.1', ping_interval=3600)
+
+
+async def fetch_whole_chain(port: int) -> list:
+    """The previous catch-up path: ask for the whole chain in one chain_request"""
+    connection = await open_peer_connection('127.0.0.1', port)
+    connection.send({'type': 'chain_request'})
+    response = await connection.read_message()
+    decoder = ChainStreamDecoder()
+    blocks = []
+    async for chunk in response.chunks():
+        blocks.extend(decoder.feed(chunk))
+    await connection.close()
+    return blocks
+
+
+def sync_headers_first(servers, node: BlockchainNode) -> float:
+    started = time.perf_counter()
+    for server in servers:
+        node.connect_to_peer('127.0.0.1', server.port)
+    node.sync()
+    return time.perf_counter() - started
+
+
+def sync_whole_chain(servers, node: BlockchainNode) -> float:
+    started = time.perf_counter()
+    blocks = asyncio.run(fetch_whole_chain(servers[0].port))
+    for block in blocks[1:]:
+        node.blockchain.add_block_from_peer(block)
+    node.blockchain.db.flush()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sync a long chain to a new node headers-first, versus one chain_request"
+    )
+    parser.add_argument("--blocks", type=int, default=100_000)
+    parser.add_argument("--peers", type=int, default=2, help="Nodes serving the chain")
+    parser.add_argument("--difficulty", type=int, default=1)
+    parser.add_argument("--window", type=int, default=250, help="Blocks per getblocks request")
+    parser.add_argument("--baseline", action="store_true",
+                        help="Also time fetching the whole chain in one chain_request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "source.db")
+        started = time.perf_counter()
+        genesis = build_chain(source, args.blocks, args.difficulty)
+        print(f"Built {args.blocks:,} blocks in {time.perf_counter() - started:.1f}s")
+
+        servers = []
+        for position in range(args.peers):
+            db_file = os.path.join(tmpdir, f"server{position}.db")
+            with open(source, "rb") as original, open(db_file, "wb") as copy:
+                copy.write(original.read())
+            servers.append(new_node(db_file, None, args.difficulty))
+        runs = [("headers-first", sync_headers_first)]
+        if args.baseline:
+            runs.append(("chain_request", sync_whole_chain))
+        try:
+            for server in servers:
+                server.start()
+            print(f"{'method':>14} {'seconds':>8} {'blocks/s':>9} {'synced':>7}")
+            for name, sync in runs:
+                node = new_node(os.path.join(tmpdir, f"{name}.db"), genesis, args.difficulty)
+                node.chain_sync.window = args.window
+                node.start()
+                try:
+                    elapsed = sync(servers, node)
+                    synced = node.blockchain.get_latest_block().hash == servers[0].blockchain.get_latest_block().hash
+                finally:
+                    node.stop(timeout=5)
+                print(f"{name:>14} {elapsed:>8.1f} {(args.blocks - 1) / elapsed:>9,.0f} {str(synced):>7}")
+        finally:
+            for server in servers:
+                server.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
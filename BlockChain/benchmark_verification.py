@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+import time
+from blockchain import Blockchain
+from blockchain_db import BlockchainDB
+from chain_verifier import ParallelVerifier
+from security import BlockchainSecurity
+from signatures import KeyPair, default_cache
+from transaction import Transaction
+
+
+def build_chain(num_blocks: int, transactions_per_block: int, db=None) -> Blockchain:
+    """Create a low-difficulty chain of signed dummy transactions"""
+    keys = [KeyPair((j + 1).to_bytes(32, "big")) for j in range(transactions_per_block)]
+    blockchain = Blockchain(difficulty=1, db=db)
+    for i in range(num_blocks):
+        transactions = [Transaction(key.address, f"User{i}", 1.0) for key in keys]
+        for key, transaction in zip(keys, transactions):
+            transaction.sign(key)
+        blockchain.add_block(transactions)
+    return blockchain
+
+
+def run(chain, args) -> None:
+    """Time the serial audit, then the parallel one for each worker count"""
+    # Every run verifies each signature from scratch
+    default_cache.clear()
+    start_time = time.perf_counter()
+    BlockchainSecurity.audit_chain(chain)
+    serial_time = time.perf_counter() - start_time
+    print(f"serial audit_chain: {serial_time:.2f}s")
+
+    print(f"{'workers':>8} {'audit (s)':>10} {'speed-up':>9} {'encode':>8} {'hash':>8} {'linkage':>8} {'report':>8}")
+    for workers in range(1, args.max_workers + 1):
+        # Cleared before the pool forks, so workers start with an empty cache too
+        default_cache.clear()
+        with ParallelVerifier(workers=workers, shard_size=args.shard_size, min_parallel_blocks=0) as verifier:
+            # Warm up the pool so process start-up is not counted. Only the
+            # genesis block is used, so no signature lands in a worker's cache.
+            verifier.audit_chain([chain[0]] * (workers * args.shard_size))
+
+            start_time = time.perf_counter()
+            verifier.audit_chain(chain)
+            elapsed = time.perf_counter() - start_time
+            timings = verifier.timings
+        print(f"{workers:>8} {elapsed:>10.2f} {serial_time / elapsed:>8.2f}x "
+              f"{timings['encode']:>8.2f} {timings['hash']:>8.2f} "
+              f"{timings['linkage']:>8.3f} {timings['report']:>8.3f}")
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel chain verification and audit")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--blocks", type=int, default=2_000)
+    parser.add_argument("--transactions", type=int, default=10)
+    parser.add_argument("--shard-size", type=int, default=100)
+    parser.add_argument("--database", action="store_true",
+                        help="Audit a chain stored in SQLite, as on startup")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = BlockchainDB(os.path.join(tmp_dir, "chain.db")) if args.database else None
+        run(build_chain(args.blocks, args.transactions, db).chain, args)
+        if db is not None:
+            db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import time
+from block import Block
+from blockchain import Blockchain
+from security import BlockchainSecurity
+from signatures import KeyPair
+from transaction import Transaction
+
+TRANSACTIONS_PER_BLOCK = 1000
+
+
+def build_history(blockchain: Blockchain, num_transactions: int) -> None:
+    """Append unmined blocks holding num_transactions historical transactions"""
+    for start in range(0, num_transactions, TRANSACTIONS_PER_BLOCK):
+        transactions = [
+            Transaction(f"User{i % 1000}", f"User{(i + 1) % 1000}", 1.0)
+            for i in range(start, min(start + TRANSACTIONS_PER_BLOCK, num_transactions))
+        ]
+        block = Block(len(blockchain.chain), transactions, blockchain.get_latest_block().hash)
+        blockchain.chain.append(block)
+        blockchain.ledger.apply_block(block)
+
+
+def measure(check, transactions, min_seconds: float = 0.5) -> float:
+    """Return checks per second, running for at least min_seconds"""
+    count = 0
+    start_time = time.perf_counter()
+    while True:
+        for tx in transactions:
+            check(tx)
+        count += len(transactions)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mempool admission checks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--skip-full-scan", action="store_true",
+                        help="do not measure the legacy chain-scanning check")
+    args = parser.parse_args()
+
+    keys = [KeyPair((i + 1).to_bytes(32, "big")) for i in range(100)]
+    candidates = [Transaction(key.address, "Merchant", 0.5) for key in keys]
+    for key, transaction in zip(keys, candidates):
+        transaction.sign(key)
+    # Verify the signatures once; afterwards they come from the signature
+    # cache, so the rates below measure the balance checks
+    for transaction in candidates:
+        BlockchainSecurity.verify_transaction_signature(transaction)
+
+    print(f"{'history':>10} {'indexed tx/s':>14} {'full scan tx/s':>15}")
+    for size in args.sizes:
+        blockchain = Blockchain(difficulty=1)
+        build_history(blockchain, size)
+        indexed_rate = measure(blockchain.verify_transaction, candidates)
+        if args.skip_full_scan:
+            scan_rate = float('nan')
+        else:
+            scan_rate = measure(
+                lambda tx: BlockchainSecurity.detect_double_spending(blockchain.chain, tx),
+                candidates[:2], min_seconds=0.1
+            )
+        print(f"{size:>10,} {indexed_rate:>14,.0f} {scan_rate:>15,.1f}")
+
+
+if __name__ == "__main__":
+    main()
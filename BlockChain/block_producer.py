@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+from transaction import Transaction, COINBASE_SENDER
+
+logger = logging.getLogger(__name__)
+
+
+class BlockProducer:
+    """
+    Mines pending transactions on a background thread.
+
+    A block is produced every `interval` seconds if anything is pending, or
+    as soon as `max_transactions` are waiting, so submitting a transaction
+    never waits for mining. on_block, if given, is called with each new block.
+    """
+
+    def __init__(self, blockchain, miner_address: str, interval: float = 10.0,
+                 max_transactions: int = 100, on_block: Optional[Callable] = None):
+        self.blockchain = blockchain
+        self.miner_address = miner_address
+        self.interval = interval
+        self.max_transactions = max_transactions
+        self.on_block = on_block
+        self.blocks_produced = 0
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="block-producer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop producing; a block being mined is finished first"""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def submit(self, transaction: Transaction) -> str:
+        """
+        Admit a transaction to the mempool and return its id (hash). Raises
+        ValueError if it is rejected.
+        """
+        if not self.blockchain.transaction_processor.validate_transaction(transaction):
+            raise ValueError("Invalid transaction")
+        # Only mined blocks pay rewards, and a block holding an unsigned transfer
+        # would fail verification here and on every peer
+        if transaction.sender == COINBASE_SENDER:
+            raise ValueError("Block rewards cannot be submitted")
+        if not transaction.signature or not transaction.public_key:
+            raise ValueError("Transactions must be signed by the sender's key")
+        # Checks the signature, which also caches the result for when the block
+        # holding it is verified, and the balance net of pending spends
+        if not self.blockchain.admit_transaction(transaction):
+            raise ValueError("Transaction rejected: invalid signature, insufficient funds, "
+                             "or already pending")
+        with self._wakeup:
+            if self._batch_ready():
+                self._wakeup.notify()
+        return transaction.calculate_hash()
+
+    def _batch_ready(self) -> bool:
+        return len(self.blockchain.mempool) >= self.max_transactions
+
+    def _run(self) -> None:
+        next_block_at = time.monotonic() + self.interval
+        while True:
+            with self._wakeup:
+                self._wakeup.wait_for(
+                    lambda: self._stopping or self._batch_ready(),
+                    timeout=max(0.0, next_block_at - time.monotonic())
+                )
+                if self._stopping:
+                    return
+
+            if len(self.blockchain.mempool):
+                try:
+                    block = self.blockchain.mine_pending_transactions(self.miner_address,
+                                                                      self.max_transactions)
+                    self.blocks_produced += 1
+                    if self.on_block is not None:
+                        self.on_block(block)
+                except Exception:
+                    logger.exception("Error producing block")
+            next_block_at = time.monotonic() + self.interval
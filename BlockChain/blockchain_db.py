@@ -1,23 +1,139 @@
+import queue
 import sqlite3
-from typing import List, Optional
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterable, Iterator, List, Optional, Tuple
 from block import Block
-from transaction import Transaction
+from transaction import Transaction, timestamp_to_epoch
 from datetime import datetime
 
+# Statements are kept as constants so every pooled connection reuses the
+# prepared statement from sqlite3's per-connection statement cache
+INSERT_BLOCK_SQL = '''
+INSERT INTO blocks (block_index, timestamp, previous_hash, hash, nonce, data)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+INSERT_TRANSACTION_SQL = '''
+INSERT INTO transactions (block_index, sender, recipient, amount, timestamp, tx_hash)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+SELECT_BLOCKS_SQL = (
+    'SELECT block_index, timestamp, previous_hash, hash, nonce, data '
+    'FROM blocks WHERE block_index >= ? AND (? < 0 OR block_index < ?) '
+    'ORDER BY block_index'
+)
+SELECT_ENCODED_BLOCKS_SQL = (
+    'SELECT block_index, data FROM blocks '
+    'WHERE block_index >= ? AND (? < 0 OR block_index < ?) ORDER BY block_index'
+)
+SELECT_TRANSACTIONS_SQL = (
+    'SELECT block_index, sender, recipient, amount, timestamp '
+    'FROM transactions WHERE block_index >= ? AND (? < 0 OR block_index < ?) '
+    'ORDER BY block_index, id'
+)
+SELECT_INDEX_BY_HASH_SQL = 'SELECT block_index FROM blocks WHERE hash = ?'
+SELECT_INDEX_RANGE_SQL = 'SELECT MIN(block_index), MAX(block_index) FROM blocks'
+
+# Explorer queries page with keyset cursors (the last row's id, or its
+# (timestamp, id)) so each page is an index range scan however deep it is
+TRANSACTION_COLUMNS = 'id, tx_hash, block_index, sender, recipient, amount, timestamp'
+SELECT_ADDRESS_HISTORY_SQL = f'''
+SELECT {TRANSACTION_COLUMNS} FROM (
+    SELECT * FROM (SELECT {TRANSACTION_COLUMNS} FROM transactions
+                   WHERE sender = ? AND id < ? ORDER BY id DESC LIMIT ?)
+    UNION
+    SELECT * FROM (SELECT {TRANSACTION_COLUMNS} FROM transactions
+                   WHERE recipient = ? AND id < ? ORDER BY id DESC LIMIT ?)
+)
+ORDER BY id DESC LIMIT ?
+'''
+SELECT_TIME_WINDOW_SQL = f'''
+SELECT {TRANSACTION_COLUMNS} FROM transactions
+WHERE (timestamp, id) > (?, ?) AND timestamp < ?
+ORDER BY timestamp, id LIMIT ?
+'''
+SELECT_TRANSACTION_BY_HASH_SQL = f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE tx_hash = ?'
+
+# Rows fetched per round trip when streaming
+FETCH_BATCH_SIZE = 256
+STATEMENT_CACHE_SIZE = 64
+MAX_ROW_ID = 2 ** 63 - 1
+BUSY_TIMEOUT_SECONDS = 30.0
+
+# Durability modes map onto SQLite's synchronous setting. "full" fsyncs every
+# commit, "normal" survives application crashes but may lose the last commits
+# on power loss (in WAL mode), "off" leaves flushing to the operating system.
+DURABILITY_MODES = {"full": "FULL", "normal": "NORMAL", "off": "OFF"}
+
+# Marks the end of the background writer's queue
+_STOP = object()
+
 class BlockchainDB:
-    def __init__(self, db_file: str = "blockchain.db"):
+    """
+    SQLite storage for blocks and transactions.
+
+    File databases run in WAL mode with one read connection per thread and a
+    single writer connection serialized by a lock, so readers never wait for
+    save_block. An in-memory database only exists inside one connection, so
+    there all access goes through that connection under the same lock.
+
+    With group_commit enabled save_block only queues the block; a background
+    writer commits up to group_size queued blocks in one transaction, waiting
+    at most group_delay seconds for a batch to fill. flush() is a barrier that
+    returns once everything queued so far is committed.
+    """
+
+    def __init__(self, db_file: str = "blockchain.db", cache_size_kb: int = 16384,
+                 durability: str = "normal", group_commit: bool = False,
+                 group_size: int = 64, group_delay: float = 0.01):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
         self.db_file = db_file
+        self.cache_size_kb = cache_size_kb
+        self.durability = durability
+        self.group_size = group_size
+        self.group_delay = group_delay
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
         self._init_db()
 
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self._queued = 0
+        self._queued_cond = threading.Condition()
+        self._writer_error: Optional[BaseException] = None
+        if group_commit:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, name="blockchain-db-writer",
+                                            daemon=True)
+            self._writer.start()
+
+    @property
+    def is_memory(self) -> bool:
+        return self.db_file == ":memory:"
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.execute(f'PRAGMA cache_size = -{self.cache_size_kb}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        return conn
+
     def _init_db(self) -> None:
-        """Initialize database tables"""
-        # For in-memory database, we need to maintain the connection
-        if self.db_file == ":memory:":
-            self.connection = sqlite3.connect(self.db_file, check_same_thread=False)
-            self._create_tables(self.connection)
-        else:
-            with sqlite3.connect(self.db_file) as conn:
-                self._create_tables(conn)
+        """Open the writer connection and initialize database tables"""
+        self.connection = self._connect()
+        if not self.is_memory:
+            # WAL lets readers proceed while the writer commits
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            self.connection.execute(f'PRAGMA synchronous = {DURABILITY_MODES[self.durability]}')
+        self._create_tables(self.connection)
 
     def _create_tables(self, conn) -> None:
         """Create the database tables"""
@@ -30,10 +146,18 @@ class BlockchainDB:
             timestamp REAL,
             previous_hash TEXT,
             hash TEXT,
-            nonce INTEGER
+            nonce INTEGER,
+            data BLOB
         )
         ''')
 
+        # Databases created before blocks carried their canonical encoding
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(blocks)')]
+        if 'data' not in columns:
+            cursor.execute('ALTER TABLE blocks ADD COLUMN data BLOB')
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_blocks_hash ON blocks (hash)')
+
         # Create transactions table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS transactions (
@@ -43,112 +167,319 @@ class BlockchainDB:
             recipient TEXT,
             amount REAL,
             timestamp REAL,
+            tx_hash TEXT,
             FOREIGN KEY (block_index) REFERENCES blocks (block_index)
         )
         ''')
 
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(transactions)')]
+        if 'tx_hash' not in columns:
+            cursor.execute('ALTER TABLE transactions ADD COLUMN tx_hash TEXT')
+            self._backfill_transaction_hashes(cursor)
+
+        # Access paths for the explorer queries; id is the keyset tiebreaker
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_sender ON transactions (sender, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_recipient ON transactions (recipient, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_block ON transactions (block_index)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_timestamp ON transactions (timestamp, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_hash ON transactions (tx_hash)')
+
         conn.commit()
 
-    def _get_connection(self):
-        """Get a database connection"""
-        if self.db_file == ":memory:":
+    @staticmethod
+    def _backfill_transaction_hashes(cursor) -> None:
+        """Hash the transactions stored before the tx_hash column existed"""
+        rows = cursor.execute('SELECT id, sender, recipient, amount, timestamp FROM transactions').fetchall()
+        cursor.executemany('UPDATE transactions SET tx_hash = ? WHERE id = ?', [
+            (Transaction(sender, recipient, amount, timestamp).calculate_hash(), tx_id)
+            for tx_id, sender, recipient, amount, timestamp in rows
+        ])
+
+    def _reader(self) -> sqlite3.Connection:
+        """Return this thread's read connection, opening it on first use"""
+        if self.is_memory:
             return self.connection
-        return sqlite3.connect(self.db_file)
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute('PRAGMA query_only = ON')
+            self._local.connection = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
 
-    def save_block(self, block: Block) -> None:
-        """Save a block and its transactions to the database"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def _read_lock(self):
+        """Readers only need the lock when they share the in-memory connection"""
+        return self._write_lock if self.is_memory else nullcontext()
 
-        try:
-            # Save block
-            cursor.execute('''
-            INSERT INTO blocks (block_index, timestamp, previous_hash, hash, nonce)
-            VALUES (?, ?, ?, ?, ?)
-            ''', (
-                block.index,
-                block.timestamp,
-                block.previous_hash,
-                block.hash,
-                block.nonce
-            ))
-
-            # Save transactions
-            for tx in block.transactions:
-                cursor.execute('''
-                INSERT INTO transactions (block_index, sender, recipient, amount, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    block.index,
-                    tx.sender,
-                    tx.recipient,
-                    tx.amount,
-                    tx.timestamp
-                ))
-
-            conn.commit()
-        except Exception as e:
-            print(f"Error saving block: {e}")
-            conn.rollback()
-        finally:
-            if self.db_file != ":memory:":
+    @contextmanager
+    def _write_connection(self) -> Iterator[sqlite3.Connection]:
+        """Serialize access to the single writer connection"""
+        with self._write_lock:
+            yield self.connection
+
+    def _rows(self, cursor: sqlite3.Cursor) -> Iterator[tuple]:
+        """Stream a cursor's rows in batches, holding the read lock only per batch"""
+        while True:
+            with self._read_lock():
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self) -> None:
+        """Commit queued blocks, then close the writer and every pooled reader connection"""
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        with self._readers_lock:
+            for conn in self._readers:
                 conn.close()
+            self._readers.clear()
+        with self._write_lock:
+            self.connection.close()
+
+    def save_block(self, block: Block) -> None:
+        """
+        Save a block and its transactions to the database.
+        With group commit the block is queued and committed by the background writer.
+        """
+        if self._queue is None:
+            self.save_blocks([block])
+            return
+
+        self._raise_writer_error()
+        with self._queued_cond:
+            self._queued += 1
+        self._queue.put(block)
+
+    def save_blocks(self, blocks: Iterable[Block]) -> None:
+        """Save several blocks and their transactions in a single transaction"""
+        blocks = list(blocks)
+        block_rows = [
+            (block.index, block.timestamp, block.previous_hash, block.hash, block.nonce, block.to_bytes())
+            for block in blocks
+        ]
+        tx_rows = [
+            (block.index, tx.sender, tx.recipient, tx.amount, timestamp_to_epoch(tx.timestamp),
+             tx.calculate_hash())
+            for block in blocks
+            for tx in block.transactions
+        ]
+
+        with self._write_connection() as conn:
+            try:
+                conn.executemany(INSERT_BLOCK_SQL, block_rows)
+                conn.executemany(INSERT_TRANSACTION_SQL, tx_rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Block until every queued block is committed.
+        Raises the background writer's error if a commit failed.
+        """
+        if self._queue is not None:
+            with self._queued_cond:
+                if not self._queued_cond.wait_for(lambda: self._queued == 0, timeout):
+                    raise TimeoutError("Timed out waiting for queued blocks to be committed")
+        self._raise_writer_error()
+
+    def _raise_writer_error(self) -> None:
+        if self._writer_error is not None:
+            raise self._writer_error
+
+    def _writer_loop(self) -> None:
+        """Commit queued blocks in groups until close() is called"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+
+            # Let the batch fill for at most group_delay seconds
+            deadline = time.monotonic() + self.group_delay
+            while len(batch) < self.group_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # Once a commit fails every later block would break the chain,
+            # so the rest of the queue is dropped and reported through flush()
+            if self._writer_error is None:
+                try:
+                    self.save_blocks(batch)
+                except Exception as e:
+                    self._writer_error = e
+
+            with self._queued_cond:
+                self._queued -= len(batch)
+                self._queued_cond.notify_all()
+
+    def _sync_reads(self) -> None:
+        """Make blocks queued by this process visible to its own reads"""
+        if self._queued:
+            self.flush()
 
     def get_block(self, index: int) -> Optional[dict]:
         """Retrieve a block and its transactions by index"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        block = self.load_block(index)
+        return self._block_to_dict(block) if block else None
 
+    def load_block(self, index: int) -> Optional[Block]:
+        """Retrieve a single block by index as a Block object"""
+        blocks = self.iter_blocks(index, index + 1)
         try:
-            # Get block
-            cursor.execute('SELECT * FROM blocks WHERE block_index = ?', (index,))
-            block_data = cursor.fetchone()
-            
-            if not block_data:
-                return None
-
-            # Get transactions for this block
-            cursor.execute('SELECT * FROM transactions WHERE block_index = ?', (index,))
-            transactions = cursor.fetchall()
-
-            # Convert transactions to Transaction objects
-            transaction_objects = [
-                Transaction(
-                    sender=tx[2],
-                    recipient=tx[3],
-                    amount=tx[4],
-                    timestamp=tx[5]
-                ) for tx in transactions
-            ]
-
-            return {
-                'block_index': block_data[0],
-                'timestamp': block_data[1],
-                'previous_hash': block_data[2],
-                'hash': block_data[3],
-                'nonce': block_data[4],
-                'transactions': transaction_objects
-            }
+            return next(blocks, None)
         finally:
-            if self.db_file != ":memory:":
-                conn.close()
+            blocks.close()
 
-    def get_all_blocks(self) -> List[dict]:
-        """Retrieve all blocks with their transactions"""
-        blocks = []
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def load_block_by_hash(self, block_hash: str) -> Optional[Block]:
+        """Retrieve a single block by its hash as a Block object"""
+        self._sync_reads()
+        with self._read_lock():
+            row = self._reader().execute(SELECT_INDEX_BY_HASH_SQL, (block_hash,)).fetchone()
+        return self.load_block(row[0]) if row else None
+
+    def get_index_range(self) -> Tuple[Optional[int], Optional[int]]:
+        """Return the lowest and highest stored block index, or (None, None) if empty"""
+        self._sync_reads()
+        with self._read_lock():
+            return self._reader().execute(SELECT_INDEX_RANGE_SQL).fetchone()
+
+    @staticmethod
+    def _block_to_dict(block: Block) -> dict:
+        """Convert a decoded Block to the dictionary format returned by this class"""
+        return {
+            'block_index': block.index,
+            'timestamp': block.timestamp,
+            'previous_hash': block.previous_hash,
+            'hash': block.hash,
+            'nonce': block.nonce,
+            'transactions': block.transactions
+        }
+
+    def iter_blocks(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Block]:
+        """
+        Stream the blocks with start <= index < stop in index order over a
+        single connection.
+
+        Blocks with a stored encoding are decoded directly. Older rows are
+        rebuilt by merging a second scan of the transactions table, ordered
+        the same way, so the whole load is two sequential scans rather than
+        a query per block.
+        """
+        self._sync_reads()
+        conn = self._reader()
+        tx_rows = None
+        pending_tx = None
+
+        # A negative stop means "to the end of the chain"
+        stop = -1 if stop is None else stop
+        with self._read_lock():
+            block_cursor = conn.execute(SELECT_BLOCKS_SQL, (start, stop, stop))
 
         try:
-            cursor.execute('SELECT block_index FROM blocks ORDER BY block_index')
-            block_indices = cursor.fetchall()
+            for index, timestamp, previous_hash, block_hash, nonce, data in self._rows(block_cursor):
+                if data is not None:
+                    yield Block.from_bytes(data)
+                    continue
 
-            for (index,) in block_indices:
-                block = self.get_block(index)
-                if block:
-                    blocks.append(block)
+                if tx_rows is None:
+                    with self._read_lock():
+                        tx_cursor = conn.execute(SELECT_TRANSACTIONS_SQL, (index, stop, stop))
+                    tx_rows = self._rows(tx_cursor)
+                    pending_tx = next(tx_rows, None)
 
-            return blocks
+                # Skip transactions of blocks that were decoded from their encoding
+                while pending_tx is not None and pending_tx[0] < index:
+                    pending_tx = next(tx_rows, None)
+
+                transactions = []
+                while pending_tx is not None and pending_tx[0] == index:
+                    transactions.append(Transaction(
+                        sender=pending_tx[1],
+                        recipient=pending_tx[2],
+                        amount=pending_tx[3],
+                        timestamp=pending_tx[4]
+                    ))
+                    pending_tx = next(tx_rows, None)
+
+                yield Block(index, transactions, previous_hash, timestamp, nonce, block_hash)
         finally:
-            if self.db_file != ":memory:":
-                conn.close() 
\ No newline at end of file
+            block_cursor.close()
+
+    def iter_encoded_blocks(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        """
+        Stream (index, Block.to_bytes() encoding) for start <= index < stop
+        without decoding stored blocks. Rows saved before blocks carried an
+        encoding are loaded and re-encoded one at a time.
+        """
+        self._sync_reads()
+        conn = self._reader()
+        stop = -1 if stop is None else stop
+        with self._read_lock():
+            cursor = conn.execute(SELECT_ENCODED_BLOCKS_SQL, (start, stop, stop))
+        try:
+            for index, data in self._rows(cursor):
+                yield index, data if data is not None else self.load_block(index).to_bytes()
+        finally:
+            cursor.close()
+
+    def get_all_blocks(self) -> List[dict]:
+        """Retrieve all blocks with their transactions"""
+        return [self._block_to_dict(block) for block in self.iter_blocks()]
+
+    @staticmethod
+    def _transaction_row_to_dict(row: tuple) -> dict:
+        tx_id, tx_hash, block_index, sender, recipient, amount, timestamp = row
+        return {
+            'id': tx_id,
+            'tx_hash': tx_hash,
+            'block_index': block_index,
+            'sender': sender,
+            'recipient': recipient,
+            'amount': amount,
+            'timestamp': timestamp
+        }
+
+    def _query_transactions(self, sql: str, params: tuple) -> List[dict]:
+        self._sync_reads()
+        with self._read_lock():
+            rows = self._reader().execute(sql, params).fetchall()
+        return [self._transaction_row_to_dict(row) for row in rows]
+
+    def get_address_history(self, address: str, limit: int = 50,
+                            before_id: Optional[int] = None) -> List[dict]:
+        """
+        Return up to `limit` transactions sent or received by an address,
+        newest first. Pass the last returned id as before_id for the next page.
+        """
+        before_id = before_id if before_id is not None else MAX_ROW_ID
+        return self._query_transactions(
+            SELECT_ADDRESS_HISTORY_SQL,
+            (address, before_id, limit, address, before_id, limit, limit)
+        )
+
+    def get_transactions_in_window(self, start_time: float, end_time: float, limit: int = 50,
+                                   after: Optional[Tuple[float, int]] = None) -> List[dict]:
+        """
+        Return up to `limit` transactions with start_time <= timestamp < end_time,
+        oldest first. Pass the last returned (timestamp, id) as after for the next page.
+        """
+        after_time, after_id = after if after is not None else (start_time, -1)
+        return self._query_transactions(SELECT_TIME_WINDOW_SQL, (after_time, after_id, end_time, limit))
+
+    def get_transaction_by_hash(self, tx_hash: str) -> Optional[dict]:
+        """Return the confirmed transaction with the given hash, if any"""
+        rows = self._query_transactions(SELECT_TRANSACTION_BY_HASH_SQL, (tx_hash,))
+        return rows[0] if rows else None
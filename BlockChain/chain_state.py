@@ -0,0 +1,301 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Dict, Optional
+from serialization import (
+    AMOUNT_UNITS, FORMAT_VERSION, I64, SerializationError,
+    encode_string, decode_string, encode_hash, decode_hash
+)
+from transaction import Transaction
+from events import EventBroadcaster, block_event, transaction_event
+
+# Chain state shared by the processes serving the API. One owner process holds
+# the Blockchain, mines, and after every block atomically replaces a snapshot
+# file (tip header plus all balances). Other processes mmap that snapshot for
+# reads, read blocks from the same WAL-mode database file, and forward
+# submissions to the owner over an authenticated socket.
+
+SNAPSHOT_MAGIC = b"BSNP"
+# magic, version, tip index, chain length, difficulty, tip hash, valid, address count
+SNAPSHOT_HEADER = struct.Struct(">4sBQQB32s?I")
+TIP_HASH_OFFSET = 22
+
+
+def write_snapshot(path: str, blockchain, is_valid: bool = True) -> None:
+    """Write the chain tip and balances to path, replacing any previous snapshot atomically"""
+    tip = blockchain.get_latest_block()
+    balances = list(blockchain.ledger.items())
+    parts = [SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, FORMAT_VERSION, tip.index, len(blockchain.chain),
+        blockchain.difficulty, encode_hash(tip.hash), is_valid, len(balances)
+    )]
+    for address, units in balances:
+        parts.append(encode_string(address))
+        parts.append(I64.pack(units))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(parts))
+    # Readers that already mapped the old file keep a consistent view of it
+    os.replace(tmp_path, path)
+
+
+class ChainSnapshot:
+    """Decoded view of one snapshot file"""
+
+    def __init__(self, data: mmap.mmap):
+        view = memoryview(data)
+        magic, version, tip_index, length, difficulty, _, is_valid, count = \
+            SNAPSHOT_HEADER.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC or version > FORMAT_VERSION:
+            raise SerializationError("Not a supported chain snapshot")
+        self.tip_index = tip_index
+        self.length = length
+        self.difficulty = difficulty
+        self.tip_hash = decode_hash(view, TIP_HASH_OFFSET)
+        self.is_valid = is_valid
+
+        self.balances: Dict[str, int] = {}
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(count):
+            address, offset = decode_string(view, offset)
+            (self.balances[address],) = I64.unpack_from(view, offset)
+            offset += I64.size
+        view.release()
+
+
+class SnapshotReader:
+    """
+    Maps the owner's snapshot file and remaps it when the owner replaces it.
+    Each read costs one stat() unless the tip has moved.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._snapshot: Optional[ChainSnapshot] = None
+
+    def current(self) -> ChainSnapshot:
+        stat = os.stat(self.path)
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id != self._file_id:
+            with self._lock:
+                if file_id != self._file_id:
+                    with open(self.path, "rb") as f:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                            self._snapshot = ChainSnapshot(data)
+                    self._file_id = file_id
+        return self._snapshot
+
+
+class LocalChainState:
+    """Chain state for a single process that owns the blockchain itself"""
+
+    def __init__(self, blockchain, producer, events: Optional[EventBroadcaster] = None):
+        self.blockchain = blockchain
+        self.producer = producer
+        self.events = events
+
+    def publish_block(self, block) -> None:
+        """Push a newly appended block to event subscribers"""
+        if self.events is not None:
+            previous = self.blockchain.chain[-2] if len(self.blockchain.chain) > 1 else None
+            self.events.publish('block', block_event(block, previous.timestamp if previous else None))
+
+    def tip_hash(self) -> str:
+        return self.blockchain.get_latest_block().hash
+
+    def status(self) -> dict:
+        tip = self.blockchain.get_latest_block()
+        return {
+            'length': len(self.blockchain.chain),
+            'is_valid': self.blockchain.is_chain_valid(),
+            'difficulty': self.blockchain.difficulty,
+            'tip_index': tip.index,
+            'tip_hash': tip.hash
+        }
+
+    def get_balance(self, address: str) -> float:
+        return self.blockchain.ledger.get_balance(address)
+
+    def balances(self) -> Dict[str, float]:
+        return {address: units / AMOUNT_UNITS for address, units in self.blockchain.ledger.items()}
+
+    def submit(self, transaction: Transaction) -> str:
+        tx_hash = self.producer.submit(transaction)
+        if self.events is not None:
+            self.events.publish('transaction', transaction_event(transaction, tx_hash))
+        return tx_hash
+
+    def is_pending(self, tx_hash: str) -> bool:
+        return tx_hash in self.blockchain.mempool
+
+
+class SharedChainState:
+    """Chain state read from the owner's snapshot; writes are forwarded to the owner"""
+
+    def __init__(self, snapshot_path: str, owner_address: str, authkey: bytes,
+                 events: Optional[EventBroadcaster] = None):
+        self.reader = SnapshotReader(snapshot_path)
+        self.owner_address = owner_address
+        self.authkey = authkey
+        self.events = events
+        self._connection = None
+        self._connection_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def watch(self, db, poll_interval: float = 0.5) -> None:
+        """
+        Publish block events for blocks the owner appends, reading them from
+        the shared database whenever the snapshot shows a new tip
+        """
+        if self.events is None or self._watcher is not None:
+            return
+
+        def run():
+            snapshot = self.reader.current()
+            last_index = snapshot.tip_index
+            previous = db.load_block(last_index)
+            while True:
+                time.sleep(poll_interval)
+                snapshot = self.reader.current()
+                if snapshot.tip_index == last_index:
+                    continue
+                for block in db.iter_blocks(last_index + 1, snapshot.tip_index + 1):
+                    self.events.publish('block', block_event(block, previous.timestamp if previous else None))
+                    previous = block
+                last_index = snapshot.tip_index
+
+        self._watcher = threading.Thread(target=run, name="chain-watcher", daemon=True)
+        self._watcher.start()
+
+    def tip_hash(self) -> str:
+        return self.reader.current().tip_hash
+
+    def status(self) -> dict:
+        snapshot = self.reader.current()
+        return {
+            'length': snapshot.length,
+            'is_valid': snapshot.is_valid,
+            'difficulty': snapshot.difficulty,
+            'tip_index': snapshot.tip_index,
+            'tip_hash': snapshot.tip_hash
+        }
+
+    def get_balance(self, address: str) -> float:
+        return self.reader.current().balances.get(address, 0) / AMOUNT_UNITS
+
+    def balances(self) -> Dict[str, float]:
+        return {address: units / AMOUNT_UNITS for address, units in self.reader.current().balances.items()}
+
+    def _call(self, op: str, payload):
+        """Send one request to the owner, reconnecting once if the connection dropped"""
+        with self._connection_lock:
+            for attempt in range(2):
+                try:
+                    if self._connection is None:
+                        self._connection = Client(self.owner_address, authkey=self.authkey)
+                    self._connection.send((op, payload))
+                    ok, result = self._connection.recv()
+                    break
+                except (EOFError, OSError):
+                    self._connection = None
+                    if attempt:
+                        raise
+        if not ok:
+            raise ValueError(result)
+        return result
+
+    def submit(self, transaction: Transaction) -> str:
+        tx_hash = self._call("submit", transaction.to_bytes())
+        # Only this worker's clients see the submission; blocks reach every worker
+        if self.events is not None:
+            self.events.publish('transaction', transaction_event(transaction, tx_hash))
+        return tx_hash
+
+    def is_pending(self, tx_hash: str) -> bool:
+        return self._call("is_pending", tx_hash)
+
+
+class ChainStateOwner:
+    """
+    Owns the blockchain for a group of API processes: mines through a
+    BlockProducer, publishes a snapshot after every block and serves
+    forwarded submissions.
+    """
+
+    def __init__(self, db_file: str, snapshot_path: str, address: str, authkey: bytes,
+                 difficulty: int = 4, block_interval: float = 10.0, block_max_transactions: int = 100,
+                 mining_workers: Optional[int] = None):
+        # Imported here so worker processes that only read never load the miner
+        from blockchain import Blockchain
+        from blockchain_db import BlockchainDB
+        from block_producer import BlockProducer
+        from miner import ParallelMiner
+        from chain_verifier import ParallelVerifier
+
+        self.snapshot_path = snapshot_path
+        self.address = address
+        self.authkey = authkey
+        self.blockchain = Blockchain(difficulty=difficulty, db=BlockchainDB(db_file),
+                                     miner=ParallelMiner(workers=mining_workers))
+        # The startup scan covers the whole stored chain, so check it on a pool
+        with ParallelVerifier(workers=mining_workers) as verifier:
+            self.blockchain.verifier = verifier
+            self.is_valid = self.blockchain.is_chain_valid()
+        self.blockchain.verifier = None
+        self.producer = BlockProducer(self.blockchain, "miner_address", interval=block_interval,
+                                      max_transactions=block_max_transactions,
+                                      on_block=self._publish)
+        self.state = LocalChainState(self.blockchain, self.producer)
+        self._listener: Optional[Listener] = None
+
+    def _publish(self, block=None) -> None:
+        # Blocks mined here link to the validated tip, so validity only changes on startup
+        write_snapshot(self.snapshot_path, self.blockchain, self.is_valid)
+
+    def _handle(self, op: str, payload):
+        if op == "submit":
+            return self.state.submit(Transaction.from_bytes(payload))
+        if op == "is_pending":
+            return self.state.is_pending(payload)
+        raise ValueError(f"Unknown request: {op}")
+
+    def _serve_connection(self, connection) -> None:
+        with connection:
+            while True:
+                try:
+                    op, payload = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    connection.send((True, self._handle(op, payload)))
+                except Exception as e:
+                    connection.send((False, str(e)))
+
+    def serve_forever(self) -> None:
+        self._publish()
+        self.producer.start()
+        self._listener = Listener(self.address, authkey=self.authkey)
+        try:
+            while True:
+                try:
+                    connection = self._listener.accept()
+                except OSError:
+                    return
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self.producer.stop()
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+
+
+def run_owner(db_file: str, snapshot_path: str, address: str, authkey: bytes, **options) -> None:
+    """Process entry point for the chain state owner"""
+    ChainStateOwner(db_file, snapshot_path, address, authkey, **options).serve_forever()
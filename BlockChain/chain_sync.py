@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import struct
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+from block import Block, HEADER_PREFIX_FORMAT, difficulty_target
+from serialization import BLOCK_HEADER, U8, SerializationError, decode_chain, decode_hash
+
+# Headers sent in one headers message at most
+MAX_HEADERS_PER_MESSAGE = 2000
+# Blocks sent in one blocks message at most
+MAX_BLOCKS_PER_MESSAGE = 500
+
+# Layout of a BLOCK_HEADER record. Its first 88 bytes (the fixed header
+# prefix and the nonce) are exactly what the block hash covers.
+HASHED_SIZE = HEADER_PREFIX_FORMAT.size + 8
+PREVIOUS_HASH = slice(HEADER_PREFIX_FORMAT.size - 32, HEADER_PREFIX_FORMAT.size)
+BLOCK_HASH = slice(HASHED_SIZE, HASHED_SIZE + 32)
+
+
+class SyncError(Exception):
+    """Raised when no peer could bring the chain up to date"""
+
+
+class BlockHeader(NamedTuple):
+    index: int
+    previous_hash: str
+    hash: str
+    difficulty: int
+    # The packed BLOCK_HEADER record
+    data: bytes
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'BlockHeader':
+        index, _, _, _, _, _, difficulty = BLOCK_HEADER.unpack(data)
+        view = memoryview(data)
+        return cls(index, decode_hash(view, PREVIOUS_HASH.start), decode_hash(view, BLOCK_HASH.start),
+                   difficulty, data)
+
+    @classmethod
+    def from_block(cls, block: Block) -> 'BlockHeader':
+        return cls.decode(header_record(block.to_bytes()))
+
+
+def header_record(encoded_block: bytes) -> bytes:
+    """A block's header record, cut from its Block.to_bytes encoding without decoding it"""
+    # The encoding is a format version byte followed by the header record
+    return encoded_block[U8.size:U8.size + BLOCK_HEADER.size]
+
+
+def encode_headers(encoded_blocks: Iterable[bytes]) -> bytes:
+    """The payload of a headers message: the header records of encoded blocks, back to back"""
+    return b"".join(header_record(data) for data in encoded_blocks)
+
+
+def decode_headers(data: bytes) -> List[BlockHeader]:
+    if len(data) % BLOCK_HEADER.size:
+        raise SerializationError("Headers payload is not a whole number of headers")
+    return [BlockHeader.decode(data[offset:offset + BLOCK_HEADER.size])
+            for offset in range(0, len(data), BLOCK_HEADER.size)]
+
+
+def verify_headers(headers: Sequence[BlockHeader], previous: BlockHeader, min_difficulty: int) -> bool:
+    """
+    Check that headers extend `previous` one index at a time, that each
+    hash matches its header and that each meets its stated difficulty of at
+    least min_difficulty. Needs no transactions, so a chain's proof of work
+    can be checked before any block is downloaded.
+    """
+    for header in headers:
+        digest = hashlib.sha256(header.data[:HASHED_SIZE]).digest()
+        if (header.index != previous.index + 1 or
+                header.data[PREVIOUS_HASH] != previous.data[BLOCK_HASH] or
+                digest != header.data[BLOCK_HASH] or
+                header.difficulty < min_difficulty or
+                int.from_bytes(digest, "big") >= difficulty_target(header.difficulty)):
+            return False
+        previous = header
+    return True
+
+
+class ChainSync:
+    """
+    Headers-first catch-up with connected peers.
+
+    Headers are fetched in batches of up to header_batch and validated
+    (linkage and proof of work) before any block is downloaded. Blocks then
+    download in windows of `window` blocks, with up to requests_per_peer
+    windows outstanding on every peer at once. Each window is checked
+    against the validated headers and applied in chain order, at most
+    max_windows_ahead windows being held in memory. A peer that times out
+    or serves blocks that do not match is dropped for the rest of the sync
+    and its windows go to the others. Must be used from the event loop.
+    """
+
+    def __init__(self, request: Callable[[object, dict, float], Awaitable[bytes]],
+                 apply_blocks: Callable[[List[Block]], Awaitable[int]],
+                 run_blocking: Callable[..., Awaitable],
+                 header_batch: int = MAX_HEADERS_PER_MESSAGE, window: int = 250,
+                 requests_per_peer: int = 2, max_windows_ahead: int = 16, request_timeout: float = 30.0):
+        self.request = request
+        self.apply_blocks = apply_blocks
+        self.run_blocking = run_blocking
+        self.header_batch = min(header_batch, MAX_HEADERS_PER_MESSAGE)
+        self.window = min(window, MAX_BLOCKS_PER_MESSAGE)
+        self.requests_per_peer = requests_per_peer
+        self.max_windows_ahead = max_windows_ahead
+        self.request_timeout = request_timeout
+
+    async def run(self, peers: Sequence, tip: BlockHeader, min_difficulty: int) -> int:
+        """Bring the chain from tip up to the longest valid extension the peers have; returns blocks added"""
+        headers = await self.fetch_headers(peers, tip, min_difficulty)
+        if not headers:
+            return 0
+        return await self.fetch_blocks(peers, headers)
+
+    async def fetch_headers(self, peers: Sequence, tip: BlockHeader, min_difficulty: int) -> List[BlockHeader]:
+        """
+        Validated headers extending tip. Each peer in turn continues from the
+        last header validated so far, so the result is as long as the longest
+        valid extension among them.
+        """
+        headers: List[BlockHeader] = []
+        for peer in peers:
+            while True:
+                previous = headers[-1] if headers else tip
+                request = {'type': 'getheaders', 'start': previous.index + 1, 'count': self.header_batch}
+                try:
+                    payload = await self.request(peer, request, self.request_timeout)
+                    batch = await self.run_blocking(decode_headers, payload)
+                except (asyncio.TimeoutError, ConnectionError, ValueError):
+                    break
+                if not batch:
+                    break
+                if not await self.run_blocking(verify_headers, batch, previous, min_difficulty):
+                    # A peer on another fork, or a dishonest one
+                    break
+                headers.extend(batch)
+                if len(batch) < self.header_batch:
+                    break
+        return headers
+
+    async def fetch_blocks(self, peers: Sequence, headers: List[BlockHeader]) -> int:
+        """Download and apply the blocks of validated headers; returns how many were added"""
+        offsets = range(0, len(headers), self.window)
+        pending: "asyncio.PriorityQueue[int]" = asyncio.PriorityQueue()
+        for offset in offsets:
+            pending.put_nowait(offset)
+        fetched: Dict[int, List[Block]] = {}
+        ahead = asyncio.Semaphore(self.max_windows_ahead)
+        changed = asyncio.Event()
+        # Peers dropped for the rest of the sync, checked by all of their downloads
+        failed = set()
+
+        async def download(peer):
+            while True:
+                await ahead.acquire()
+                # Lowest offset first, so the window needed next is never starved
+                offset = await pending.get()
+                if peer in failed:
+                    pending.put_nowait(offset)
+                    break
+                blocks = await self._fetch_window(peer, headers[offset:offset + self.window])
+                if blocks is None:
+                    failed.add(peer)
+                    pending.put_nowait(offset)
+                    break
+                fetched[offset] = blocks
+                changed.set()
+            ahead.release()
+            changed.set()
+
+        loop = asyncio.get_event_loop()
+        downloads = [loop.create_task(download(peer)) for peer in peers for _ in range(self.requests_per_peer)]
+        added = 0
+        try:
+            for offset in offsets:
+                while offset not in fetched:
+                    if all(task.done() for task in downloads):
+                        raise SyncError(f"No peer could serve block {headers[offset].index}")
+                    changed.clear()
+                    await changed.wait()
+                blocks = fetched.pop(offset)
+                count = await self.apply_blocks(blocks)
+                added += count
+                ahead.release()
+                if count < len(blocks):
+                    raise SyncError(f"Block {blocks[count].index} failed verification")
+        finally:
+            for task in downloads:
+                task.cancel()
+            await asyncio.gather(*downloads, return_exceptions=True)
+        return added
+
+    async def _fetch_window(self, peer, expected: List[BlockHeader]) -> Optional[List[Block]]:
+        """The blocks of one window from peer, or None if it could not serve exactly those"""
+        request = {'type': 'getblocks', 'start': expected[0].index, 'count': len(expected)}
+        try:
+            payload = await self.request(peer, request, self.request_timeout)
+            blocks = await self.run_blocking(decode_chain, payload)
+        except (asyncio.TimeoutError, ConnectionError, ValueError, struct.error):
+            return None
+        if [block.hash for block in blocks] != [header.hash for header in expected]:
+            return None
+        return blocks
@@ -0,0 +1,185 @@
+import itertools
+import json
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+from transaction import timestamp_to_epoch
+
+# An event is (id, type, data). Ids increase monotonically so a reconnecting
+# client can resume after the last event it saw; control events have no id.
+Event = Tuple[Optional[int], str, dict]
+
+
+class TooManySubscribers(Exception):
+    """Raised by EventBroadcaster.subscribe when max_subscribers are already listening"""
+
+
+def block_event(block, previous_timestamp: Optional[float] = None) -> dict:
+    """Compact header of a new block plus the metric deltas it causes"""
+    timestamp = timestamp_to_epoch(block.timestamp)
+    return {
+        'index': block.index,
+        'hash': block.hash,
+        'previous_hash': block.previous_hash,
+        'timestamp': timestamp,
+        'nonce': block.nonce,
+        'transactions': len(block.transactions),
+        'volume': sum(tx.amount for tx in block.transactions),
+        'block_time': (
+            timestamp - timestamp_to_epoch(previous_timestamp) if previous_timestamp is not None else None
+        ),
+        # The transfers themselves, so dashboards can extend graphs without refetching
+        'transfers': [[tx.sender, tx.recipient, tx.amount] for tx in block.transactions]
+    }
+
+
+def transaction_event(transaction, tx_hash: str) -> dict:
+    return {
+        'tx_hash': tx_hash,
+        'sender': transaction.sender,
+        'recipient': transaction.recipient,
+        'amount': transaction.amount,
+        'timestamp': timestamp_to_epoch(transaction.timestamp)
+    }
+
+
+def format_sse(event: Event) -> str:
+    """Encode an event in the text/event-stream wire format"""
+    event_id, event_type, data = event
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """
+    One client's bounded event buffer.
+
+    A slow client never blocks the publisher: once its buffer is full the
+    oldest events are dropped and the client is sent a single "resync" event
+    telling it to refetch full state before applying further deltas.
+    """
+
+    def __init__(self, broadcaster: 'EventBroadcaster', max_events: int):
+        self.broadcaster = broadcaster
+        self.max_events = max_events
+        self.dropped = 0
+        self._events: Deque[Event] = deque()
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def push(self, event: Event) -> None:
+        with self._cond:
+            if len(self._events) >= self.max_events:
+                self._events.popleft()
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> List[Event]:
+        """Wait up to timeout for events and return everything buffered"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self.closed, timeout)
+            events = list(self._events)
+            self._events.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            # Deltas were lost; the client has to rebuild from full state
+            events.insert(0, (None, 'resync', {'dropped': dropped}))
+        return events
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+        self.broadcaster.unsubscribe(self)
+
+
+class EventBroadcaster:
+    """
+    Fans published events out to every subscriber and keeps a short replay
+    history. With max_subscribers set, further subscriptions are refused.
+    """
+
+    def __init__(self, history_size: int = 256, max_events_per_client: int = 256,
+                 max_subscribers: Optional[int] = None):
+        self.max_events_per_client = max_events_per_client
+        self.max_subscribers = max_subscribers
+        self._ids = itertools.count(1)
+        self._history: Deque[Event] = deque(maxlen=history_size)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: dict) -> Event:
+        with self._lock:
+            event = (next(self._ids), event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Register a client. With last_event_id the events it missed are
+        replayed, or a resync is queued if they are no longer in the history.
+        Raises TooManySubscribers once max_subscribers are registered.
+        """
+        subscription = Subscription(self, self.max_events_per_client)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"{self.max_subscribers} clients are already subscribed")
+            if last_event_id is not None:
+                missed = [event for event in self._history if event[0] > last_event_id]
+                oldest = self._history[0][0] if self._history else None
+                if oldest is not None and last_event_id < oldest - 1:
+                    subscription.dropped = oldest - 1 - last_event_id
+                for event in missed:
+                    subscription.push(event)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+class ChainSummary:
+    """
+    Dashboard aggregates built by folding block events, so a view only
+    processes the blocks appended since it last caught up
+    """
+
+    def __init__(self):
+        self.last_index = -1
+        self.last_timestamp: Optional[float] = None
+        self.total_blocks = 0
+        self.total_transactions = 0
+        self.volume_rows: List[dict] = []
+        self.flows: dict = {}
+        self._lock = threading.Lock()
+
+    def apply(self, event: dict) -> None:
+        """Fold one "block" event payload into the aggregates"""
+        if event['index'] <= self.last_index:
+            return
+        self.last_index = event['index']
+        self.last_timestamp = event['timestamp']
+        self.total_blocks += 1
+        self.total_transactions += event['transactions']
+        self.volume_rows.append({'timestamp': event['timestamp'], 'transactions': event['transactions']})
+        for sender, recipient, amount in event['transfers']:
+            self.flows[(sender, recipient)] = self.flows.get((sender, recipient), 0.0) + amount
+
+    def catch_up(self, db) -> int:
+        """Apply every block stored after last_index; returns how many were applied"""
+        applied = 0
+        with self._lock:
+            for block in db.iter_blocks(self.last_index + 1):
+                self.apply(block_event(block, self.last_timestamp))
+                applied += 1
+        return applied
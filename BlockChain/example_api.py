@@ -1,6 +1,7 @@
 from blockchain import Blockchain
 from blockchain_db import BlockchainDB
 from transaction import TransactionProcessor
+import json
 import requests
 
 # Initialize components
@@ -17,9 +18,16 @@ blockchain.mine_pending_transactions("miner_address")
 
 # Make API requests
 def test_api():
-    # Get all blocks
-    response = requests.get('http://localhost:5000/blocks')
-    print("All blocks:", response.json())
+    # Get the first page of blocks
+    response = requests.get('http://localhost:5000/blocks', params={'limit': 10})
+    page = response.json()
+    print("First blocks:", page['blocks'])
+
+    # Continue after the last block of that page, streaming the rest as NDJSON
+    response = requests.get('http://localhost:5000/blocks',
+                            params={'after': page['next_cursor'] or 0, 'stream': 1}, stream=True)
+    for line in response.iter_lines():
+        print("Block:", json.loads(line)['block_index'])
 
     # Get specific block
     response = requests.get('http://localhost:5000/blocks/0')
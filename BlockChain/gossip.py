@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+# Kinds of inventory item, as announced in inv and getdata messages
+BLOCK = 'block'
+TRANSACTION = 'tx'
+# Message carrying the full payload of each kind of item
+PAYLOAD_MESSAGES = {BLOCK: 'new_block', TRANSACTION: 'new_transaction'}
+# Items listed in one inv or getdata message at most
+MAX_INV_ITEMS = 1000
+
+
+class SeenCache:
+    """Bounded mapping of recently seen hashes; the least recently used are forgotten first"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: str, value: object = None) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[object]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+
+class Inventory:
+    """
+    Gossip state of one node: the hashes it has already seen, framed
+    messages of recent items it can serve to peers that ask, which items
+    each peer is known to have, and items requested but not yet received.
+
+    New items are announced by hash to peers not known to have them, and a
+    peer fetches only what it has not seen, so each item's payload crosses
+    each link at most once. Used only from the node's event loop.
+    """
+
+    def __init__(self, max_seen: int = 100_000, max_relay: int = 2_000, max_known_per_peer: int = 20_000,
+                 request_timeout: float = 10.0, clock: Callable[[], float] = time.monotonic):
+        self.seen = SeenCache(max_seen)
+        self.relay = SeenCache(max_relay)
+        self.max_known_per_peer = max_known_per_peer
+        self.request_timeout = request_timeout
+        self.clock = clock
+        self._known: Dict[Hashable, SeenCache] = {}
+        self._requested: "OrderedDict[str, float]" = OrderedDict()
+        self._announcements: Dict[Hashable, List[List[str]]] = {}
+
+    def remember(self, item_hash: str, frames: bytes) -> None:
+        """Record an accepted item and the framed message that carries it"""
+        self.seen.add(item_hash)
+        self.relay.add(item_hash, frames)
+        self._requested.pop(item_hash, None)
+
+    def frames_for(self, item_hash: str) -> Optional[bytes]:
+        return self.relay.get(item_hash)
+
+    def peer_has(self, peer: Hashable, item_hash: str) -> None:
+        known = self._known.get(peer)
+        if known is None:
+            known = self._known[peer] = SeenCache(self.max_known_per_peer)
+        known.add(item_hash)
+
+    def peer_knows(self, peer: Hashable, item_hash: str) -> bool:
+        known = self._known.get(peer)
+        return known is not None and item_hash in known
+
+    def forget_peer(self, peer: Hashable) -> None:
+        self._known.pop(peer, None)
+        self._announcements.pop(peer, None)
+
+    def wanted(self, peer: Hashable, items: List[List[str]]) -> List[List[str]]:
+        """
+        Items announced by peer that should be fetched from it: not seen
+        here and not already requested from another peer within the
+        request timeout
+        """
+        now = self.clock()
+        # Requests are ordered by time, so expired ones are at the front
+        while self._requested:
+            item_hash, requested_at = next(iter(self._requested.items()))
+            if now - requested_at < self.request_timeout:
+                break
+            del self._requested[item_hash]
+
+        wanted = []
+        for kind, item_hash in items[:MAX_INV_ITEMS]:
+            if kind not in PAYLOAD_MESSAGES:
+                continue
+            self.peer_has(peer, item_hash)
+            if item_hash in self.seen or item_hash in self._requested:
+                continue
+            self._requested[item_hash] = now
+            wanted.append([kind, item_hash])
+        return wanted
+
+    def announce(self, peer: Hashable, kind: str, item_hash: str) -> None:
+        """Queue an announcement to peer, which is then known to have the item"""
+        self.peer_has(peer, item_hash)
+        self._announcements.setdefault(peer, []).append([kind, item_hash])
+
+    def take_announcements(self) -> Dict[Hashable, List[List[str]]]:
+        """Announcements queued since the last call, per peer"""
+        announcements, self._announcements = self._announcements, {}
+        return announcements
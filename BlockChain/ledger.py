@@ -0,0 +1,84 @@
+from typing import Dict, Iterable, Tuple
+from serialization import AMOUNT_UNITS
+from transaction import COINBASE_SENDER
+
+
+class BalanceLedger:
+    """
+    Address -> balance index maintained as blocks are appended.
+
+    Balances are kept as fixed-point integers (the same units the binary
+    encoding uses) so incremental updates and a full rescan always agree.
+    Alongside balances it tracks each sender's next expected nonce.
+    """
+
+    def __init__(self):
+        self._balances: Dict[str, int] = {}
+        self._nonces: Dict[str, int] = {}
+
+    def apply_transaction(self, transaction) -> int:
+        """
+        Move a transaction's amount from sender to recipient and take its fee
+        from the sender. Returns the fee in fixed-point units.
+        """
+        units = round(transaction.amount * AMOUNT_UNITS)
+        fee_units = round(transaction.fee * AMOUNT_UNITS)
+        self._balances[transaction.sender] = self._balances.get(transaction.sender, 0) - units - fee_units
+        self._balances[transaction.recipient] = self._balances.get(transaction.recipient, 0) + units
+        if transaction.nonce is not None:
+            self._nonces[transaction.sender] = max(self._nonces.get(transaction.sender, 0), transaction.nonce + 1)
+        return fee_units
+
+    def apply_block(self, block) -> None:
+        """Apply every transaction of a newly appended block; fees go to the block reward's recipient"""
+        fee_units = 0
+        for transaction in block.transactions:
+            fee_units += self.apply_transaction(transaction)
+        coinbase = block.transactions[-1] if block.transactions else None
+        if fee_units and coinbase is not None and coinbase.sender == COINBASE_SENDER:
+            self._balances[coinbase.recipient] += fee_units
+
+    def rebuild(self, chain: Iterable) -> None:
+        """Recompute all balances from scratch with one pass over the chain"""
+        self._balances = {}
+        self._nonces = {}
+        for block in chain:
+            self.apply_block(block)
+
+    def get_balance(self, address: str) -> float:
+        """Return the confirmed balance of an address"""
+        return self._balances.get(address, 0) / AMOUNT_UNITS
+
+    def get_units(self, address: str) -> int:
+        """Return the confirmed balance of an address in fixed-point units"""
+        return self._balances.get(address, 0)
+
+    def next_nonce(self, address: str) -> int:
+        """The lowest nonce a new transaction from address may use"""
+        return self._nonces.get(address, 0)
+
+    def addresses(self):
+        """Return every address that has appeared in a confirmed transaction"""
+        return self._balances.keys()
+
+    def items(self):
+        """Return (address, balance in fixed-point units) pairs"""
+        return self._balances.items()
+
+    def find_inconsistencies(self, chain: Iterable) -> Dict[str, Tuple[float, float]]:
+        """
+        Compare the ledger against a full rescan of the chain.
+        Returns {address: (ledger balance, rescanned balance)} for every mismatch.
+        """
+        rescan = BalanceLedger()
+        rescan.rebuild(chain)
+
+        mismatches = {}
+        for address in set(self._balances) | set(rescan._balances):
+            if self._balances.get(address, 0) != rescan._balances.get(address, 0):
+                mismatches[address] = (self.get_balance(address), rescan.get_balance(address))
+        return mismatches
+
+    def is_consistent(self, chain: Iterable) -> bool:
+        """Return True if the ledger matches a full rescan of the chain"""
+        return not self.find_inconsistencies(chain)
@@ -0,0 +1,266 @@
+import heapq
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from serialization import AMOUNT_UNITS
+from transaction import Transaction
+
+# A replacement for a pending (sender, nonce) must pay more than this
+# multiple of the fee rate it replaces
+REPLACEMENT_FEE_BUMP = 1.1
+
+
+class MempoolError(ValueError):
+    """Raised when a transaction is not admitted to the mempool"""
+
+
+class MempoolEntry:
+    """A pending transaction with the figures the mempool orders it by"""
+
+    __slots__ = ('transaction', 'tx_hash', 'size', 'fee_rate', 'spend_units', 'added_at', 'sequence')
+
+    def __init__(self, transaction: Transaction, tx_hash: str, added_at: float, sequence: int):
+        self.transaction = transaction
+        self.tx_hash = tx_hash
+        self.size = len(transaction.encode())
+        fee_units = round(transaction.fee * AMOUNT_UNITS)
+        # Fee per encoded byte, in fixed-point units
+        self.fee_rate = fee_units / self.size
+        self.spend_units = round(transaction.amount * AMOUNT_UNITS) + fee_units
+        self.added_at = added_at
+        self.sequence = sequence
+
+
+class Mempool:
+    """
+    Pending transactions waiting to be mined.
+
+    Transactions are deduplicated by hash and bounded by count and encoded
+    size; when full, the lowest fee-rate transactions are evicted first.
+    Entries older than `expiry` seconds are dropped. Transactions with a
+    nonce are ordered per sender: a block template only includes one after
+    the sender's previous nonce, and a pending nonce can be replaced by a
+    transaction paying a higher fee. next_nonce reports the first nonce not
+    yet used on chain for a sender.
+    """
+
+    def __init__(self, max_count: int = 50_000, max_bytes: int = 32 * 1024 * 1024,
+                 expiry: float = 3 * 3600.0, next_nonce: Optional[Callable[[str], int]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.expiry = expiry
+        self.next_nonce = next_nonce or (lambda address: 0)
+        self.clock = clock
+        # Insertion ordered, so the oldest entries come first
+        self._entries: Dict[str, MempoolEntry] = {}
+        self._nonces: Dict[str, Dict[int, str]] = {}
+        self._spends: Dict[str, int] = {}
+        self._bytes = 0
+        self._sequence = 0
+        # (fee rate, sequence, hash); stale items are skipped when popped
+        self._eviction_heap: List[Tuple[float, int, str]] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, tx_hash: str) -> bool:
+        return tx_hash in self._entries
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return iter(self.transactions())
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, tx_hash: str) -> Optional[Transaction]:
+        entry = self._entries.get(tx_hash)
+        return entry.transaction if entry is not None else None
+
+    def transactions(self) -> List[Transaction]:
+        """Pending transactions in arrival order"""
+        with self._lock:
+            return [entry.transaction for entry in self._entries.values()]
+
+    def spent_units(self, address: str) -> int:
+        """Amount plus fees that address spends in pending transactions, in fixed-point units"""
+        with self._lock:
+            return self._spends.get(address, 0)
+
+    def spends(self) -> Dict[str, int]:
+        """Pending spends of every sender, in fixed-point units"""
+        with self._lock:
+            return dict(self._spends)
+
+    def add(self, transaction: Transaction) -> str:
+        """Admit a transaction and return its hash, or raise MempoolError"""
+        tx_hash = transaction.calculate_hash()
+        with self._lock:
+            self.expire()
+            if tx_hash in self._entries:
+                raise MempoolError("Transaction is already pending")
+
+            entry = MempoolEntry(transaction, tx_hash, self.clock(), self._sequence)
+            self._sequence += 1
+            if entry.size > self.max_bytes:
+                raise MempoolError("Transaction is larger than the mempool")
+
+            # Entries this transaction displaces, put back if it is evicted itself
+            displaced: List[MempoolEntry] = []
+            nonce = transaction.nonce
+            if nonce is not None:
+                if nonce < self.next_nonce(transaction.sender):
+                    raise MempoolError("Nonce has already been used")
+                replaced = self._nonces.get(transaction.sender, {}).get(nonce)
+                if replaced is not None:
+                    if entry.fee_rate <= self._entries[replaced].fee_rate * REPLACEMENT_FEE_BUMP:
+                        raise MempoolError("Replacement fee is too low")
+                    displaced.append(self._remove(replaced))
+
+            self._insert(entry)
+            displaced.extend(self._evict_to_limits())
+            if tx_hash not in self._entries:
+                self._restore([old for old in displaced if old is not entry])
+                raise MempoolError("Mempool is full and the fee rate is too low")
+            return tx_hash
+
+    def _insert(self, entry: MempoolEntry) -> None:
+        transaction = entry.transaction
+        self._entries[entry.tx_hash] = entry
+        self._bytes += entry.size
+        self._spends[transaction.sender] = self._spends.get(transaction.sender, 0) + entry.spend_units
+        if transaction.nonce is not None:
+            self._nonces.setdefault(transaction.sender, {})[transaction.nonce] = entry.tx_hash
+        heapq.heappush(self._eviction_heap, (entry.fee_rate, entry.sequence, entry.tx_hash))
+
+    def _remove(self, tx_hash: str) -> Optional[MempoolEntry]:
+        entry = self._entries.pop(tx_hash, None)
+        if entry is None:
+            return None
+        transaction = entry.transaction
+        self._bytes -= entry.size
+        remaining = self._spends[transaction.sender] - entry.spend_units
+        if remaining > 0:
+            self._spends[transaction.sender] = remaining
+        else:
+            del self._spends[transaction.sender]
+        if transaction.nonce is not None:
+            nonces = self._nonces[transaction.sender]
+            del nonces[transaction.nonce]
+            if not nonces:
+                del self._nonces[transaction.sender]
+        return entry
+
+    def _restore(self, entries: List[MempoolEntry]) -> None:
+        """Put removed entries back, keeping the entries in arrival order"""
+        if not entries:
+            return
+        for entry in entries:
+            self._insert(entry)
+        # Entries are numbered in arrival order, which expiry relies on
+        self._entries = dict(sorted(self._entries.items(), key=lambda item: item[1].sequence))
+
+    def _remove_with_descendants(self, entry: MempoolEntry) -> List[MempoolEntry]:
+        """
+        Remove an entry and the same sender's later nonces, which could no
+        longer be mined; returns the removed entries
+        """
+        removed = [self._remove(entry.tx_hash)]
+        nonce = entry.transaction.nonce
+        if nonce is not None:
+            for later, tx_hash in list(self._nonces.get(entry.transaction.sender, {}).items()):
+                if later > nonce:
+                    removed.append(self._remove(tx_hash))
+        return removed
+
+    def _evict_to_limits(self) -> List[MempoolEntry]:
+        """Evict the lowest fee rates until within the limits; returns the evicted entries"""
+        evicted = []
+        while len(self._entries) > self.max_count or self._bytes > self.max_bytes:
+            _, sequence, tx_hash = heapq.heappop(self._eviction_heap)
+            entry = self._entries.get(tx_hash)
+            if entry is not None and entry.sequence == sequence:
+                evicted.extend(self._remove_with_descendants(entry))
+        # Drop stale heap items once they outnumber the live ones
+        if len(self._eviction_heap) > 2 * len(self._entries) + 64:
+            self._eviction_heap = [
+                (entry.fee_rate, entry.sequence, entry.tx_hash) for entry in self._entries.values()
+            ]
+            heapq.heapify(self._eviction_heap)
+        return evicted
+
+    def expire(self) -> int:
+        """Drop entries older than the expiry; returns how many were dropped"""
+        with self._lock:
+            cutoff = self.clock() - self.expiry
+            expired = []
+            for entry in self._entries.values():
+                if entry.added_at > cutoff:
+                    break
+                expired.append(entry)
+            for entry in expired:
+                self._remove_with_descendants(entry)
+            return len(expired)
+
+    def remove(self, tx_hashes: Iterable[str]) -> None:
+        with self._lock:
+            for tx_hash in tx_hashes:
+                self._remove(tx_hash)
+
+    def remove_confirmed(self, transactions: Iterable[Transaction]) -> None:
+        """
+        Drop transactions that were mined, and any pending transaction whose
+        nonce the chain has now used
+        """
+        with self._lock:
+            senders = set()
+            for transaction in transactions:
+                self._remove(transaction.calculate_hash())
+                if transaction.nonce is not None:
+                    senders.add(transaction.sender)
+            for sender in senders:
+                first_unused = self.next_nonce(sender)
+                for nonce, tx_hash in list(self._nonces.get(sender, {}).items()):
+                    if nonce < first_unused:
+                        self._remove(tx_hash)
+
+    def block_template(self, max_bytes: int, max_count: Optional[int] = None) -> List[Transaction]:
+        """
+        Choose transactions for the next block: highest fee rate first, each
+        sender's nonces in sequence, until max_bytes of encoded transactions
+        (or max_count of them) are selected
+        """
+        with self._lock:
+            self.expire()
+            candidates = [(-entry.fee_rate, entry.sequence, entry) for entry in self._entries.values()]
+            heapq.heapify(candidates)
+            # Nonce each sender needs next, and later nonces waiting on it
+            expected: Dict[str, int] = {}
+            waiting: Dict[Tuple[str, int], MempoolEntry] = {}
+
+            selected = []
+            used_bytes = 0
+            while candidates and (max_count is None or len(selected) < max_count):
+                _, _, entry = heapq.heappop(candidates)
+                transaction = entry.transaction
+                if transaction.nonce is not None:
+                    sender = transaction.sender
+                    if sender not in expected:
+                        expected[sender] = self.next_nonce(sender)
+                    if transaction.nonce != expected[sender]:
+                        waiting[(sender, transaction.nonce)] = entry
+                        continue
+                if used_bytes + entry.size > max_bytes:
+                    # Too big to fit; smaller transactions may still do
+                    continue
+
+                selected.append(transaction)
+                used_bytes += entry.size
+                if transaction.nonce is not None:
+                    expected[sender] = transaction.nonce + 1
+                    successor = waiting.pop((sender, transaction.nonce + 1), None)
+                    if successor is not None:
+                        heapq.heappush(candidates, (-successor.fee_rate, successor.sequence, successor))
+            return selected
@@ -0,0 +1,143 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional
+from block import difficulty_target
+from worker_pool import WorkerPool
+
+# How many nonces a worker tries between checks of the shared "found" flag
+CANCEL_CHECK_INTERVAL = 4096
+
+# Set in each pool process by _init_worker; holds the lowest winning nonce or -1
+_found_nonce = None
+
+
+def _init_worker(found_nonce) -> None:
+    """Pool initializer: share the found-nonce slot with the worker process"""
+    global _found_nonce
+    _found_nonce = found_nonce
+
+
+def _search_range(prefix: bytes, start: int, stop: int, difficulty: int) -> Optional[int]:
+    """
+    Try every nonce in [start, stop) and return the first one whose hash
+    meets the difficulty, or None if the range is exhausted or cancelled
+    """
+    target = difficulty_target(difficulty)
+    # SHA-256 midstate of the fixed block prefix, copied for every attempt
+    prefix_state = hashlib.sha256(prefix)
+
+    for chunk_start in range(start, stop, CANCEL_CHECK_INTERVAL):
+        # Stop early once another worker has found a lower nonce
+        if _found_nonce is not None:
+            best = _found_nonce.value
+            if 0 <= best < chunk_start:
+                return None
+
+        for nonce in range(chunk_start, min(chunk_start + CANCEL_CHECK_INTERVAL, stop)):
+            attempt = prefix_state.copy()
+            attempt.update(nonce.to_bytes(8, "big"))
+            if int.from_bytes(attempt.digest(), "big") < target:
+                if _found_nonce is not None:
+                    with _found_nonce.get_lock():
+                        if _found_nonce.value < 0 or nonce < _found_nonce.value:
+                            _found_nonce.value = nonce
+                return nonce
+
+    return None
+
+
+class ParallelMiner(WorkerPool):
+    """
+    Proof-of-work engine that splits the nonce space into disjoint ranges
+    and searches them on a pool of worker processes.
+
+    The lowest winning nonce is always returned, so the result is identical
+    to what the serial Block.mine_block loop would have found.
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 100_000,
+                 min_parallel_difficulty: int = 4):
+        super().__init__(workers)
+        self.chunk_size = chunk_size
+        # Easier blocks are mined in-process
+        self.min_parallel_difficulty = min_parallel_difficulty
+        self._found_nonce = None
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Every worker shares the slot that lets the others stop early
+        self._found_nonce = multiprocessing.Value('q', -1)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self._found_nonce,)
+        )
+
+    def search(self, prefix: bytes, difficulty: int, start: int = 0,
+               stop: Optional[int] = None) -> Optional[int]:
+        """
+        Find the lowest nonce in [start, stop) whose hash of prefix + nonce
+        has `difficulty` leading zeros. With stop=None the search is unbounded.
+        """
+        if self.workers == 1 or difficulty < self.min_parallel_difficulty:
+            nonce = start
+            while stop is None or nonce < stop:
+                end = nonce + self.chunk_size if stop is None else min(nonce + self.chunk_size, stop)
+                found = _search_range(prefix, nonce, end, difficulty)
+                if found is not None:
+                    return found
+                nonce = end
+            return None
+
+        with self._lock:
+            executor = self._get_executor()
+            self._found_nonce.value = -1
+
+            pending = {}
+            next_start = start
+            best = None
+
+            def submit_next() -> None:
+                nonlocal next_start
+                if stop is not None and next_start >= stop:
+                    return
+                end = next_start + self.chunk_size
+                if stop is not None:
+                    end = min(end, stop)
+                future = executor.submit(_search_range, prefix, next_start, end, difficulty)
+                pending[future] = next_start
+                next_start = end
+
+            # Keep every worker busy with one queued range in reserve
+            for _ in range(self.workers * 2):
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future)
+                    nonce = future.result()
+                    if nonce is not None and (best is None or nonce < best):
+                        best = nonce
+
+                if best is None:
+                    while len(pending) < self.workers * 2 and (stop is None or next_start < stop):
+                        submit_next()
+                    continue
+
+                # Only ranges below the winner can still produce a lower nonce
+                for future, range_start in list(pending.items()):
+                    if range_start > best:
+                        future.cancel()
+                        pending.pop(future)
+
+            return best
+
+    def mine(self, block, difficulty: int) -> None:
+        """Mine `block` in place, setting its nonce and hash"""
+        nonce = self.search(block._hash_prefix(), difficulty, start=block.nonce)
+        block.difficulty = difficulty
+        block.nonce = nonce
+        block.hash = block.calculate_hash()
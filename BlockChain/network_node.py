@@ -1,139 +1,411 @@
-from typing import List, Set, Dict, Optional
-import socket
-import json
+from typing import Iterator, List, Set, Dict, Optional, Tuple
+import asyncio
+import itertools
 import threading
-from dataclasses import dataclass
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from blockchain import Blockchain
 from block import Block
 from transaction import Transaction
-
-@dataclass
-class NodeInfo:
-    address: str
-    port: int
-    is_mining: bool = False
-    last_seen: float = 0
+from serialization import iter_frame_chain
+from peer_transport import (
+    DEFAULT_SEND_QUEUE, DEFAULT_SEND_TIMEOUT, PeerConnection, PeerMessage, ProtocolError, encode_frames,
+    open_peer_connection
+)
+from peer_manager import NodeInfo, PeerManager
+from gossip import BLOCK, TRANSACTION, MAX_INV_ITEMS, PAYLOAD_MESSAGES, Inventory
+from chain_sync import (
+    MAX_BLOCKS_PER_MESSAGE, MAX_HEADERS_PER_MESSAGE, BlockHeader, ChainSync, encode_headers
+)
 
 class BlockchainNode:
-    def __init__(self, port: int, blockchain: Blockchain):
+    """
+    A peer-to-peer node. All peer connections live on a single asyncio event
+    loop running in a background thread; blocking chain work (decoding,
+    verification, persistence, encoding the chain) runs on a small thread
+    pool so the loop keeps serving other peers meanwhile.
+
+    Known peers are kept connected by a PeerManager. A broadcast only queues
+    the message on every connection; each peer's writer sends it
+    concurrently, and a peer that stops draining for send_timeout seconds
+    is disconnected rather than holding up the others.
+
+    New blocks and transactions are gossiped by inventory: their hashes are
+    announced in batched inv messages to peers not known to have them, and
+    peers send getdata for the ones they have not seen. With
+    announce_inventory=False full payloads are pushed to every peer instead.
+
+    A new or lagging node catches up with sync(), which fetches and checks
+    headers first and then downloads blocks in windows from every
+    connected peer at once (see ChainSync).
+    """
+
+    def __init__(self, port: int, blockchain: Blockchain, host: str = '0.0.0.0',
+                 backlog: int = 1024, max_send_queue: int = DEFAULT_SEND_QUEUE, workers: int = 4,
+                 compress: bool = True, send_timeout: float = DEFAULT_SEND_TIMEOUT,
+                 ping_interval: float = 15.0, announce_inventory: bool = True):
         self.port = port
+        self.host = host
+        self.backlog = backlog
+        self.max_send_queue = max_send_queue
+        # Compress outgoing frames; incoming ones are accepted either way
+        self.compress = compress
+        self.send_timeout = send_timeout
         self.blockchain = blockchain
-        self.peers: Dict[str, NodeInfo] = {}
+        self.peer_manager = PeerManager(self._open_peer_connection, self._serve_connection,
+                                        ping_interval=ping_interval, ping_timeout=2 * ping_interval)
+        self.peers: Dict[str, NodeInfo] = self.peer_manager.peers
+        self.connections: Set[PeerConnection] = set()
+        self.inventory = Inventory()
+        self.announce_inventory = announce_inventory
+        self._flush_scheduled = False
+        self.chain_sync = ChainSync(self._request, self._apply_synced_blocks, self._run_blocking)
+        # Outstanding requests to peers by id, answered by headers and blocks messages
+        self._requests: Dict[int, Tuple[PeerConnection, asyncio.Future]] = {}
+        self._request_ids = itertools.count()
+        self._sync_lock: Optional[asyncio.Lock] = None
         self.mining = False
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind(('0.0.0.0', port))
-        self.server_socket.listen(5)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='node-chain')
+        # Serializes changes to the chain between peers and the mining thread
+        self._chain_lock = threading.Lock()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._running = False
+        self._threads: List[threading.Thread] = []
 
     def start(self):
-        """Start the node's server and mining threads"""
-        # Start server thread
-        server_thread = threading.Thread(target=self._run_server)
-        server_thread.daemon = True
-        server_thread.start()
+        """Start the node's event loop and mining threads"""
+        started = threading.Event()
+        errors: List[BaseException] = []
+        loop_thread = threading.Thread(target=self._run_loop, args=(started, errors))
+        loop_thread.daemon = True
+        loop_thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        self._running = True
 
         # Start mining thread
         mining_thread = threading.Thread(target=self._mine_pending_transactions)
         mining_thread.daemon = True
         mining_thread.start()
+        self._threads = [loop_thread, mining_thread]
+
+    def stop(self, timeout: Optional[float] = None):
+        """Close every connection and stop the node's threads"""
+        self._running = False
+        if self.loop is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.stop_server(), self.loop).result(timeout)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        for thread in self._threads:
+            thread.join(timeout)
+        self.executor.shutdown(wait=False)
 
-    def _run_server(self):
-        """Run the node's server to handle peer connections"""
-        while True:
-            client_socket, address = self.server_socket.accept()
-            client_thread = threading.Thread(
-                target=self._handle_peer_connection,
-                args=(client_socket, address)
-            )
-            client_thread.daemon = True
-            client_thread.start()
-
-    def _handle_peer_connection(self, client_socket: socket.socket, address: tuple):
-        """Handle incoming peer connections and messages"""
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _run_loop(self, started: threading.Event, errors: List[BaseException]):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
         try:
-            data = client_socket.recv(4096).decode()
-            message = json.loads(data)
-            
-            if message['type'] == 'new_block':
-                self._handle_new_block(message['data'])
-            elif message['type'] == 'new_transaction':
-                self._handle_new_transaction(message['data'])
-            elif message['type'] == 'chain_request':
-                self._handle_chain_request(client_socket)
-                
+            loop.run_until_complete(self.start_server())
         except Exception as e:
-            print(f"Error handling peer connection: {e}")
+            errors.append(e)
+            started.set()
+            loop.close()
+            return
+        started.set()
+        try:
+            loop.run_forever()
         finally:
-            client_socket.close()
-
-    def _handle_new_block(self, block_data: dict):
-        """Handle receiving a new block from peers"""
-        # Convert block data to Block object
-        block = Block(
-            index=block_data['index'],
-            transactions=block_data['transactions'],
-            previous_hash=block_data['previous_hash']
+            loop.close()
+
+    async def start_server(self):
+        """Listen for peers on the running event loop"""
+        self.loop = asyncio.get_event_loop()
+        self._server = await asyncio.start_server(
+            self._accept_peer, self.host, self.port, backlog=self.backlog
         )
-        block.hash = block_data['hash']
-        block.nonce = block_data['nonce']
-        
+        # Report the actual port when an ephemeral one (0) was requested
+        self.port = self._server.sockets[0].getsockname()[1]
+        # Peers added before the node started
+        for info in list(self.peers.values()):
+            self.peer_manager.add(info)
+
+    async def stop_server(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.peer_manager.close()
+        for connection in list(self.connections):
+            await connection.close()
+
+    async def _accept_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = PeerConnection(reader, writer, self.max_send_queue, compress=self.compress,
+                                    send_timeout=self.send_timeout)
+        await self._serve_connection(connection)
+
+    async def _serve_connection(self, connection: PeerConnection, info: Optional[NodeInfo] = None):
+        """Handle messages from one peer until it disconnects"""
+        self.connections.add(connection)
+        connection.start()
+        try:
+            async for message in connection:
+                await self._handle_message(connection, message)
+                if info is not None:
+                    info.last_seen = time.time()
+                    info.latency = connection.latency
+        except (ConnectionError, ValueError, KeyError) as e:
+            print(f"Error handling peer connection: {e}")
+        finally:
+            self.connections.discard(connection)
+            self.inventory.forget_peer(connection)
+            for peer, future in self._requests.values():
+                if peer is connection and not future.done():
+                    future.set_exception(ConnectionError("Peer disconnected"))
+            await connection.close()
+
+    async def _handle_message(self, connection: PeerConnection, message: PeerMessage):
+        """Dispatch one peer message; blocking chain work goes to the executor"""
+        if message.type == 'ping':
+            connection.send({'type': 'pong', 'id': message.header.get('id')})
+        elif message.type == 'pong':
+            connection.pong_received(message.header.get('id'))
+        elif message.type == 'inv':
+            wanted = self.inventory.wanted(connection, message.header['items'])
+            if wanted:
+                connection.send({'type': 'getdata', 'items': wanted})
+        elif message.type == 'getdata':
+            self._handle_getdata(connection, message.header['items'])
+        elif message.type in ('new_block', 'new_transaction'):
+            await self._receive_item(connection, message)
+        elif message.type == 'getheaders':
+            start, stop = await self._run_blocking(self._requested_range, message.header, MAX_HEADERS_PER_MESSAGE)
+            headers = await self._run_blocking(encode_headers, self._iter_encoded(start, stop))
+            connection.send({'type': 'headers', 'id': message.header.get('id')}, headers)
+        elif message.type == 'getblocks':
+            start, stop = await self._run_blocking(self._requested_range, message.header, MAX_BLOCKS_PER_MESSAGE)
+            blocks = iter_frame_chain(self._iter_encoded(start, stop), stop - start)
+            connection.send({'type': 'blocks', 'id': message.header.get('id')}, blocks)
+        elif message.type in ('headers', 'blocks'):
+            request = self._requests.get(message.header.get('id'))
+            if request is not None and request[0] is connection and not request[1].done():
+                request[1].set_result(await message.read())
+        elif message.type == 'chain_request':
+            # Takes the chain lock, so it must not run on the event loop
+            snapshot = await self._run_blocking(self._handle_chain_request)
+            connection.send({'type': 'chain_response'}, snapshot)
+
+    def _run_blocking(self, func, *args):
+        return asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+
+    async def _receive_item(self, connection: PeerConnection, message: PeerMessage):
+        """Accept a block or transaction payload and pass it on to the peers that lack it"""
+        kind = BLOCK if message.type == 'new_block' else TRANSACTION
+        claimed = message.header.get('hash')
+        if claimed is not None and claimed in self.inventory.seen:
+            # Already have it; skip the payload without decoding it
+            self.inventory.peer_has(connection, claimed)
+            await message.discard()
+            return
+
+        payload = await message.read()
+        handler = self._handle_new_block if kind == BLOCK else self._handle_new_transaction
+        accepted, item_hash = await self._run_blocking(handler, payload)
+        self.inventory.peer_has(connection, item_hash)
+        # Rejected items are not marked seen: their hash does not cover a
+        # signature, so a forged copy must not shadow the genuine item
+        if accepted and item_hash not in self.inventory.seen:
+            header = {'type': message.type, 'hash': item_hash}
+            frames = await self._run_blocking(self._encode, header, payload)
+            self._publish(kind, item_hash, frames, exclude=connection)
+
+    def _handle_getdata(self, connection: PeerConnection, items: List[List[str]]):
+        for kind, item_hash in items[:MAX_INV_ITEMS]:
+            frames = self.inventory.frames_for(item_hash)
+            if frames is None and kind == TRANSACTION:
+                transaction = self.blockchain.mempool.get(item_hash)
+                if transaction is not None:
+                    frames = self._encode({'type': 'new_transaction', 'hash': item_hash}, transaction.to_bytes())
+            if frames is not None:
+                self.inventory.peer_has(connection, item_hash)
+                connection.send_encoded(frames)
+
+    def _handle_new_block(self, block_data: bytes) -> Tuple[bool, str]:
+        """Handle receiving a new block from peers; returns whether it was added, and its hash"""
+        # Blocks travel in the canonical binary encoding
+        block = Block.from_bytes(block_data)
+
         # Verify and add block
-        if self.blockchain.verify_block(block):
-            self.blockchain.add_block_from_peer(block)
-            self._broadcast_block(block)
-
-    def _handle_new_transaction(self, tx_data: dict):
-        """Handle receiving a new transaction from peers"""
-        transaction = Transaction(
-            sender=tx_data['sender'],
-            recipient=tx_data['recipient'],
-            amount=tx_data['amount']
-        )
-        
-        if self.blockchain.verify_transaction(transaction):
-            self.blockchain.add_pending_transaction(transaction)
-            self._broadcast_transaction(transaction)
-
-    def _handle_chain_request(self, client_socket: socket.socket):
-        """Handle request for full blockchain data"""
-        chain_data = self.blockchain.to_dict()
-        response = {
-            'type': 'chain_response',
-            'data': chain_data
-        }
-        client_socket.send(json.dumps(response).encode())
+        with self._chain_lock:
+            return self.blockchain.add_block_from_peer(block), block.calculate_hash()
+
+    def _handle_new_transaction(self, tx_data: bytes) -> Tuple[bool, str]:
+        """Handle receiving a new transaction from peers; returns whether it was admitted, and its hash"""
+        transaction = Transaction.from_bytes(tx_data)
+        return self.blockchain.admit_transaction(transaction), transaction.calculate_hash()
+
+    def _handle_chain_request(self):
+        """
+        Stream the chain as a snapshot. Blocks are encoded as the peer's
+        connection drains, on an executor thread, so the chain is never
+        held in memory whole; blocks appended meanwhile are not included.
+        """
+        with self._chain_lock:
+            count = len(self.blockchain.chain)
+        return iter_frame_chain(self._iter_encoded(0, count), count)
+
+    def _requested_range(self, header: dict, limit: int) -> Tuple[int, int]:
+        """
+        Chain positions of the blocks a getheaders or getblocks message asks
+        for. Takes the chain lock, so it runs on the executor.
+        """
+        chain = self.blockchain.chain
+        with self._chain_lock:
+            length = len(chain)
+            first_index = chain[0].index if length else 0
+        try:
+            requested_start, requested_count = int(header['start']), int(header['count'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ProtocolError(f"Malformed block range: {e}") from e
+        start = min(max(0, requested_start - first_index), length)
+        return start, min(length, start + max(0, min(requested_count, limit)))
+
+    def _iter_encoded(self, start: int, stop: int) -> Iterator[bytes]:
+        """Encodings of the blocks at chain positions start to stop, read lazily"""
+        chain = self.blockchain.chain
+        if hasattr(chain, 'iter_encoded'):
+            return chain.iter_encoded(start, stop)
+        return (block.to_bytes() for block in islice(chain, start, stop))
+
+    async def _request(self, connection: PeerConnection, header: dict, timeout: Optional[float]) -> bytes:
+        """Send a request to one peer and wait for the payload of its answer"""
+        request_id = next(self._request_ids)
+        future = asyncio.get_event_loop().create_future()
+        self._requests[request_id] = (connection, future)
+        try:
+            if not connection.send(dict(header, id=request_id)):
+                raise ConnectionError("Request could not be queued")
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            del self._requests[request_id]
+
+    async def _apply_synced_blocks(self, blocks: List[Block]) -> int:
+        added = await self._run_blocking(self._add_synced_blocks, blocks)
+        for block in blocks[:added]:
+            # Not fetched again when a peer announces it
+            self.inventory.seen.add(block.hash)
+        return added
+
+    def _add_synced_blocks(self, blocks: List[Block]) -> int:
+        with self._chain_lock:
+            return self.blockchain.add_blocks_from_peer(blocks)
+
+    def _latest_block(self) -> Block:
+        with self._chain_lock:
+            return self.blockchain.get_latest_block()
+
+    def sync(self, timeout: Optional[float] = None) -> int:
+        """
+        Catch up with the connected peers: validate the headers of the
+        longest extension of this chain that they have, then download its
+        blocks in parallel. Returns the number of blocks added; raises
+        SyncError if validated blocks could not be downloaded. Safe to
+        call from any thread.
+        """
+        return asyncio.run_coroutine_threadsafe(self._sync(), self.loop).result(timeout)
+
+    async def _sync(self) -> int:
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            tip = await self._run_blocking(self._latest_block)
+            return await self.chain_sync.run(list(self.connections), BlockHeader.from_block(tip),
+                                             self.blockchain.difficulty)
+
+    def connect_to_peer(self, address: str, port: int, timeout: Optional[float] = 5.0) -> NodeInfo:
+        """
+        Keep a long-lived connection to a peer, waiting up to timeout for the
+        first one; an unreachable peer keeps being retried in the background.
+        Safe to call from any thread.
+        """
+        info = NodeInfo(address, port)
+        if self.loop is None:
+            # Connected once the node starts
+            return self.peers.setdefault(info.key, info)
+        return asyncio.run_coroutine_threadsafe(self._add_peer(info, timeout), self.loop).result()
+
+    async def _add_peer(self, info: NodeInfo, timeout: Optional[float]) -> NodeInfo:
+        info = self.peer_manager.add(info)
+        await self.peer_manager.wait_connected(info.key, timeout)
+        return info
+
+    async def _open_peer_connection(self, info: NodeInfo) -> PeerConnection:
+        return await open_peer_connection(info.address, info.port, self.max_send_queue,
+                                          self.compress, self.send_timeout)
 
     def broadcast_transaction(self, transaction: Transaction):
         """Broadcast a new transaction to all peers"""
-        message = {
-            'type': 'new_transaction',
-            'data': transaction.to_dict()
-        }
-        self._broadcast_to_peers(message)
+        self._broadcast_to_peers(TRANSACTION, transaction.calculate_hash(), transaction.to_bytes())
 
     def broadcast_block(self, block: Block):
         """Broadcast a new block to all peers"""
-        message = {
-            'type': 'new_block',
-            'data': block.to_dict()
-        }
-        self._broadcast_to_peers(message)
-
-    def _broadcast_to_peers(self, message: dict):
-        """Send a message to all connected peers"""
-        for peer_info in self.peers.values():
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.connect((peer_info.address, peer_info.port))
-                    s.send(json.dumps(message).encode())
-            except Exception as e:
-                print(f"Error broadcasting to peer: {e}")
+        self._broadcast_to_peers(BLOCK, block.hash, block.to_bytes())
+
+    def _encode(self, header: dict, payload: bytes = b"") -> bytes:
+        """Frame a message once, to be shared by every peer it goes to"""
+        return b"".join(encode_frames(header, payload, self.compress))
+
+    def _broadcast_to_peers(self, kind: str, item_hash: str, payload: bytes):
+        """Gossip a new item to all connected peers; safe to call from any thread"""
+        if self.loop is not None and self.loop.is_running():
+            # Framed and compressed on the calling thread, not the event loop
+            frames = self._encode({'type': PAYLOAD_MESSAGES[kind], 'hash': item_hash}, payload)
+            self.loop.call_soon_threadsafe(self._publish, kind, item_hash, frames)
+
+    def _publish(self, kind: str, item_hash: str, frames: bytes, exclude: Optional[PeerConnection] = None):
+        """
+        Announce an item to every peer not known to have it or, when not
+        announcing inventory, push the framed payload to every peer but the
+        one it came from. Runs on the event loop.
+        """
+        self.inventory.remember(item_hash, frames)
+        for connection in list(self.connections):
+            if connection is exclude:
+                continue
+            if not self.announce_inventory:
+                connection.send_encoded(frames)
+            elif not self.inventory.peer_knows(connection, item_hash):
+                self.inventory.announce(connection, kind, item_hash)
+        if self.announce_inventory and not self._flush_scheduled:
+            # Items published in the same loop iteration share one inv per peer
+            self._flush_scheduled = True
+            asyncio.get_event_loop().call_soon(self._flush_announcements)
+
+    def _flush_announcements(self):
+        self._flush_scheduled = False
+        for connection, items in self.inventory.take_announcements().items():
+            for start in range(0, len(items), MAX_INV_ITEMS):
+                connection.send({'type': 'inv', 'items': items[start:start + MAX_INV_ITEMS]})
 
     def _mine_pending_transactions(self):
         """Mine pending transactions in a loop"""
-        while True:
-            if self.mining and len(self.blockchain.pending_transactions) > 0:
-                new_block = self.blockchain.mine_pending_transactions(
-                    f"Node_{self.port}"
-                )
-                if new_block:
-                    self.broadcast_block(new_block) 
\ No newline at end of file
+        while self._running:
+            if self.mining and len(self.blockchain.mempool) > 0:
+                # The proof of work runs outside the chain lock so peers' blocks
+                # and requests are not held up; if one of their blocks moves the
+                # tip meanwhile, this block is dropped and the next one is mined
+                with self._chain_lock:
+                    new_block = self.blockchain.prepare_block(f"Node_{self.port}")
+                new_block.mine_block(self.blockchain.difficulty, miner=self.blockchain.miner)
+                with self._chain_lock:
+                    added = self.blockchain.append_mined_block(new_block)
+                if added:
+                    self.broadcast_block(new_block)
+            else:
+                time.sleep(0.1)
@@ -2,31 +2,46 @@ from typing import List, Optional
 import hashlib
 from datetime import datetime
 from block import Block
-from transaction import Transaction
+from transaction import Transaction, COINBASE_SENDER
+from serialization import AMOUNT_UNITS
+import signatures
 
 class BlockchainSecurity:
     @staticmethod
-    def verify_block_integrity(block: Block) -> bool:
-        """Verify the integrity of a single block"""
+    def verify_block_integrity(block: Block, signature_verifier=None, min_difficulty: int = 0) -> bool:
+        """
+        Verify the integrity of a single block.
+        If a SignatureVerifier is given the signatures are checked on its workers.
+        The proof of work must meet min_difficulty whatever difficulty the block states.
+        """
+        # Verify the transactions against the Merkle root in the header
+        if block.compute_merkle_root() != block.merkle_root:
+            return False
+
         # Verify block hash
         calculated_hash = block.calculate_hash()
         if calculated_hash != block.hash:
             return False
             
         # Verify proof of work
-        if not block.hash.startswith('0' * block.difficulty):
+        if not block.hash.startswith('0' * max(block.difficulty, min_difficulty)):
             return False
             
         # Verify transaction signatures
-        for tx in block.transactions:
-            if not BlockchainSecurity.verify_transaction_signature(tx):
-                return False
+        if BlockchainSecurity.block_signature_failures(block, signature_verifier):
+            return False
                 
         return True
 
     @staticmethod
-    def verify_chain_integrity(chain: List[Block]) -> bool:
-        """Verify the integrity of the entire blockchain"""
+    def verify_chain_integrity(chain: List[Block], verifier=None) -> bool:
+        """
+        Verify the integrity of the entire blockchain.
+        If a ParallelVerifier is given the blocks are checked on its workers.
+        """
+        if verifier is not None:
+            return verifier.verify_chain(chain)
+
         for i in range(1, len(chain)):
             current_block = chain[i]
             previous_block = chain[i-1]
@@ -43,17 +58,28 @@ class BlockchainSecurity:
 
     @staticmethod
     def verify_transaction_signature(transaction: Transaction) -> bool:
-        """Verify the signature of a transaction"""
-        if not transaction.signature:
-            return False
-            
-        try:
-            # Implement signature verification logic here
-            # This is a placeholder for actual cryptographic verification
-            message = f"{transaction.sender}{transaction.recipient}{transaction.amount}"
-            return True  # Replace with actual verification
-        except Exception:
-            return False
+        """
+        Verify the signature of a transaction against the public key owning
+        its sender address. Verified signatures are cached by transaction
+        hash, so a transaction checked on admission is not re-verified
+        when its block arrives.
+        """
+        return signatures.verify_transaction(transaction)
+
+    @staticmethod
+    def block_signature_failures(block: Block, signature_verifier=None) -> List[Transaction]:
+        """
+        Return the transactions of a block whose signatures do not verify.
+        The block reward, as the last transaction, is the only one exempt.
+        """
+        signed = block.transactions
+        if signed and signed[-1].sender == COINBASE_SENDER:
+            signed = signed[:-1]
+        if signature_verifier is not None:
+            results = signature_verifier.verify_transactions(signed)
+        else:
+            results = [BlockchainSecurity.verify_transaction_signature(tx) for tx in signed]
+        return [tx for tx, valid in zip(signed, results) if not valid]
 
     @staticmethod
     def detect_double_spending(chain: List[Block], transaction: Transaction) -> bool:
@@ -73,8 +99,25 @@ class BlockchainSecurity:
         return (sender_balance - spent_amount) >= transaction.amount
 
     @staticmethod
-    def audit_chain(chain: List[Block]) -> List[dict]:
-        """Perform a security audit of the blockchain"""
+    def has_sufficient_funds(ledger, pending_spent_units: int, transaction: Transaction) -> bool:
+        """
+        O(1) double-spend check: the sender's confirmed balance from the ledger,
+        minus what it already spends in unconfirmed transactions, must cover the
+        amount and fee
+        """
+        amount_units = round(transaction.amount * AMOUNT_UNITS) + round(transaction.fee * AMOUNT_UNITS)
+        available = ledger.get_units(transaction.sender) - pending_spent_units
+        return available >= amount_units
+
+    @staticmethod
+    def audit_chain(chain: List[Block], verifier=None) -> List[dict]:
+        """
+        Perform a security audit of the blockchain.
+        If a ParallelVerifier is given the blocks are checked on its workers.
+        """
+        if verifier is not None:
+            return verifier.audit_chain(chain)
+
         audit_results = []
         
         for i, block in enumerate(chain):
@@ -93,11 +136,10 @@ class BlockchainSecurity:
                 block_audit['issues'].append('Invalid block linkage')
                 
             # Check transactions
-            for tx in block.transactions:
-                if not BlockchainSecurity.verify_transaction_signature(tx):
-                    block_audit['issues'].append(
-                        f'Invalid transaction signature: {tx.sender} -> {tx.recipient}'
-                    )
+            for tx in BlockchainSecurity.block_signature_failures(block):
+                block_audit['issues'].append(
+                    f'Invalid transaction signature: {tx.sender} -> {tx.recipient}'
+                )
                     
             if block_audit['issues']:
                 audit_results.append(block_audit)
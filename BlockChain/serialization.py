@@ -0,0 +1,179 @@
+import struct
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Sequence, Tuple, Union
+
+# Canonical binary encoding shared by hashing, storage, the peer protocol and
+# chain snapshots. Integers are big-endian and fixed width, strings are UTF-8
+# with a 16-bit length prefix, amounts are fixed-point and timestamps are
+# integer microseconds. Decoders read through a memoryview and never copy.
+# Version 2 added the signer's public key to transactions, version 3 their
+# fee and nonce
+FORMAT_VERSION = 3
+
+# Amounts are stored as integer multiples of 1e-8 coins
+AMOUNT_UNITS = 10 ** 8
+
+CHAIN_MAGIC = b"BCHN"
+
+U8 = struct.Struct(">B")
+U16 = struct.Struct(">H")
+U32 = struct.Struct(">I")
+I64 = struct.Struct(">q")
+# index, timestamp, merkle root, previous hash, nonce, hash, difficulty
+BLOCK_HEADER = struct.Struct(">Qd32s32sQ32sB")
+CHAIN_HEADER = struct.Struct(">4sBQ")
+
+EPOCH = datetime(1970, 1, 1)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class SerializationError(ValueError):
+    """Raised when a buffer does not contain a valid encoding"""
+
+
+def encode_string(value: str) -> bytes:
+    """Encode a string with a 16-bit length prefix"""
+    data = value.encode()
+    return U16.pack(len(data)) + data
+
+
+def decode_string(view: memoryview, offset: int) -> Tuple[str, int]:
+    """Decode a length-prefixed string without copying the buffer"""
+    (length,) = U16.unpack_from(view, offset)
+    offset += U16.size
+    if offset + length > len(view):
+        raise SerializationError("Truncated string")
+    return str(view[offset:offset + length], "utf-8"), offset + length
+
+
+def encode_amount(amount: float) -> bytes:
+    """Encode a coin amount as a fixed-point integer"""
+    return I64.pack(round(amount * AMOUNT_UNITS))
+
+
+def decode_amount(view: memoryview, offset: int) -> Tuple[float, int]:
+    (units,) = I64.unpack_from(view, offset)
+    return units / AMOUNT_UNITS, offset + I64.size
+
+
+def timestamp_micros(value) -> int:
+    """Convert a datetime, ISO string or epoch seconds to integer microseconds"""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None) - value.utcoffset()
+        return (value - EPOCH) // timedelta(microseconds=1)
+    return round(value * 1_000_000)
+
+
+def encode_timestamp(value) -> bytes:
+    return I64.pack(timestamp_micros(value))
+
+
+def decode_timestamp(view: memoryview, offset: int) -> Tuple[datetime, int]:
+    """Decode a timestamp as a naive UTC datetime"""
+    (micros,) = I64.unpack_from(view, offset)
+    return EPOCH + timedelta(microseconds=micros), offset + I64.size
+
+
+def encode_hash(value: str) -> bytes:
+    """Encode a hex digest as 32 raw bytes; the genesis marker "0" becomes all zeros"""
+    return bytes.fromhex(value.rjust(64, "0"))
+
+
+def decode_hash(view: memoryview, offset: int = 0) -> str:
+    raw = view[offset:offset + 32]
+    return raw.hex() if any(raw) else "0"
+
+
+def encode_chain(blocks: Sequence) -> bytes:
+    """Encode a sequence of blocks as a snapshot: header then length-prefixed blocks"""
+    return frame_chain([block.to_bytes() for block in blocks])
+
+
+def frame_chain(encoded_blocks: Sequence[bytes]) -> bytes:
+    """Build a snapshot from blocks that are already encoded with Block.to_bytes"""
+    return b"".join(iter_frame_chain(encoded_blocks, len(encoded_blocks)))
+
+
+def iter_frame_chain(encoded_blocks: Iterable[bytes], count: int) -> Iterator[bytes]:
+    """
+    Yield the pieces of a snapshot of `count` encoded blocks one at a time,
+    so a large chain can be sent without building it in memory
+    """
+    yield CHAIN_HEADER.pack(CHAIN_MAGIC, FORMAT_VERSION, count)
+    for data in encoded_blocks:
+        yield U32.pack(len(data))
+        yield data
+
+
+def iter_decode_chain(data: Buffer) -> Iterator:
+    """Lazily decode the blocks of a snapshot produced by encode_chain"""
+    from block import Block
+
+    view = memoryview(data)
+    magic, version, count = CHAIN_HEADER.unpack_from(view, 0)
+    if magic != CHAIN_MAGIC or version > FORMAT_VERSION:
+        raise SerializationError("Not a supported chain snapshot")
+
+    offset = CHAIN_HEADER.size
+    for _ in range(count):
+        (length,) = U32.unpack_from(view, offset)
+        offset += U32.size
+        block, _ = Block.decode(view[offset:offset + length])
+        offset += length
+        yield block
+
+
+def decode_chain(data: Buffer) -> List:
+    """Decode every block of a snapshot produced by encode_chain"""
+    return list(iter_decode_chain(data))
+
+
+class ChainStreamDecoder:
+    """
+    Decodes a snapshot produced by encode_chain as its bytes arrive in
+    arbitrary chunks. Only the bytes of a block not yet complete are held.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.count = None
+        self.decoded = 0
+
+    @property
+    def done(self) -> bool:
+        return self.count is not None and self.decoded == self.count
+
+    def feed(self, chunk: Buffer) -> List:
+        """Add the next chunk; returns the blocks it completed"""
+        from block import Block
+
+        self._buffer += chunk
+        offset = 0
+        if self.count is None:
+            if len(self._buffer) < CHAIN_HEADER.size:
+                return []
+            magic, version, self.count = CHAIN_HEADER.unpack_from(self._buffer, 0)
+            if magic != CHAIN_MAGIC or version > FORMAT_VERSION:
+                raise SerializationError("Not a supported chain snapshot")
+            offset = CHAIN_HEADER.size
+
+        blocks = []
+        while self.decoded < self.count and len(self._buffer) - offset >= U32.size:
+            (length,) = U32.unpack_from(self._buffer, offset)
+            end = offset + U32.size + length
+            if len(self._buffer) < end:
+                break
+            blocks.append(Block.from_bytes(bytes(self._buffer[offset + U32.size:end])))
+            self.decoded += 1
+            offset = end
+        del self._buffer[:offset]
+        if self.done and self._buffer:
+            raise SerializationError("Trailing bytes after chain snapshot")
+        return blocks
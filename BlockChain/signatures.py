@@ -0,0 +1,286 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from worker_pool import WorkerPool
+
+# Ed25519 signatures (RFC 8032) through the `cryptography` package. Signing
+# always needs it: its constant-time implementation keeps private keys from
+# leaking through timing. Verification only handles public data, so without
+# the package it falls back to a pure Python implementation of the scheme
+# and nodes that only validate work without any compiled dependency.
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+    HAVE_CRYPTOGRAPHY = True
+except ImportError:
+    HAVE_CRYPTOGRAPHY = False
+
+SEED_SIZE = 32
+PUBLIC_KEY_SIZE = 32
+SIGNATURE_SIZE = 64
+# An address is the first 20 bytes of the SHA-256 of the public key, in hex
+ADDRESS_SIZE = 20
+
+# Curve constants for edwards25519
+_P = 2 ** 255 - 19
+_L = 2 ** 252 + 27742317777372353535851937790883648493
+_D = -121665 * pow(121666, _P - 2, _P) % _P
+_SQRT_M1 = pow(2, (_P - 1) // 4, _P)
+
+
+def _recover_x(y: int, sign: int) -> Optional[int]:
+    if y >= _P:
+        return None
+    x2 = (y * y - 1) * pow(_D * y * y + 1, _P - 2, _P) % _P
+    if x2 == 0:
+        return None if sign else 0
+    x = pow(x2, (_P + 3) // 8, _P)
+    if (x * x - x2) % _P != 0:
+        x = x * _SQRT_M1 % _P
+    if (x * x - x2) % _P != 0:
+        return None
+    if (x & 1) != sign:
+        x = _P - x
+    return x
+
+
+# Points are kept in extended coordinates (X, Y, Z, T) with x = X/Z, y = Y/Z
+_G_Y = 4 * pow(5, _P - 2, _P) % _P
+_G_X = _recover_x(_G_Y, 0)
+_G = (_G_X, _G_Y, 1, _G_X * _G_Y % _P)
+_IDENTITY = (0, 1, 1, 0)
+
+
+def _point_add(p: tuple, q: tuple) -> tuple:
+    x1, y1, z1, t1 = p
+    x2, y2, z2, t2 = q
+    a = (y1 - x1) * (y2 - x2) % _P
+    b = (y1 + x1) * (y2 + x2) % _P
+    c = 2 * t1 * t2 * _D % _P
+    d = 2 * z1 * z2 % _P
+    e, f, g, h = b - a, d - c, d + c, b + a
+    return e * f % _P, g * h % _P, f * g % _P, e * h % _P
+
+
+def _scalar_mult(scalar: int, point: tuple) -> tuple:
+    result = _IDENTITY
+    while scalar:
+        if scalar & 1:
+            result = _point_add(result, point)
+        point = _point_add(point, point)
+        scalar >>= 1
+    return result
+
+
+def _point_equal(p: tuple, q: tuple) -> bool:
+    x1, y1, z1, _ = p
+    x2, y2, z2, _ = q
+    return (x1 * z2 - x2 * z1) % _P == 0 and (y1 * z2 - y2 * z1) % _P == 0
+
+
+def _compress(point: tuple) -> bytes:
+    x, y, z, _ = point
+    z_inv = pow(z, _P - 2, _P)
+    x, y = x * z_inv % _P, y * z_inv % _P
+    return (y | ((x & 1) << 255)).to_bytes(32, "little")
+
+
+def _decompress(data: bytes) -> Optional[tuple]:
+    y = int.from_bytes(data, "little")
+    sign = y >> 255
+    y &= (1 << 255) - 1
+    x = _recover_x(y, sign)
+    if x is None:
+        return None
+    return x, y, 1, x * y % _P
+
+
+def _hash_int(*parts: bytes) -> int:
+    return int.from_bytes(hashlib.sha512(b"".join(parts)).digest(), "little")
+
+
+def _private_key(seed: bytes) -> 'Ed25519PrivateKey':
+    if not HAVE_CRYPTOGRAPHY:
+        raise RuntimeError("Signing needs the cryptography package")
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def public_key_from_seed(seed: bytes) -> bytes:
+    """Derive the 32-byte public key for a 32-byte private seed"""
+    return _private_key(seed).public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+
+def sign(seed: bytes, message: bytes) -> bytes:
+    """Sign message with the private seed; returns the 64-byte signature"""
+    return _private_key(seed).sign(message)
+
+
+def verify(public_key: bytes, message: bytes, signature: bytes) -> bool:
+    """Check an Ed25519 signature; malformed keys or signatures are simply invalid"""
+    if len(public_key) != PUBLIC_KEY_SIZE or len(signature) != SIGNATURE_SIZE:
+        return False
+    if HAVE_CRYPTOGRAPHY:
+        try:
+            Ed25519PublicKey.from_public_bytes(public_key).verify(signature, message)
+            return True
+        except (InvalidSignature, ValueError):
+            return False
+
+    point_a = _decompress(public_key)
+    point_r = _decompress(signature[:32])
+    s = int.from_bytes(signature[32:], "little")
+    if point_a is None or point_r is None or s >= _L:
+        return False
+    h = _hash_int(signature[:32], public_key, message) % _L
+    return _point_equal(_scalar_mult(s, _G), _point_add(point_r, _scalar_mult(h, point_a)))
+
+
+def address_for(public_key: str) -> str:
+    """The address owned by a hex public key"""
+    return hashlib.sha256(bytes.fromhex(public_key)).hexdigest()[:ADDRESS_SIZE * 2]
+
+
+class KeyPair:
+    """An Ed25519 signing key and the address it controls"""
+
+    def __init__(self, seed: bytes):
+        if len(seed) != SEED_SIZE:
+            raise ValueError(f"Seed must be {SEED_SIZE} bytes")
+        self.seed = seed
+        self.public_key = public_key_from_seed(seed).hex()
+        self.address = address_for(self.public_key)
+
+    @classmethod
+    def generate(cls) -> 'KeyPair':
+        return cls(os.urandom(SEED_SIZE))
+
+    def sign(self, message: bytes) -> str:
+        """Sign message; returns the signature in hex"""
+        return sign(self.seed, message).hex()
+
+
+def _signature_parts(transaction) -> Optional[Tuple[bytes, bytes, bytes]]:
+    """(public key, signed message, signature) of a transaction, or None if it cannot be valid"""
+    if not transaction.signature or not transaction.public_key:
+        return None
+    try:
+        # The sender must be the address of the key that signed
+        if transaction.sender != address_for(transaction.public_key):
+            return None
+        return (bytes.fromhex(transaction.public_key), transaction.hash_bytes(),
+                bytes.fromhex(transaction.signature))
+    except ValueError:
+        return None
+
+
+def _verify_batch(batch: List[Tuple[bytes, bytes, bytes]]) -> List[bool]:
+    """Pool task: verify (public key, message, signature) triples"""
+    return [verify(*parts) for parts in batch]
+
+
+class SignatureCache:
+    """
+    LRU set of transactions whose signatures already verified, keyed by
+    transaction hash. An entry only matches the same key and signature, so
+    re-signing a transaction's contents does not inherit the verdict.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, tx_hash: bytes, public_key: str, signature: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(tx_hash)
+            if entry == (public_key, signature):
+                self._entries.move_to_end(tx_hash)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, tx_hash: bytes, public_key: str, signature: str) -> None:
+        with self._lock:
+            self._entries[tx_hash] = (public_key, signature)
+            self._entries.move_to_end(tx_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by mempool admission and block validation in this process
+default_cache = SignatureCache()
+
+
+def verify_transaction(transaction, cache: Optional[SignatureCache] = default_cache) -> bool:
+    """Check that a transaction is signed by the key owning its sender address"""
+    parts = _signature_parts(transaction)
+    if parts is None:
+        return False
+    tx_hash = parts[1]
+    if cache is not None and cache.contains(tx_hash, transaction.public_key, transaction.signature):
+        return True
+    if not verify(*parts):
+        return False
+    if cache is not None:
+        cache.add(tx_hash, transaction.public_key, transaction.signature)
+    return True
+
+
+class SignatureVerifier(WorkerPool):
+    """
+    Verifies many transaction signatures at once, such as all of a block's,
+    on a pool of worker processes. Signatures found in the cache are not
+    checked again, and every signature verified is added to it.
+    """
+
+    def __init__(self, workers: Optional[int] = None, cache: Optional[SignatureCache] = default_cache,
+                 batch_size: int = 64, min_parallel: int = 32):
+        super().__init__(workers)
+        self.cache = cache
+        self.batch_size = batch_size
+        # Fewer uncached signatures are verified in-process
+        self.min_parallel = min_parallel
+
+    def verify_transactions(self, transactions: Sequence) -> List[bool]:
+        """Return whether each transaction's signature is valid, in order"""
+        results = [False] * len(transactions)
+        todo = []
+        for position, transaction in enumerate(transactions):
+            parts = _signature_parts(transaction)
+            if parts is None:
+                continue
+            if self.cache is not None and self.cache.contains(parts[1], transaction.public_key,
+                                                              transaction.signature):
+                results[position] = True
+            else:
+                todo.append((position, parts))
+
+        if self.workers > 1 and len(todo) >= self.min_parallel:
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_verify_batch, [parts for _, parts in todo[i:i + self.batch_size]])
+                for i in range(0, len(todo), self.batch_size)
+            ]
+            verdicts = [valid for future in futures for valid in future.result()]
+        else:
+            verdicts = _verify_batch([parts for _, parts in todo])
+
+        for (position, parts), valid in zip(todo, verdicts):
+            results[position] = valid
+            if valid and self.cache is not None:
+                transaction = transactions[position]
+                self.cache.add(parts[1], transaction.public_key, transaction.signature)
+        return results
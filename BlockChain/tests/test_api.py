@@ -0,0 +1,305 @@
+import json
+import os
+import time
+import unittest
+import zlib
+from unittest import mock
+from signatures import KeyPair
+from transaction import Transaction
+
+# Blocks are only mined when a test asks for one
+with mock.patch.dict(os.environ, {'BLOCK_INTERVAL': '3600', 'MINING_WORKERS': '1'}):
+    import api
+
+SENDER = KeyPair(bytes(31) + b"\x07")
+
+
+def setUpModule():
+    api.producer.stop()
+    api.blockchain.difficulty = 1
+    mine(SENDER.address)
+
+
+def mine(miner_address: str = "miner_address"):
+    block = api.blockchain.mine_pending_transactions(miner_address)
+    api.chain_state.publish_block(block)
+    return block
+
+
+def signed_form(recipient: str, amount: float) -> dict:
+    transaction = Transaction(SENDER.address, recipient, amount, 1_800_000_000.5)
+    transaction.sign(SENDER)
+    return {
+        'sender': transaction.sender,
+        'recipient': recipient,
+        'amount': str(amount),
+        'timestamp': '1800000000.5',
+        'signature': transaction.signature,
+        'public_key': transaction.public_key
+    }
+
+
+class TestCreateTransaction(unittest.TestCase):
+    def setUp(self):
+        self.client = api.app.test_client()
+
+    def test_dashboard_signs_in_the_browser(self):
+        page = self.client.get('/').get_data(as_text=True)
+        self.assertIn('crypto.subtle.sign', page)
+        self.assertNotIn('name="sender"', page)
+
+    def test_signed_transaction_is_accepted(self):
+        response = self.client.post('/create_transaction', data=signed_form("Dave", 1.5))
+        self.assertEqual(response.status_code, 202)
+        tx_hash = response.get_json()['tx_hash']
+        self.assertTrue(api.chain_state.is_pending(tx_hash))
+
+    def test_unsigned_transaction_is_refused(self):
+        form = signed_form("Erin", 1.0)
+        for missing in ('signature', 'public_key', 'timestamp'):
+            data = {name: value for name, value in form.items() if name != missing}
+            response = self.client.post('/create_transaction', data=data)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.get_json()['success'])
+
+    def test_tampered_transaction_is_refused(self):
+        form = signed_form("Erin", 1.0)
+        form['amount'] = '2.0'
+        response = self.client.post('/create_transaction', data=form)
+        self.assertEqual(response.status_code, 400)
+
+
+class TestStatus(unittest.TestCase):
+    def setUp(self):
+        self.client = api.app.test_client()
+
+    def test_transaction_goes_from_pending_to_confirmed(self):
+        submitted = self.client.post('/create_transaction', data=signed_form("Frank", 0.5))
+        tx_hash = submitted.get_json()['tx_hash']
+        status = self.client.get(f'/transactions/{tx_hash}/status')
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual(status.get_json(), {'tx_hash': tx_hash, 'status': 'pending'})
+
+        block = mine()
+        confirmed = self.client.get(f'/transactions/{tx_hash}/status').get_json()
+        self.assertEqual(confirmed, {'tx_hash': tx_hash, 'status': 'confirmed',
+                                     'block_index': block.index, 'confirmations': 1})
+        mine()
+        self.assertEqual(self.client.get(f'/transactions/{tx_hash}/status').get_json()['confirmations'], 2)
+
+    def test_unknown_transaction_is_not_found(self):
+        response = self.client.get(f"/transactions/{'ab' * 32}/status")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['status'], 'unknown')
+
+    def test_chain_status_reports_the_tip(self):
+        block = mine()
+        status = self.client.get('/chain/status').get_json()
+        self.assertEqual(status, {
+            'length': len(api.blockchain.chain),
+            'is_valid': True,
+            'difficulty': api.blockchain.difficulty,
+            'tip_index': block.index,
+            'tip_hash': block.hash
+        })
+
+
+class TestCachedByTip(unittest.TestCase):
+    def setUp(self):
+        self.client = api.app.test_client()
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get('/chain/status')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        self.assertIn('Accept', response.headers['Vary'])
+
+        revalidated = self.client.get('/chain/status', headers={'If-None-Match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.get_data(), b'')
+        self.assertEqual(revalidated.headers['ETag'], etag)
+
+    def test_etag_changes_with_the_tip(self):
+        etag = self.client.get('/chain/status').headers['ETag']
+        mine()
+        response = self.client.get('/chain/status', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.get_json()['tip_hash'], api.blockchain.get_latest_block().hash)
+
+    def test_representations_are_cached_per_accept_header(self):
+        """A JSON page cached for /blocks is not served to an NDJSON client, or the reverse"""
+        as_json = self.client.get('/blocks', headers={'Accept': 'application/json'})
+        as_ndjson = self.client.get('/blocks', headers={'Accept': 'application/x-ndjson'})
+        again = self.client.get('/blocks', headers={'Accept': 'application/json'})
+
+        self.assertEqual(as_json.mimetype, 'application/json')
+        self.assertEqual(as_ndjson.mimetype, 'application/x-ndjson')
+        self.assertEqual(again.mimetype, 'application/json')
+        self.assertEqual(again.headers['ETag'], as_json.headers['ETag'])
+        self.assertIn('Accept', as_ndjson.headers['Vary'])
+
+
+class TestBlocks(unittest.TestCase):
+    def setUp(self):
+        self.client = api.app.test_client()
+        while len(api.blockchain.chain) < 6:
+            mine()
+        self.length = len(api.blockchain.chain)
+
+    def test_pages_follow_the_after_cursor(self):
+        first = self.client.get('/blocks?limit=2').get_json()
+        self.assertEqual([block['block_index'] for block in first['blocks']], [0, 1])
+        self.assertEqual(first['next_cursor'], 1)
+
+        second = self.client.get(f"/blocks?limit=2&after={first['next_cursor']}").get_json()
+        self.assertEqual([block['block_index'] for block in second['blocks']], [2, 3])
+
+        last = self.client.get(f'/blocks?limit=2&after={self.length - 2}').get_json()
+        self.assertEqual([block['block_index'] for block in last['blocks']], [self.length - 1])
+        self.assertIsNone(last['next_cursor'])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.client.get('/blocks?limit=0').get_json()['blocks']), 1)
+        self.assertEqual(len(self.client.get('/blocks?limit=-5').get_json()['blocks']), 1)
+        with mock.patch.object(api, 'MAX_PAGE_SIZE', 3):
+            page = self.client.get('/blocks?limit=1000&after=0').get_json()
+        self.assertEqual([block['block_index'] for block in page['blocks']], [1, 2, 3])
+
+    def test_stream_is_one_json_document_per_line(self):
+        for request in ({'query_string': {'stream': '1', 'after': '1'}},
+                        {'query_string': {'after': '1'}, 'headers': {'Accept': 'application/x-ndjson'}}):
+            response = self.client.get('/blocks', **request)
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            self.assertNotIn('Content-Encoding', response.headers)
+            body = response.get_data()
+            self.assertTrue(body.endswith(b'\n'))
+            blocks = [json.loads(line) for line in body.splitlines()]
+            self.assertEqual([block['block_index'] for block in blocks], list(range(2, self.length)))
+            self.assertEqual(blocks[-1]['hash'], api.blockchain.get_latest_block().hash)
+
+    def test_stream_is_gzipped_only_when_accepted(self):
+        plain = self.client.get('/blocks?stream=1').get_data()
+        for accept_encoding, compressed in (('gzip', True), ('br, gzip;q=0.5', True),
+                                            ('gzip;q=0', False), ('deflate', False)):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.client.get('/blocks?stream=1', headers={'Accept-Encoding': accept_encoding})
+                self.assertIn('Accept-Encoding', response.headers['Vary'])
+                body = response.get_data()
+                if compressed:
+                    self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+                    # wbits=31: gzip framing
+                    self.assertEqual(zlib.decompress(body, wbits=31), plain)
+                else:
+                    self.assertNotIn('Content-Encoding', response.headers)
+                    self.assertEqual(body, plain)
+
+
+class TestEvents(unittest.TestCase):
+    def setUp(self):
+        self.client = api.app.test_client()
+        # The test client reads the first chunk of a stream before returning it
+        keepalive = mock.patch.object(api, 'EVENT_KEEPALIVE', 0.01)
+        keepalive.start()
+        self.addCleanup(keepalive.stop)
+
+    def open_stream(self, headers=None):
+        response = self.client.get('/events', headers=headers, buffered=False)
+        self.addCleanup(response.close)
+        return response
+
+    def next_event(self, response) -> str:
+        for chunk in response.response:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk != ': keep-alive\n\n':
+                return chunk
+
+    def test_events_are_framed_as_server_sent_events(self):
+        response = self.open_stream()
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+
+        block = mine()
+        chunk = self.next_event(response)
+        lines = chunk.split('\n')
+        self.assertTrue(lines[0].startswith('id: '))
+        self.assertEqual(lines[1], 'event: block')
+        self.assertTrue(lines[2].startswith('data: '))
+        self.assertEqual(json.loads(lines[2][len('data: '):])['hash'], block.hash)
+        self.assertTrue(chunk.endswith('\n\n'))
+
+    def test_idle_streams_get_keep_alive_comments(self):
+        response = self.open_stream()
+        chunk = next(response.response)
+        self.assertEqual(chunk.decode() if isinstance(chunk, bytes) else chunk, ': keep-alive\n\n')
+
+    def test_last_event_id_replays_missed_events(self):
+        first = api.events.publish('transaction', {'tx_hash': 'a'})
+        api.events.publish('transaction', {'tx_hash': 'b'})
+        response = self.open_stream({'Last-Event-ID': str(first[0])})
+        chunk = self.next_event(response)
+        self.assertIn('"tx_hash":"b"', chunk)
+
+    def test_streams_beyond_the_cap_are_refused(self):
+        with mock.patch.object(api.events, 'max_subscribers', api.events.subscriber_count + 1):
+            self.open_stream()
+            refused = self.client.get('/events')
+        self.assertEqual(refused.status_code, 503)
+        self.assertEqual(refused.headers['Retry-After'], str(api.EVENT_KEEPALIVE))
+        self.assertFalse(refused.get_json()['success'])
+
+
+class TestTransactionQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.window_start = time.time() - 1
+        for _ in range(5):
+            mine("Pager")
+        cls.window_end = time.time() + 1
+
+    def setUp(self):
+        self.client = api.app.test_client()
+
+    def follow(self, url: str, **params) -> list:
+        """Every page of a paged query, following next_cursor"""
+        pages = []
+        cursor = None
+        while True:
+            query = dict(params, limit=2)
+            if cursor is not None:
+                query['cursor'] = cursor
+            page = self.client.get(url, query_string=query).get_json()
+            pages.append(page['transactions'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return pages
+
+    def test_address_history_pages_newest_first(self):
+        pages = self.follow('/address/Pager/transactions')
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [tx['id'] for page in pages for tx in page]
+        self.assertEqual(ids, sorted(set(ids), reverse=True))
+        self.assertTrue(all(tx['recipient'] == 'Pager' for page in pages for tx in page))
+
+    def test_time_window_pages_oldest_first(self):
+        window = {'start': self.window_start, 'end': self.window_end}
+        pages = self.follow('/transactions', **window)
+        self.assertGreater(len(pages), 2)
+        paged = [tx['id'] for page in pages for tx in page]
+        whole = self.client.get('/transactions', query_string=dict(window, limit=500)).get_json()
+        self.assertEqual(paged, [tx['id'] for tx in whole['transactions']])
+        self.assertIsNone(whole['next_cursor'])
+        self.assertEqual(len([tx for page in pages for tx in page if tx['recipient'] == 'Pager']), 5)
+
+    def test_malformed_cursors_are_rejected(self):
+        for url in ('/transactions?cursor=abc', '/transactions?cursor=1.5',
+                    '/transactions?cursor=x:1', '/address/Pager/transactions?cursor=abc'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json(), {'error': 'Invalid cursor'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import time
+import unittest
+from unittest import mock
+from block_producer import BlockProducer
+from blockchain import Blockchain
+from signatures import KeyPair
+from transaction import Transaction
+
+
+class TestBlockProducer(unittest.TestCase):
+    def setUp(self):
+        self.blockchain = Blockchain(difficulty=1)
+        self.alice = KeyPair(bytes(31) + b"\x01")
+        # Alice's block reward funds the transfers
+        self.blockchain.mine_pending_transactions(self.alice.address)
+
+    def transfer(self, recipient: str, amount: float = 1.0) -> Transaction:
+        transaction = Transaction(self.alice.address, recipient, amount)
+        transaction.sign(self.alice)
+        return transaction
+
+    def wait_for_length(self, length, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.blockchain.chain) < length and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return len(self.blockchain.chain)
+
+    def test_submit_returns_without_mining(self):
+        """Submissions only queue the transaction and return its hash"""
+        producer = BlockProducer(self.blockchain, "miner", interval=60)
+        tx = self.transfer("Bob")
+        self.assertEqual(producer.submit(tx), tx.calculate_hash())
+        self.assertEqual(len(self.blockchain.chain), 2)
+        self.assertEqual(self.blockchain.pending_transactions, [tx])
+
+    def test_submissions_are_checked_against_the_ledger(self):
+        """A sender cannot spend more than their balance net of pending spends"""
+        producer = BlockProducer(self.blockchain, "miner", interval=60)
+        producer.submit(self.transfer("Bob", 6.0))
+        with self.assertRaises(ValueError):
+            producer.submit(self.transfer("Carol", 6.0))
+        eve = KeyPair(bytes(31) + b"\x02")
+        overspend = Transaction(eve.address, "Mallory", 1000.0)
+        overspend.sign(eve)
+        with self.assertRaises(ValueError):
+            producer.submit(overspend)
+        self.assertEqual(len(self.blockchain.mempool), 1)
+
+    def test_unsigned_transactions_are_refused(self):
+        producer = BlockProducer(self.blockchain, "miner", interval=60)
+        for transaction in (Transaction(self.alice.address, "Bob", 1.0),
+                            Transaction("System", "Mallory", 10.0)):
+            with self.assertRaises(ValueError):
+                producer.submit(transaction)
+        self.assertEqual(len(self.blockchain.mempool), 0)
+
+    def test_size_threshold_triggers_a_block(self):
+        """A full batch is mined without waiting for the interval"""
+        with BlockProducer(self.blockchain, "miner", interval=60, max_transactions=3) as producer:
+            for i in range(3):
+                producer.submit(self.transfer(f"User{i}"))
+            self.assertEqual(self.wait_for_length(3), 3)
+        self.assertEqual(len(self.blockchain.chain[2].transactions), 4)
+        self.assertEqual(self.blockchain.pending_transactions, [])
+
+    def test_interval_flushes_partial_batches(self):
+        """Pending transactions are mined on schedule even below the threshold"""
+        with BlockProducer(self.blockchain, "miner", interval=0.05, max_transactions=100) as producer:
+            producer.submit(self.transfer("Bob"))
+            self.assertEqual(self.wait_for_length(3), 3)
+            time.sleep(0.2)
+        # Nothing was pending afterwards, so no empty blocks were produced
+        self.assertEqual(len(self.blockchain.chain), 3)
+        self.assertEqual(producer.blocks_produced, 1)
+
+    def test_failed_block_does_not_stop_the_producer(self):
+        """A mining error is logged and the transactions are mined on the next attempt"""
+        mine = self.blockchain.mine_pending_transactions
+        failures = [RuntimeError("miner pool crashed")]
+
+        def flaky_mine(*args):
+            if failures:
+                raise failures.pop()
+            return mine(*args)
+
+        with mock.patch.object(self.blockchain, 'mine_pending_transactions', side_effect=flaky_mine):
+            with self.assertLogs('block_producer', level='ERROR') as logs:
+                with BlockProducer(self.blockchain, "miner", interval=0.05) as producer:
+                    producer.submit(self.transfer("Bob"))
+                    self.assertEqual(self.wait_for_length(3), 3)
+        self.assertEqual(producer.blocks_produced, 1)
+        self.assertEqual(self.blockchain.pending_transactions, [])
+        self.assertIn("miner pool crashed", logs.output[0])
+        self.assertIsNotNone(logs.records[0].exc_info)
+
+
+if __name__ == '__main__':
+    unittest.main()
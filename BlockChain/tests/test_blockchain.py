@@ -1,10 +1,13 @@
 import unittest
+from unittest import mock
 from datetime import datetime
 import time
 from blockchain import Blockchain
 from block import Block
 from transaction import Transaction, TransactionProcessor
 from blockchain_db import BlockchainDB
+from merkle import MerkleTree
+from signatures import KeyPair
 
 class TestBlockchain(unittest.TestCase):
     def setUp(self):
@@ -63,6 +66,145 @@ class TestBlockchain(unittest.TestCase):
         miner_balance = self.tx_processor.get_balance(miner_address, self.blockchain)
         self.assertEqual(miner_balance, self.blockchain.mining_reward)
 
+    def test_balance_ledger(self):
+        """The incremental ledger agrees with a full rescan"""
+        self.blockchain.add_pending_transaction(Transaction("Alice", "Bob", 0.1))
+        self.blockchain.add_pending_transaction(Transaction("Alice", "Bob", 0.2))
+        self.blockchain.mine_pending_transactions("miner")
+
+        self.assertAlmostEqual(self.tx_processor.get_balance("Bob", self.blockchain), 0.3)
+        self.assertTrue(self.blockchain.verify_ledger())
+
+        # A block appended behind the ledger's back is reported
+        self.blockchain.chain.append(Block(2, [Transaction("Bob", "Eve", 1.0)], "0"))
+        self.assertEqual(
+            set(self.blockchain.ledger.find_inconsistencies(self.blockchain.chain)),
+            {"Bob", "Eve"}
+        )
+
+    def test_unconfirmed_overspend_rejected(self):
+        """A sender cannot spend the same balance twice before it is mined"""
+        alice = KeyPair(bytes(31) + b"\x01")
+        self.blockchain.mine_pending_transactions(alice.address)  # Alice earns the reward
+        reward = self.blockchain.mining_reward
+
+        first = Transaction(alice.address, "Bob", reward * 0.6)
+        second = Transaction(alice.address, "Charlie", reward * 0.6)
+        first.sign(alice)
+        second.sign(alice)
+        self.assertTrue(self.blockchain.admit_transaction(first))
+        self.assertFalse(self.blockchain.admit_transaction(second))
+
+        # Once the first spend is confirmed the remaining balance is still enforced
+        self.blockchain.mine_pending_transactions("miner")
+        self.assertEqual(self.blockchain.pending_spends, {})
+        self.assertFalse(self.blockchain.admit_transaction(second))
+
+    def test_peer_blocks_cannot_lower_the_difficulty(self):
+        """A peer block is held to the chain's difficulty, not the one it states"""
+        tip = self.blockchain.get_latest_block()
+        block = Block(tip.index + 1, [Transaction("System", "mallory", 1e6)], tip.hash)
+        block.mine_block(0)
+        block.nonce += 1
+        while block.calculate_hash().startswith("0"):
+            block.nonce += 1
+        block.hash = block.calculate_hash()
+        received = Block.from_bytes(block.to_bytes())
+        self.assertEqual(received.difficulty, 0)
+        self.assertFalse(self.blockchain.add_block_from_peer(received))
+        self.assertEqual(self.blockchain.ledger.get_balance("mallory"), 0)
+
+        block.mine_block(self.blockchain.difficulty)
+        self.assertTrue(self.blockchain.add_block_from_peer(Block.from_bytes(block.to_bytes())))
+
+    def test_block_mined_on_a_stale_tip_is_dropped(self):
+        """A block prepared before the tip moved is not appended, and its transactions stay pending"""
+        tx = Transaction("Alice", "Bob", 5.0)
+        self.blockchain.add_pending_transaction(tx)
+        stale = self.blockchain.prepare_block("miner")
+        stale.mine_block(self.blockchain.difficulty)
+
+        tip = self.blockchain.get_latest_block()
+        peer_block = Block(tip.index + 1, [Transaction("System", "peer", 10.0)], tip.hash)
+        peer_block.mine_block(self.blockchain.difficulty)
+        self.assertTrue(self.blockchain.add_block_from_peer(peer_block))
+
+        self.assertFalse(self.blockchain.append_mined_block(stale))
+        self.assertEqual(self.blockchain.get_latest_block().hash, peer_block.hash)
+        self.assertEqual(self.blockchain.pending_transactions, [tx])
+        self.assertEqual(self.blockchain.ledger.get_balance("miner"), 0)
+
+class TestMerkleRoot(unittest.TestCase):
+    def test_incremental_tree_matches_full_rebuild(self):
+        """Appending leaves one by one gives the same root as a full rebuild"""
+        tree = MerkleTree()
+        leaves = []
+        for i in range(1, 12):
+            leaf = Transaction(f"User{i}", "Bob", float(i)).hash_bytes()
+            leaves.append(leaf)
+            tree.append(leaf)
+            self.assertEqual(tree.root, MerkleTree.compute_root(leaves))
+
+    def test_block_template_updates_root(self):
+        """Transactions appended to a template are committed by the header hash"""
+        block = Block(1, [], "0" * 64)
+        empty_hash = block.calculate_hash()
+        block.add_transaction(Transaction("Alice", "Bob", 5.0))
+        block.add_transaction(Transaction("Bob", "Charlie", 2.0))
+
+        self.assertEqual(block.merkle_root, block.compute_merkle_root())
+        self.assertNotEqual(block.calculate_hash(), empty_hash)
+
+class TestIncrementalValidation(unittest.TestCase):
+    def setUp(self):
+        self.blockchain = Blockchain(difficulty=1)
+        for i in range(5):
+            self.blockchain.add_block([Transaction("Alice", f"User{i}", 1.0)])
+        self.assertTrue(self.blockchain.is_chain_valid())
+
+    def count_hashes(self, **kwargs):
+        """Run is_chain_valid and count how many block hashes it recomputed"""
+        with mock.patch.object(Block, 'calculate_hash', autospec=True,
+                               side_effect=Block.calculate_hash) as calculate_hash:
+            valid = self.blockchain.is_chain_valid(**kwargs)
+        return valid, calculate_hash.call_count
+
+    def test_only_new_blocks_are_rehashed(self):
+        self.assertEqual(self.blockchain.verified_height, 5)
+        self.assertEqual(self.count_hashes(), (True, 0))
+
+        self.blockchain.add_block([Transaction("Bob", "Carol", 1.0)])
+        self.assertEqual(self.count_hashes(), (True, 1))
+        self.assertEqual(self.count_hashes(deep=True), (True, 6))
+
+    def test_mutation_below_the_watermark_is_detected(self):
+        """Editing a verified transaction re-checks just its block"""
+        transaction = self.blockchain.chain[2].transactions[0]
+        transaction.amount = 100.0
+        self.assertEqual(self.count_hashes(), (False, 0))
+
+        # Still reported until the change is undone
+        self.assertFalse(self.blockchain.is_chain_valid())
+        transaction.amount = 1.0
+        self.assertEqual(self.count_hashes(), (True, 1))
+
+    def test_replaced_transaction_is_detected(self):
+        self.blockchain.chain[1].transactions[0] = Transaction("Alice", "Mallory", 100.0)
+        self.assertFalse(self.blockchain.is_chain_valid())
+
+    def test_appended_transaction_is_detected(self):
+        self.blockchain.chain[2].transactions.append(Transaction("Alice", "Mallory", 100.0))
+        self.assertFalse(self.blockchain.is_chain_valid())
+        # Undoing the change leaves the block intact again
+        self.blockchain.chain[2].transactions.pop()
+        self.assertTrue(self.blockchain.is_chain_valid())
+
+    def test_deep_audit_finds_untracked_changes(self):
+        """Changes that bypass the mutation hooks are only caught by a deep audit"""
+        object.__setattr__(self.blockchain.chain[3], 'nonce', 12345)
+        self.assertTrue(self.blockchain.is_chain_valid())
+        self.assertFalse(self.blockchain.is_chain_valid(deep=True))
+
 class TestBlockchainPerformance(unittest.TestCase):
     def setUp(self):
         self.blockchain = Blockchain(difficulty=3)
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from blockchain import Blockchain
+from blockchain_db import BlockchainDB
+from chain_verifier import ParallelVerifier
+from security import BlockchainSecurity
+from signatures import KeyPair
+from transaction import Transaction
+
+ALICE = KeyPair(bytes(31) + b"\x01")
+
+
+class TestParallelVerifier(unittest.TestCase):
+    def setUp(self):
+        self.verifier = ParallelVerifier(workers=2, shard_size=3, min_parallel_blocks=0)
+        self.blockchain = Blockchain(difficulty=1)
+        for i in range(10):
+            transaction = Transaction(ALICE.address, f"User{i}", 1.0, timestamp=1700000000.0 + i)
+            transaction.sign(ALICE)
+            self.blockchain.add_block([transaction])
+
+    def tearDown(self):
+        self.verifier.shutdown()
+
+    def tamper(self) -> None:
+        chain = self.blockchain.chain
+        chain[2].transactions[0].signature = None
+        chain[4].transactions[0].amount = 500.0
+        chain[7].previous_hash = "0" * 64
+
+    def test_clean_chain(self):
+        chain = self.blockchain.chain
+        self.assertTrue(BlockchainSecurity.verify_chain_integrity(chain, verifier=self.verifier))
+        self.assertEqual(BlockchainSecurity.audit_chain(chain[1:], verifier=self.verifier), [])
+
+    def test_audit_matches_serial_report(self):
+        """Sharding across workers produces the same report as the serial audit"""
+        self.tamper()
+        chain = self.blockchain.chain
+        report = self.verifier.audit_chain(chain)
+        self.assertEqual(report, BlockchainSecurity.audit_chain(chain))
+        self.assertEqual([entry['block_index'] for entry in report], [2, 4, 7])
+        self.assertIn('Invalid block linkage', report[2]['issues'])
+        self.assertFalse(self.verifier.verify_chain(chain))
+        self.assertEqual(set(self.verifier.timings), {'encode', 'hash', 'linkage', 'total'})
+
+    def test_serial_fallback_matches(self):
+        """Small chains are checked in-process with the same results"""
+        self.tamper()
+        chain = self.blockchain.chain
+        with ParallelVerifier(workers=2) as verifier:
+            self.assertEqual(verifier.audit_chain(chain), self.verifier.audit_chain(chain))
+            self.assertIsNone(verifier._executor)
+
+    def test_blockchain_full_scan_uses_verifier(self):
+        self.blockchain.verifier = self.verifier
+        self.assertTrue(self.blockchain.is_chain_valid())
+        self.assertEqual(self.blockchain.verified_height, 10)
+        self.blockchain.chain[4].transactions[0].amount = 500.0
+        self.assertFalse(self.blockchain.is_chain_valid(deep=True))
+
+    def test_stored_chain_is_checked_from_its_encodings(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = BlockchainDB(os.path.join(tmp_dir, "chain.db"))
+            stored = Blockchain(difficulty=1, db=db)
+            for block in self.blockchain.chain[1:]:
+                stored.add_block([Transaction(tx.sender, tx.recipient, tx.amount, tx.timestamp,
+                                              tx.signature, tx.public_key)
+                                  for tx in block.transactions])
+            # The tip is resident, so its in-memory state is what gets checked
+            stored.chain[-1].nonce += 1
+
+            report = self.verifier.audit_chain(stored.chain)
+            self.assertEqual(report, BlockchainSecurity.audit_chain(stored.chain))
+            self.assertEqual([entry['block_index'] for entry in report], [10])
+            self.assertTrue(self.verifier.verify_chain(stored.chain[:10]))
+            db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from gossip import BLOCK, TRANSACTION, Inventory, SeenCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSeenCache(unittest.TestCase):
+    def test_forgets_least_recently_used(self):
+        cache = SeenCache(2)
+        cache.add("a", 1)
+        cache.add("b", 2)
+        cache.get("a")
+        cache.add("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+
+
+class TestInventory(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.inventory = Inventory(request_timeout=10.0, clock=self.clock)
+
+    def test_only_unseen_items_are_wanted_once(self):
+        self.inventory.remember("known", b"frames")
+        items = [[BLOCK, "known"], [TRANSACTION, "new"], ["unknown-kind", "other"]]
+        self.assertEqual(self.inventory.wanted("peer1", items), [[TRANSACTION, "new"]])
+        # Another peer announcing the same item while it is outstanding is not asked
+        self.assertEqual(self.inventory.wanted("peer2", [[TRANSACTION, "new"]]), [])
+        self.assertTrue(self.inventory.peer_knows("peer2", "new"))
+
+    def test_requests_expire(self):
+        self.inventory.wanted("peer1", [[BLOCK, "slow"]])
+        self.clock.now = 11.0
+        self.assertEqual(self.inventory.wanted("peer2", [[BLOCK, "slow"]]), [[BLOCK, "slow"]])
+
+    def test_received_items_are_served_and_not_requested(self):
+        self.inventory.wanted("peer1", [[BLOCK, "h"]])
+        self.inventory.remember("h", b"frames")
+        self.assertEqual(self.inventory.frames_for("h"), b"frames")
+        self.clock.now = 11.0
+        self.assertEqual(self.inventory.wanted("peer2", [[BLOCK, "h"]]), [])
+
+    def test_announcements_are_batched_per_peer(self):
+        self.inventory.announce("peer1", BLOCK, "a")
+        self.inventory.announce("peer1", TRANSACTION, "b")
+        self.inventory.announce("peer2", BLOCK, "a")
+        self.assertEqual(self.inventory.take_announcements(), {
+            "peer1": [[BLOCK, "a"], [TRANSACTION, "b"]],
+            "peer2": [[BLOCK, "a"]]
+        })
+        self.assertEqual(self.inventory.take_announcements(), {})
+        self.assertTrue(self.inventory.peer_knows("peer1", "b"))
+
+        self.inventory.forget_peer("peer1")
+        self.assertFalse(self.inventory.peer_knows("peer1", "b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
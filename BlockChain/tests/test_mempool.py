@@ -0,0 +1,168 @@
+import unittest
+from blockchain import Blockchain
+from mempool import Mempool, MempoolError
+from signatures import KeyPair
+from transaction import Transaction, TransactionProcessor
+
+
+def make_tx(sender: str = "Alice", fee: float = 0.0, nonce=None, amount: float = 1.0) -> Transaction:
+    return Transaction(sender, "Bob", amount, timestamp=1700000000.0, fee=fee, nonce=nonce)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestMempool(unittest.TestCase):
+    def test_deduplicates_by_hash(self):
+        mempool = Mempool()
+        mempool.add(make_tx())
+        with self.assertRaises(MempoolError):
+            mempool.add(make_tx())
+        self.assertEqual(len(mempool), 1)
+
+    def test_template_takes_highest_fee_rate_within_size_limit(self):
+        mempool = Mempool()
+        low, mid, high = make_tx("A", 0.001), make_tx("B", 0.01), make_tx("C", 0.1)
+        for tx in (low, mid, high):
+            mempool.add(tx)
+
+        size = len(high.encode())
+        self.assertEqual(mempool.block_template(max_bytes=2 * size), [high, mid])
+        self.assertEqual(mempool.block_template(max_bytes=10 * size, max_count=1), [high])
+        # Building a template leaves the transactions pending
+        self.assertEqual(len(mempool), 3)
+
+    def test_sender_nonces_are_mined_in_order(self):
+        next_nonces = {"Alice": 0}
+        mempool = Mempool(next_nonce=lambda address: next_nonces.get(address, 0))
+        first, second, gap = make_tx(nonce=0, fee=0.001), make_tx(nonce=1, fee=0.5), make_tx(nonce=3, fee=1.0)
+        for tx in (second, gap, first):
+            mempool.add(tx)
+        other = make_tx("Carol", fee=0.01)
+        mempool.add(other)
+
+        # The high-fee nonce 1 waits for nonce 0; nonce 3 waits for the missing 2
+        self.assertEqual(mempool.block_template(max_bytes=10 ** 6), [other, first, second])
+
+        next_nonces["Alice"] = 2
+        mempool.remove_confirmed([first, second])
+        with self.assertRaises(MempoolError):
+            mempool.add(make_tx(nonce=1, fee=5.0))
+
+    def test_replace_by_fee(self):
+        mempool = Mempool()
+        original = make_tx(nonce=0, fee=0.01)
+        mempool.add(original)
+        with self.assertRaises(MempoolError):
+            mempool.add(make_tx(nonce=0, fee=0.0105, amount=2.0))
+
+        replacement = make_tx(nonce=0, fee=0.02, amount=2.0)
+        mempool.add(replacement)
+        self.assertEqual(mempool.transactions(), [replacement])
+        self.assertEqual(mempool.spent_units("Alice"), 202_000_000)
+
+    def test_evicted_replacement_keeps_the_original(self):
+        original, other = make_tx(nonce=0, fee=0.01), make_tx("Carol", fee=0.1)
+        mempool = Mempool(max_bytes=len(original.encode()) + len(other.encode()))
+        mempool.add(original)
+        mempool.add(other)
+
+        # Outbids the original, but is larger and still the lowest fee rate once
+        # the mempool is over its size cap
+        replacement = Transaction("Alice", "Bob" * 20, 1.0, timestamp=1700000000.0, fee=0.05, nonce=0)
+        with self.assertRaises(MempoolError):
+            mempool.add(replacement)
+        self.assertEqual(mempool.transactions(), [original, other])
+        self.assertEqual(mempool.spent_units("Alice"), 101_000_000)
+        self.assertEqual(mempool.size_bytes, len(original.encode()) + len(other.encode()))
+
+        # The restored original can still be replaced
+        better = make_tx(nonce=0, fee=0.05, amount=2.0)
+        mempool.add(better)
+        self.assertEqual(mempool.transactions(), [other, better])
+
+    def test_lowest_fee_rate_is_evicted_when_full(self):
+        mempool = Mempool(max_count=2)
+        cheap, dear = make_tx("A", 0.01), make_tx("B", 0.1)
+        mempool.add(cheap)
+        mempool.add(dear)
+
+        with self.assertRaises(MempoolError):
+            mempool.add(make_tx("C", 0.001))
+        mempool.add(make_tx("D", 0.05))
+        self.assertNotIn(cheap.calculate_hash(), mempool)
+        self.assertEqual(len(mempool), 2)
+
+        size = len(dear.encode())
+        by_bytes = Mempool(max_bytes=2 * size)
+        by_bytes.add(cheap)
+        by_bytes.add(dear)
+        by_bytes.add(make_tx("D", 0.05))
+        self.assertEqual(by_bytes.size_bytes, 2 * size)
+        self.assertNotIn(cheap.calculate_hash(), by_bytes)
+
+    def test_evicting_a_nonce_drops_later_nonces(self):
+        mempool = Mempool(max_count=3)
+        mempool.add(make_tx(nonce=0, fee=0.001))
+        mempool.add(make_tx(nonce=1, fee=1.0))
+        mempool.add(make_tx("Carol", fee=0.1))
+        mempool.add(make_tx("Dave", fee=0.1))
+        self.assertEqual([tx.sender for tx in mempool], ["Carol", "Dave"])
+        self.assertEqual(mempool.spends(), {"Carol": 110_000_000, "Dave": 110_000_000})
+
+    def test_expiry(self):
+        clock = FakeClock()
+        mempool = Mempool(expiry=60.0, clock=clock)
+        old = make_tx("A")
+        mempool.add(old)
+        clock.now += 30
+        recent = make_tx("B")
+        mempool.add(recent)
+
+        clock.now += 45
+        self.assertEqual(mempool.expire(), 1)
+        self.assertEqual(mempool.transactions(), [recent])
+
+
+class TestBlockchainMempool(unittest.TestCase):
+    def setUp(self):
+        self.blockchain = Blockchain(difficulty=1)
+
+    def test_blocks_are_filled_up_to_the_size_limit(self):
+        transactions = [make_tx(f"User{i}", fee=0.001 * i) for i in range(1, 6)]
+        for tx in transactions:
+            self.blockchain.add_pending_transaction(tx)
+        self.blockchain.max_block_bytes = 2 * len(transactions[0].encode())
+
+        block = self.blockchain.mine_pending_transactions("miner")
+        self.assertEqual(block.transactions[:-1], [transactions[4], transactions[3]])
+        self.assertEqual(len(self.blockchain.pending_transactions), 3)
+        # The miner collects the reward plus the fees of the mined transactions
+        self.assertAlmostEqual(self.blockchain.ledger.get_balance("miner"), 10.009)
+        self.assertAlmostEqual(self.blockchain.ledger.get_balance("User5"), -1.005)
+        self.assertTrue(self.blockchain.verify_ledger())
+
+    def test_mined_nonces_cannot_be_replayed(self):
+        alice = KeyPair(bytes(31) + b"\x01")
+        self.blockchain.mine_pending_transactions(alice.address)
+        transaction = Transaction(alice.address, "Bob", 1.0, fee=0.01, nonce=0)
+        transaction.sign(alice)
+        self.assertTrue(self.blockchain.admit_transaction(transaction))
+        self.blockchain.mine_pending_transactions("miner")
+
+        self.assertEqual(self.blockchain.ledger.next_nonce(alice.address), 1)
+        self.assertFalse(self.blockchain.admit_transaction(transaction))
+
+    def test_processor_does_not_keep_transactions(self):
+        processor = TransactionProcessor()
+        processor.create_transaction("Alice", "Bob", 1.0)
+        self.assertFalse(hasattr(processor, 'pending_transactions'))
+
+
+if __name__ == '__main__':
+    unittest.main()
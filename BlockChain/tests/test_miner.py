@@ -0,0 +1,52 @@
+import unittest
+from block import Block, difficulty_target
+from miner import ParallelMiner
+from transaction import Transaction
+
+
+class TestParallelMiner(unittest.TestCase):
+    def setUp(self):
+        self.miner = ParallelMiner(workers=2, chunk_size=500, min_parallel_difficulty=0)
+
+    def tearDown(self):
+        self.miner.shutdown()
+
+    def make_block(self) -> Block:
+        transactions = [Transaction("Alice", "Bob", 50.0, timestamp=1700000000.0)]
+        return Block(1, transactions, "0" * 64, timestamp=1700000000.0)
+
+    def test_parallel_matches_serial(self):
+        """The pool finds the same nonce the serial loop would"""
+        serial = self.make_block()
+        serial.mine_block(3)
+
+        parallel = self.make_block()
+        parallel.mine_block(3, miner=self.miner)
+
+        self.assertEqual(parallel.nonce, serial.nonce)
+        self.assertEqual(parallel.hash, serial.hash)
+        self.assertEqual(parallel.hash, parallel.calculate_hash())
+        self.assertTrue(parallel.hash.startswith("000"))
+
+    def test_bounded_search_without_solution(self):
+        """An exhausted range returns None"""
+        block = self.make_block()
+        self.assertIsNone(self.miner.search(block._hash_prefix(), 64, start=0, stop=2000))
+
+    def test_difficulty_target_matches_hex_prefix(self):
+        """Digests below the integer target are exactly those with enough leading zeros"""
+        target = difficulty_target(3)
+        self.assertTrue(int("000" + "f" * 61, 16) < target)
+        self.assertFalse(int("001" + "0" * 61, 16) < target)
+
+    def test_serial_mining_uses_midstate(self):
+        """The midstate search produces a hash calculate_hash agrees with"""
+        block = Block(1, [Transaction("Alice", "Bob", float(i)) for i in range(1, 200)],
+                      "0" * 64, timestamp=1700000000.0)
+        block.mine_block(2)
+        self.assertEqual(block.hash, block.calculate_hash())
+        self.assertTrue(block.hash.startswith("00"))
+
+
+if __name__ == '__main__':
+    unittest.main()
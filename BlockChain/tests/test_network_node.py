@@ -0,0 +1,218 @@
+import asyncio
+import socket
+import time
+import unittest
+from block import Block
+from blockchain import Blockchain
+from network_node import BlockchainNode
+from peer_transport import CHUNK_SIZE, PeerConnection, open_peer_connection
+from serialization import ChainStreamDecoder
+from signatures import KeyPair
+from transaction import Transaction
+
+
+def run(scenario, timeout: float = 10.0):
+    return asyncio.run(asyncio.wait_for(scenario, timeout))
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestBlockchainNode(unittest.TestCase):
+    def setUp(self):
+        self.alice = KeyPair(bytes(31) + b"\x01")
+        self.blockchain = Blockchain(difficulty=1)
+        self.blockchain.mine_pending_transactions(self.alice.address)
+        self.node = BlockchainNode(0, self.blockchain, host='127.0.0.1')
+        self.node.start()
+
+    def tearDown(self):
+        self.node.stop(timeout=5)
+
+    def connect(self):
+        return open_peer_connection('127.0.0.1', self.node.port)
+
+    def signed_transaction(self) -> Transaction:
+        transaction = Transaction(self.alice.address, "Bob", 1.0)
+        transaction.sign(self.alice)
+        return transaction
+
+    def test_connections_are_long_lived(self):
+        async def scenario():
+            connection = await self.connect()
+            replies = []
+            for i in range(3):
+                connection.send({'type': 'ping', 'id': i})
+                replies.append((await connection.read_message()).header)
+            await connection.close()
+            return replies
+
+        self.assertEqual(run(scenario()), [{'type': 'pong', 'id': i} for i in range(3)])
+
+    def test_pings_are_answered_while_the_chain_is_locked(self):
+        """Requests wait for the chain lock on the executor, not on the event loop"""
+        requests = {
+            'headers': {'type': 'getheaders', 'id': 1, 'start': 0, 'count': 10},
+            'chain_response': {'type': 'chain_request'}
+        }
+        for answer_type, request in requests.items():
+            with self.subTest(request=request['type']):
+                self.assertEqual(self.request_while_locked(request), ('pong', answer_type))
+
+    def request_while_locked(self, request: dict):
+        async def scenario():
+            requester, other = await self.connect(), await self.connect()
+            requester.send(request)
+            # Give the node time to take up the request first
+            await asyncio.sleep(0.1)
+            other.send({'type': 'ping', 'id': 2})
+            pong = (await other.read_message()).type
+            self.node._chain_lock.release()
+            answer = await requester.read_message()
+            payload = await answer.read()
+            await requester.close()
+            await other.close()
+            self.assertGreater(len(payload), 0)
+            return pong, answer.type
+
+        # Held as the mining thread once did for a whole proof of work
+        self.node._chain_lock.acquire()
+        try:
+            return run(scenario())
+        finally:
+            if self.node._chain_lock.locked():
+                self.node._chain_lock.release()
+
+    def test_admitted_transactions_are_announced_to_other_peers(self):
+        transaction = self.signed_transaction()
+        tx_hash = transaction.calculate_hash()
+
+        async def scenario():
+            sender, listener = await self.connect(), await self.connect()
+            while len(self.node.connections) < 2:
+                await asyncio.sleep(0.01)
+            sender.send({'type': 'new_transaction'}, transaction.to_bytes())
+            announcement = (await listener.read_message()).header
+            listener.send({'type': 'getdata', 'items': [['tx', tx_hash]]})
+            delivery = await listener.read_message()
+            delivered = (delivery.header, await delivery.read())
+            # The sender is not told about its own transaction
+            sender.send({'type': 'ping', 'id': 1})
+            reply = (await sender.read_message()).type
+            await sender.close()
+            await listener.close()
+            return announcement, delivered, reply
+
+        announcement, delivered, reply = run(scenario())
+        self.assertEqual(announcement, {'type': 'inv', 'items': [['tx', tx_hash]]})
+        self.assertEqual(delivered, ({'type': 'new_transaction', 'hash': tx_hash}, transaction.to_bytes()))
+        self.assertEqual(reply, 'pong')
+        self.assertIn(tx_hash, self.blockchain.mempool)
+
+    def test_only_unseen_items_are_requested(self):
+        known = self.blockchain.get_latest_block().hash
+        self.node.broadcast_block(self.blockchain.get_latest_block())
+
+        async def scenario():
+            peer = await self.connect()
+            while not self.node.inventory.relay.get(known):
+                await asyncio.sleep(0.01)
+            peer.send({'type': 'inv', 'items': [['block', known], ['block', 'ab' * 32]]})
+            request = (await peer.read_message()).header
+            # Announcing the same item again while it is outstanding asks for nothing
+            peer.send({'type': 'inv', 'items': [['block', 'ab' * 32]]})
+            peer.send({'type': 'ping', 'id': 1})
+            reply = (await peer.read_message()).header
+            await peer.close()
+            return request, reply
+
+        request, reply = run(scenario())
+        self.assertEqual(request, {'type': 'getdata', 'items': [['block', 'ab' * 32]]})
+        self.assertEqual(reply, {'type': 'pong', 'id': 1})
+
+    def test_chain_is_streamed(self):
+        for i in range(40):
+            # Large blocks, so the response spans many frames
+            self.blockchain.add_block([Transaction(f"User{i}", f"Payee{j}", 1.0) for j in range(200)])
+
+        async def scenario():
+            connection = await self.connect()
+            connection.send({'type': 'chain_request'})
+            response = await connection.read_message()
+            decoder = ChainStreamDecoder()
+            blocks, chunk_sizes = [], []
+            async for chunk in response.chunks():
+                chunk_sizes.append(len(chunk))
+                blocks.extend(decoder.feed(chunk))
+            await connection.close()
+            return response.type, blocks, chunk_sizes, decoder.done
+
+        response_type, blocks, chunk_sizes, done = run(scenario())
+        self.assertEqual(response_type, 'chain_response')
+        self.assertTrue(done)
+        self.assertGreater(len(chunk_sizes), 1)
+        self.assertLessEqual(max(chunk_sizes), CHUNK_SIZE)
+        self.assertEqual([block.hash for block in blocks], [block.hash for block in self.blockchain.chain])
+
+    def test_blocks_propagate_to_connected_nodes(self):
+        peer_chain = Blockchain(difficulty=1)
+        peer_chain.chain = [Block.from_bytes(block.to_bytes()) for block in self.blockchain.chain]
+        peer_chain.ledger.rebuild(peer_chain.chain)
+        with BlockchainNode(0, peer_chain, host='127.0.0.1') as peer:
+            info = self.node.connect_to_peer('127.0.0.1', peer.port)
+            self.assertGreater(info.last_seen, 0)
+
+            block = self.blockchain.mine_pending_transactions("miner")
+            self.node.broadcast_block(block)
+            self.assertTrue(wait_until(lambda: len(peer_chain.chain) == len(self.blockchain.chain)))
+            self.assertEqual(peer_chain.get_latest_block().hash, block.hash)
+
+    def test_stalled_peers_do_not_hold_up_broadcasts(self):
+        self.node.send_timeout = 0.2
+        self.node.compress = False
+        # Push full blocks, which the stalled peer cannot take
+        self.node.announce_inventory = False
+        transactions = [Transaction(f"User{i}", "Bob", 1.0) for i in range(10_000)]
+        blocks = [Block(index, transactions, "0" * 64) for index in range(2, 12)]
+        stalled = socket.socket()
+        stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stalled.connect(('127.0.0.1', self.node.port))
+
+        async def scenario():
+            listener = await self.connect()
+            while len(self.node.connections) < 2:
+                await asyncio.sleep(0.01)
+            for block in blocks:
+                self.node.broadcast_block(block)
+            received = []
+            for _ in range(10):
+                message = await listener.read_message()
+                received.append(await message.read())
+            while len(self.node.connections) > 1:
+                await asyncio.sleep(0.01)
+            await listener.close()
+            return received
+
+        try:
+            self.assertEqual(run(scenario()), [block.to_bytes() for block in blocks])
+        finally:
+            stalled.close()
+
+    def test_slow_peers_have_bounded_queues(self):
+        async def fill_queue():
+            connection = await self.connect()
+            # Without a writer task nothing drains the queue, so it fills up
+            stalled = PeerConnection(connection.reader, connection.writer, max_queue=2)
+            results = [stalled.send({'type': 'ping', 'id': i}) for i in range(3)]
+            await connection.close()
+            return results, stalled.dropped
+
+        self.assertEqual(run(fill_queue()), ([True, True, False], 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import asyncio
+import socket
+import unittest
+from unittest import mock
+from peer_manager import NodeInfo, PeerManager
+from peer_transport import PeerConnection, ProtocolError, open_peer_connection
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run(scenario, timeout: float = 10.0):
+    return asyncio.run(asyncio.wait_for(scenario, timeout))
+
+
+async def start_peer(port: int = 0, answer_pings: bool = True):
+    """A peer that accepts connections and optionally answers pings"""
+    connections = []
+
+    async def handle(reader, writer):
+        connection = PeerConnection(reader, writer)
+        connection.start()
+        connections.append(connection)
+        async for message in connection:
+            if message.type == 'ping' and answer_pings:
+                connection.send({'type': 'pong', 'id': message.header['id']})
+        await connection.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', port)
+    return server, connections
+
+
+async def serve(connection: PeerConnection, info: NodeInfo):
+    async for message in connection:
+        if message.type == 'pong':
+            connection.pong_received(message.header['id'])
+            info.latency = connection.latency
+    await connection.close()
+
+
+def open_connection(info: NodeInfo):
+    return open_peer_connection(info.address, info.port)
+
+
+class TestPeerManager(unittest.TestCase):
+    def test_backoff_grows_to_a_limit(self):
+        manager = PeerManager(open_connection, serve, min_backoff=0.5, max_backoff=4.0)
+        with mock.patch('random.uniform', return_value=1.0):
+            self.assertEqual([manager.backoff(n) for n in range(1, 7)], [0.5, 1.0, 2.0, 4.0, 4.0, 4.0])
+
+    def test_unreachable_peers_are_retried(self):
+        port = free_port()
+
+        async def scenario():
+            manager = PeerManager(open_connection, serve, min_backoff=0.01, max_backoff=0.05)
+            info = manager.add(NodeInfo('127.0.0.1', port))
+            self.assertFalse(await manager.wait_connected(info.key, 0.2))
+            failures = info.failures
+
+            server, _ = await start_peer(port)
+            self.assertTrue(await manager.wait_connected(info.key, 2.0))
+            result = (failures, info.failures, info.last_seen > 0)
+            await manager.close()
+            server.close()
+            return result
+
+        failures, after, seen = run(scenario())
+        self.assertGreater(failures, 1)
+        self.assertEqual(after, 0)
+        self.assertTrue(seen)
+
+    def test_dropped_connections_are_reopened(self):
+        async def scenario():
+            server, connections = await start_peer()
+            port = server.sockets[0].getsockname()[1]
+            manager = PeerManager(open_connection, serve, min_backoff=0.01, max_backoff=0.05)
+            info = manager.add(NodeInfo('127.0.0.1', port))
+            await manager.wait_connected(info.key, 2.0)
+            first = manager.connections[info.key]
+
+            while not connections:
+                await asyncio.sleep(0.01)
+            await connections[0].close()
+            while manager.connections.get(info.key) in (None, first):
+                await asyncio.sleep(0.01)
+            count = len(connections)
+            await manager.close()
+            server.close()
+            return count
+
+        self.assertEqual(run(scenario()), 2)
+
+    def test_peers_are_redialled_after_serving_errors(self):
+        errors = [ProtocolError("Message header is too large"), RuntimeError("bug")]
+        served = []
+
+        async def failing_serve(connection: PeerConnection, info: NodeInfo):
+            served.append(connection)
+            if len(served) <= len(errors):
+                raise errors[len(served) - 1]
+            await serve(connection, info)
+
+        async def scenario():
+            server, _ = await start_peer()
+            port = server.sockets[0].getsockname()[1]
+            manager = PeerManager(open_connection, failing_serve, min_backoff=0.01, max_backoff=0.05)
+            manager.add(NodeInfo('127.0.0.1', port))
+            while len(served) <= len(errors):
+                await asyncio.sleep(0.01)
+            await manager.close()
+            server.close()
+            return [connection.closed for connection in served[:len(errors)]]
+
+        with self.assertLogs('peer_manager', level='WARNING') as logs:
+            closed = run(scenario())
+        # Each failed connection was closed and the peer dialled again
+        self.assertEqual(closed, [True, True])
+        # A misbehaving peer is a warning; an unexpected error is logged with its traceback
+        self.assertEqual([(record.levelname, record.exc_info is not None) for record in logs.records],
+                         [('WARNING', False), ('ERROR', True)])
+
+    def test_pings_measure_latency(self):
+        async def scenario():
+            server, _ = await start_peer()
+            port = server.sockets[0].getsockname()[1]
+            manager = PeerManager(open_connection, serve, ping_interval=0.02)
+            info = manager.add(NodeInfo('127.0.0.1', port))
+            while info.latency is None:
+                await asyncio.sleep(0.01)
+            await manager.close()
+            server.close()
+            return info.latency
+
+        self.assertLess(run(scenario()), 1.0)
+
+    def test_silent_peers_are_disconnected(self):
+        async def scenario():
+            server, connections = await start_peer(answer_pings=False)
+            port = server.sockets[0].getsockname()[1]
+            manager = PeerManager(open_connection, serve, min_backoff=0.01, max_backoff=0.05,
+                                  ping_interval=0.02, ping_timeout=0.1)
+            info = manager.add(NodeInfo('127.0.0.1', port))
+            while len(connections) < 2:
+                await asyncio.sleep(0.01)
+            await manager.close()
+            server.close()
+            return info.latency
+
+        # The first connection was given up on and a new one opened
+        self.assertIsNone(run(scenario()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import unittest
+import zlib
+from unittest import mock
+from peer_transport import (
+    CHUNK_SIZE, FLAG_COMPRESSED, FLAG_MORE, FRAME_HEADER, MAX_FRAME_SIZE, PROTOCOL_VERSION,
+    PeerConnection, ProtocolError, encode_frames
+)
+
+
+def frame_flags(frames):
+    return [FRAME_HEADER.unpack_from(frame)[1] for frame in frames]
+
+
+def read_all(data: bytes, consume):
+    """Feed encoded frames to a connection and run consume(connection) on them"""
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await consume(PeerConnection(reader, mock.Mock()))
+    return asyncio.run(scenario())
+
+
+async def read_payloads(connection):
+    messages = []
+    async for message in connection:
+        messages.append((message.header, await message.read()))
+    return messages
+
+
+class TestFraming(unittest.TestCase):
+    def test_small_message_is_one_frame(self):
+        frames = list(encode_frames({'type': 'new_transaction'}, b"payload"))
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frame_flags(frames), [0])
+        self.assertEqual(read_all(frames[0], read_payloads), [({'type': 'new_transaction'}, b"payload")])
+
+    def test_large_payloads_span_frames(self):
+        payload = os.urandom(3 * CHUNK_SIZE + 100)
+        frames = list(encode_frames({'type': 'new_block'}, payload))
+        self.assertEqual(frame_flags(frames), [FLAG_MORE] * (len(frames) - 1) + [0])
+        self.assertTrue(all(len(frame) <= FRAME_HEADER.size + CHUNK_SIZE for frame in frames))
+
+        messages = read_all(b"".join(frames) + b"".join(encode_frames({'type': 'ping'})), read_payloads)
+        self.assertEqual(messages, [({'type': 'new_block'}, payload), ({'type': 'ping'}, b"")])
+
+    def test_lazy_payloads_are_consumed_frame_by_frame(self):
+        produced = []
+
+        def pieces():
+            for i in range(8):
+                produced.append(i)
+                yield bytes(CHUNK_SIZE // 2)
+
+        frames = encode_frames({'type': 'chain_response'}, pieces())
+        next(frames)
+        self.assertLess(len(produced), 8)
+        self.assertGreater(len(b"".join(frames)), 0)
+        self.assertEqual(len(produced), 8)
+
+    def test_compression(self):
+        payload = b"abc" * 10_000
+        compressed = list(encode_frames({'type': 'new_block'}, payload, compress=True))
+        plain = list(encode_frames({'type': 'new_block'}, payload))
+        self.assertEqual(frame_flags(compressed), [FLAG_COMPRESSED])
+        self.assertLess(len(compressed[0]), len(plain[0]) // 10)
+        self.assertEqual(read_all(compressed[0], read_payloads), [({'type': 'new_block'}, payload)])
+        # Incompressible bodies are sent as they are
+        self.assertEqual(frame_flags(encode_frames({'type': 'new_block'}, os.urandom(4096), compress=True)), [0])
+
+    def test_unread_payloads_are_skipped(self):
+        data = b"".join(encode_frames({'type': 'new_block'}, os.urandom(2 * CHUNK_SIZE)))
+        data += b"".join(encode_frames({'type': 'ping', 'id': 7}))
+
+        async def headers(connection):
+            return [message.header async for message in connection]
+
+        self.assertEqual(read_all(data, headers), [{'type': 'new_block'}, {'type': 'ping', 'id': 7}])
+
+    def test_streamed_chunks_arrive_incrementally(self):
+        payload = os.urandom(2 * CHUNK_SIZE + 10)
+        data = b"".join(encode_frames({'type': 'new_block'}, payload))
+
+        async def chunk_sizes(connection):
+            message = await connection.read_message()
+            return [len(chunk) async for chunk in message.chunks()]
+
+        sizes = read_all(data, chunk_sizes)
+        self.assertEqual(sum(sizes), len(payload))
+        self.assertLessEqual(max(sizes), CHUNK_SIZE)
+
+    def test_rejects_invalid_frames(self):
+        body = b"".join(encode_frames({'type': 'ping'}))[FRAME_HEADER.size:]
+        newer = FRAME_HEADER.pack(PROTOCOL_VERSION + 1, 0, len(body)) + body
+        oversized = FRAME_HEADER.pack(PROTOCOL_VERSION, 0, MAX_FRAME_SIZE + 1)
+        bomb = zlib.compress(bytes(MAX_FRAME_SIZE + 1))
+        bomb = FRAME_HEADER.pack(PROTOCOL_VERSION, FLAG_COMPRESSED, len(bomb)) + bomb
+        truncated = b"".join(encode_frames({'type': 'ping'}))[:-1]
+        for data in (newer, oversized, bomb, truncated, FRAME_HEADER.pack(PROTOCOL_VERSION, 0, 2) + b"{}"):
+            with self.assertRaises(ProtocolError):
+                read_all(data, read_payloads)
+
+    def test_payload_size_limit(self):
+        data = b"".join(encode_frames({'type': 'new_block'}, bytes(2 * CHUNK_SIZE)))
+
+        async def read_limited(connection):
+            return await (await connection.read_message()).read(max_size=CHUNK_SIZE)
+
+        with self.assertRaises(ProtocolError):
+            read_all(data, read_limited)
+
+
+if __name__ == '__main__':
+    unittest.main()
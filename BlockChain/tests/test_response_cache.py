@@ -0,0 +1,47 @@
+import unittest
+from response_cache import TipCache
+
+
+class TestTipCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TipCache(max_entries=2)
+        self.computed = 0
+
+    def lookup(self, key, tip_hash):
+        """Read through the cache as api.cached_by_tip does"""
+        entry = self.cache.get(key, tip_hash)
+        if entry is None:
+            self.computed += 1
+            entry = self.cache.put(key, tip_hash, f"body{self.computed}".encode(), "application/json")
+        return entry
+
+    def test_hits_until_the_tip_moves(self):
+        """Entries are reused for the same tip and dropped when it changes"""
+        first = self.lookup("/status", "tip1")
+        self.assertEqual(self.lookup("/status", "tip1"), first)
+        self.assertEqual(self.computed, 1)
+
+        second = self.lookup("/status", "tip2")
+        self.assertEqual(self.computed, 2)
+        self.assertNotEqual(second[2], first[2])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_etag_is_derived_from_the_body(self):
+        body, _, etag = self.lookup("/blocks", "tip1")
+        self.assertEqual(etag, TipCache.make_etag(body))
+
+    def test_stale_results_are_not_stored(self):
+        """A response computed for an older tip is returned but not cached"""
+        self.cache.get("/status", "tip2")
+        self.cache.put("/status", "tip1", b"old", "application/json")
+        self.assertIsNone(self.cache.get("/status", "tip2"))
+
+    def test_entries_are_bounded(self):
+        for key in ("a", "b", "c"):
+            self.lookup(key, "tip1")
+        self.assertIsNone(self.cache.get("a", "tip1"))
+        self.assertIsNotNone(self.cache.get("c", "tip1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import hashlib
+import unittest
+from unittest import mock
+import signatures
+from block import Block
+from blockchain import Blockchain
+from security import BlockchainSecurity
+from serialization import U8, encode_amount, encode_string, encode_timestamp
+from signatures import KeyPair, SignatureCache, SignatureVerifier
+from transaction import Transaction, COINBASE_SENDER
+
+
+class TestEd25519(unittest.TestCase):
+    def test_rfc8032_vectors(self):
+        seed = bytes.fromhex("4ccd089b28ff96da9db6c346ec114e0f5b8a319f35aba624da8cf6ed4fb8a6fb")
+        public_key = bytes.fromhex("3d4017c3e843895a92b70aa74d1b7ebc9c982ccf2ec4968cc0cd55f12af4660c")
+        signature = bytes.fromhex(
+            "92a009a9f0d4cab8720e820b5f642540a2b27b5416503f8fb3762223ebdb69da"
+            "085ac1e43e15996e458f3613d0f11d8c387b2eaeb4302aeeb00d291612bb0c00"
+        )
+        self.assertEqual(signatures.public_key_from_seed(seed), public_key)
+        self.assertEqual(signatures.sign(seed, b"\x72"), signature)
+        self.assertTrue(signatures.verify(public_key, b"\x72", signature))
+        self.assertFalse(signatures.verify(public_key, b"\x73", signature))
+        self.assertFalse(signatures.verify(public_key, b"\x72", signature[:-1]))
+
+        # Without the cryptography package verification still works, in pure Python
+        with mock.patch.object(signatures, 'HAVE_CRYPTOGRAPHY', False):
+            self.assertTrue(signatures.verify(public_key, b"\x72", signature))
+            self.assertFalse(signatures.verify(public_key, b"\x73", signature))
+            # but nothing is signed with variable-time code
+            with self.assertRaises(RuntimeError):
+                signatures.sign(seed, b"\x72")
+
+
+class TestTransactionSignatures(unittest.TestCase):
+    def setUp(self):
+        self.alice = KeyPair(bytes(31) + b"\x01")
+        self.mallory = KeyPair(bytes(31) + b"\x02")
+        self.cache = SignatureCache()
+
+    def signed(self, amount: float = 1.0) -> Transaction:
+        transaction = Transaction(self.alice.address, "Bob", amount, timestamp=1700000000.0)
+        transaction.sign(self.alice)
+        return transaction
+
+    def test_sign_and_verify(self):
+        transaction = self.signed()
+        self.assertTrue(signatures.verify_transaction(transaction, self.cache))
+
+        # Changing any signed field invalidates the signature
+        transaction.amount = 2.0
+        self.assertFalse(signatures.verify_transaction(transaction, self.cache))
+
+    def test_sender_must_own_the_key(self):
+        """A valid signature by another key does not authorize the sender's funds"""
+        with self.assertRaises(ValueError):
+            self.signed().sign(self.mallory)
+
+        transaction = self.signed()
+        transaction.public_key = self.mallory.public_key
+        transaction.signature = self.mallory.sign(transaction.hash_bytes())
+        self.assertFalse(signatures.verify_transaction(transaction, self.cache))
+        self.assertFalse(signatures.verify_transaction(Transaction("Alice", "Bob", 1.0, signature="sig")))
+
+    def test_signature_survives_encoding(self):
+        decoded = Transaction.from_bytes(self.signed().to_bytes())
+        self.assertEqual(decoded.public_key, self.alice.public_key)
+        self.assertTrue(signatures.verify_transaction(decoded, self.cache))
+
+    def test_decodes_version_1_encoding(self):
+        """Blocks stored before transactions carried a public key still decode"""
+        fields = encode_string("Alice") + encode_string("Bob") + encode_amount(1.0) + encode_timestamp(1700000000.0)
+        decoded = Transaction.from_bytes(U8.pack(1) + fields + encode_string("sig"))
+        self.assertEqual((decoded.signature, decoded.public_key, decoded.fee, decoded.nonce),
+                         ("sig", None, 0.0, None))
+        # Without a fee or nonce the hash is the one it had before those fields existed
+        self.assertEqual(decoded.calculate_hash(), hashlib.sha256(fields).hexdigest())
+
+    def test_cache_is_keyed_by_signature(self):
+        transaction = self.signed()
+        with mock.patch('signatures.verify', wraps=signatures.verify) as verify:
+            self.assertTrue(signatures.verify_transaction(transaction, self.cache))
+            self.assertTrue(signatures.verify_transaction(transaction, self.cache))
+            self.assertEqual(verify.call_count, 1)
+
+            # Same contents, but a forged signature does not match the cached entry
+            transaction.signature = "00" * 64
+            self.assertFalse(signatures.verify_transaction(transaction, self.cache))
+            self.assertEqual(verify.call_count, 2)
+
+    def test_admitted_transactions_are_not_reverified_in_blocks(self):
+        blockchain = Blockchain(difficulty=1)
+        blockchain.mine_pending_transactions(self.alice.address)
+        transaction = self.signed(amount=2.5)
+        with mock.patch('signatures.verify', wraps=signatures.verify) as verify:
+            self.assertTrue(blockchain.admit_transaction(transaction))
+            block = blockchain.mine_pending_transactions("miner")
+            self.assertTrue(blockchain.verify_block(block))
+            self.assertEqual(verify.call_count, 1)
+
+    def test_only_the_block_reward_may_be_unsigned(self):
+        reward = Transaction(COINBASE_SENDER, "miner", 10.0)
+        block = Block(1, [self.signed(), reward], "0" * 64)
+        self.assertEqual(BlockchainSecurity.block_signature_failures(block), [])
+
+        block = Block(1, [reward, self.signed()], "0" * 64)
+        self.assertEqual(BlockchainSecurity.block_signature_failures(block), [reward])
+
+
+class TestSignatureVerifier(unittest.TestCase):
+    def test_pool_matches_serial(self):
+        keys = [KeyPair(bytes(31) + bytes([i])) for i in range(1, 5)]
+        transactions = []
+        for key in keys:
+            transaction = Transaction(key.address, "Bob", 1.0)
+            transaction.sign(key)
+            transactions.append(transaction)
+        transactions[2].amount = 5.0
+        transactions.append(Transaction("Alice", "Bob", 1.0))
+
+        cache = SignatureCache()
+        with SignatureVerifier(workers=2, cache=cache, batch_size=2, min_parallel=2) as verifier:
+            self.assertEqual(verifier.verify_transactions(transactions), [True, True, False, True, False])
+            self.assertEqual(len(cache), 3)
+
+            # Only the invalid signature is checked again, too few to need the pool
+            verifier.shutdown()
+            self.assertEqual(verifier.verify_transactions(transactions), [True, True, False, True, False])
+            self.assertIsNone(verifier._executor)
+
+
+if __name__ == '__main__':
+    unittest.main()
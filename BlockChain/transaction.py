@@ -1,14 +1,138 @@
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional, Tuple, Union
+import hashlib
+import struct
+from serialization import (
+    FORMAT_VERSION, U8, I64, SerializationError, Buffer,
+    encode_string, decode_string, encode_amount, decode_amount,
+    encode_timestamp, decode_timestamp
+)
+
+# Sender of the block reward; the only transaction a block may carry unsigned
+COINBASE_SENDER = "System"
+
+
+def timestamp_to_epoch(value: Union[datetime, str, float, int]) -> float:
+    """
+    Normalize a datetime, ISO-8601 string or number to seconds since the epoch.
+    Naive datetimes are treated as UTC, matching datetime.utcnow().
+    """
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
 
 @dataclass
 class Transaction:
     sender: str
     recipient: str
     amount: float
-    timestamp: datetime = datetime.utcnow()
+    timestamp: datetime = field(default_factory=datetime.utcnow)
     signature: Optional[str] = None
+    # Hex Ed25519 key that signed; the sender is the address derived from it
+    public_key: Optional[str] = None
+    # Paid to the miner on top of amount; higher fees per byte are mined first
+    fee: float = 0.0
+    # Per-sender sequence number; transactions without one are not ordered
+    nonce: Optional[int] = None
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Tell the containing block that its contents changed
+        block = self.__dict__.get('_block')
+        if block is not None:
+            block.mark_mutated()
+
+    def _transfer_fields(self) -> bytes:
+        return (
+            encode_string(self.sender) +
+            encode_string(self.recipient) +
+            encode_amount(self.amount) +
+            encode_timestamp(self.timestamp)
+        )
+
+    def _fee_fields(self) -> bytes:
+        return encode_amount(self.fee) + I64.pack(-1 if self.nonce is None else self.nonce)
+
+    def encode(self, include_signature: bool = True) -> bytes:
+        """Encode the transaction fields in the canonical binary format"""
+        data = self._transfer_fields() + self._fee_fields()
+        if include_signature:
+            data += encode_string(self.signature or "") + encode_string(self.public_key or "")
+        return data
+
+    @classmethod
+    def decode(cls, view: memoryview, offset: int = 0,
+               version: int = FORMAT_VERSION) -> Tuple['Transaction', int]:
+        """
+        Decode transaction fields starting at offset; returns the transaction
+        and the next offset. version is that of the enclosing encoding.
+        """
+        sender, offset = decode_string(view, offset)
+        recipient, offset = decode_string(view, offset)
+        amount, offset = decode_amount(view, offset)
+        timestamp, offset = decode_timestamp(view, offset)
+        fee, nonce = 0.0, None
+        if version >= 3:
+            fee, offset = decode_amount(view, offset)
+            (nonce,) = I64.unpack_from(view, offset)
+            offset += I64.size
+            if nonce < 0:
+                nonce = None
+        signature, offset = decode_string(view, offset)
+        public_key = ""
+        if version >= 2:
+            public_key, offset = decode_string(view, offset)
+        return cls(sender, recipient, amount, timestamp, signature or None, public_key or None,
+                   fee, nonce), offset
+
+    def to_bytes(self) -> bytes:
+        """Encode a standalone, versioned transaction"""
+        return U8.pack(FORMAT_VERSION) + self.encode()
+
+    @classmethod
+    def from_bytes(cls, data: Buffer) -> 'Transaction':
+        """Decode a transaction produced by to_bytes"""
+        view = memoryview(data)
+        try:
+            (version,) = U8.unpack_from(view, 0)
+            if version > FORMAT_VERSION:
+                raise SerializationError(f"Unsupported transaction format version {version}")
+            transaction, _ = cls.decode(view, U8.size, version)
+        except struct.error as e:
+            raise SerializationError(f"Truncated transaction: {e}") from e
+        return transaction
+
+    def sign(self, key_pair) -> None:
+        """Sign the transaction hash with a signatures.KeyPair owning the sender address"""
+        if key_pair.address != self.sender:
+            raise ValueError("Key pair does not own the sender address")
+        self.public_key = key_pair.public_key
+        self.signature = key_pair.sign(self.hash_bytes())
+
+    def hash_bytes(self) -> bytes:
+        """
+        Return the SHA-256 digest of the canonical transaction encoding.
+        The signature is not covered, so the hash is also what gets signed.
+        Transactions without a fee or nonce hash as they did before those
+        fields existed.
+        """
+        data = self._transfer_fields()
+        if self.fee or self.nonce is not None:
+            data += self._fee_fields()
+        return hashlib.sha256(data).digest()
+
+    def calculate_hash(self) -> str:
+        """Return the transaction hash as a hex string"""
+        return self.hash_bytes().hex()
 
     def to_dict(self):
         """Convert transaction to dictionary format"""
@@ -17,18 +141,19 @@ class Transaction:
             'recipient': self.recipient,
             'amount': self.amount,
             'timestamp': str(self.timestamp),
-            'signature': self.signature
+            'signature': self.signature,
+            'public_key': self.public_key,
+            'fee': self.fee,
+            'nonce': self.nonce
         }
 
 class TransactionProcessor:
-    def __init__(self):
-        self.pending_transactions = []
-
-    def create_transaction(self, sender: str, recipient: str, amount: float) -> Transaction:
-        """Create a new transaction"""
-        transaction = Transaction(sender, recipient, amount)
-        self.pending_transactions.append(transaction)
-        return transaction
+    def create_transaction(self, sender: str, recipient: str, amount: float, fee: float = 0.0) -> Transaction:
+        """
+        Create a new transaction. It is not kept here; pending transactions
+        live in the blockchain's mempool once submitted.
+        """
+        return Transaction(sender, recipient, amount, fee=fee)
 
     def validate_transaction(self, transaction: Transaction) -> bool:
         """
@@ -39,11 +164,20 @@ class TransactionProcessor:
             return False
         if transaction.sender == transaction.recipient:
             return False
+        if transaction.fee < 0 or (transaction.nonce is not None and transaction.nonce < 0):
+            return False
         # Add more validation rules as needed
         return True
 
     def get_balance(self, address: str, blockchain) -> float:
-        """Calculate the balance of an address by looking through all blockchain transactions"""
+        """
+        Return the balance of an address. Uses the blockchain's balance ledger
+        when it has one, otherwise looks through all blockchain transactions.
+        """
+        ledger = getattr(blockchain, 'ledger', None)
+        if ledger is not None:
+            return ledger.get_balance(address)
+
         balance = 0.0
         
         for block in blockchain.chain:
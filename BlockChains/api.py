@@ -1,28 +1,100 @@
-from flask import Flask, jsonify, request, render_template_string
+from flask import Flask, jsonify, request, render_template, render_template_string
 from blockchain import Blockchain
 from blockchain_db import BlockchainDB
-from transaction import TransactionProcessor, Transaction
+from transaction import Transaction, timestamp_to_epoch
+from signatures import KeyPair
+from miner import ParallelMiner
+from block_producer import BlockProducer
+from chain_state import LocalChainState, SharedChainState
+from response_cache import TipCache
+from events import EventBroadcaster, TooManySubscribers, format_sse
+from functools import wraps
+import json
+import zlib
+import os
 import time
 from datetime import datetime
 
 app = Flask(__name__)
-db = BlockchainDB(":memory:")
-blockchain = Blockchain(difficulty=4, db=db)
-tx_processor = TransactionProcessor()
+# New blocks and transactions are pushed to dashboards over /events. Each open
+# stream holds one of the worker's threads, so only EVENT_MAX_SUBSCRIBERS of
+# them are allowed per worker and the other threads keep serving requests.
+events = EventBroadcaster(max_subscribers=int(os.getenv('EVENT_MAX_SUBSCRIBERS', '4')))
+
+if os.getenv('CHAIN_OWNER_ADDRESS'):
+    # Running under gunicorn: the chain state owner process (started in
+    # gunicorn_config.py) holds the chain; this worker reads its snapshot and
+    # the shared database file and forwards submissions to it
+    db = BlockchainDB(os.environ['CHAIN_DB'])
+    chain_state = SharedChainState(
+        os.environ['CHAIN_SNAPSHOT'],
+        os.environ['CHAIN_OWNER_ADDRESS'],
+        bytes.fromhex(os.environ['CHAIN_OWNER_AUTHKEY']),
+        events=events
+    )
+    chain_state.watch(db)
+else:
+    db = BlockchainDB(os.getenv('CHAIN_DB', ':memory:'))
+    # MINING_WORKERS=0 (the default) uses one mining process per CPU core
+    miner = ParallelMiner(workers=int(os.getenv('MINING_WORKERS', '0')) or None)
+    blockchain = Blockchain(difficulty=4, db=db, miner=miner)
+    # Mining happens on the producer's thread, never inside a request: a block is
+    # produced every BLOCK_INTERVAL seconds, or once BLOCK_MAX_TRANSACTIONS are pending
+    producer = BlockProducer(
+        blockchain,
+        "miner_address",
+        interval=float(os.getenv('BLOCK_INTERVAL', '10')),
+        max_transactions=int(os.getenv('BLOCK_MAX_TRANSACTIONS', '100')),
+        on_block=lambda block: chain_state.publish_block(block)
+    )
+    chain_state = LocalChainState(blockchain, producer, events=events)
+
+# Read endpoints only change when a block is appended, so their responses are
+# cached per chain tip and revalidated with ETags
+response_cache = TipCache(max_entries=int(os.getenv('RESPONSE_CACHE_ENTRIES', '1024')))
+
+def cached_by_tip(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Views may pick their representation from Accept, so it is part of the key
+        key = (request.path, request.query_string, request.headers.get('Accept', ''))
+        tip_hash = chain_state.tip_hash()
+        entry = response_cache.get(key, tip_hash)
+        if entry is None:
+            response = app.make_response(view(*args, **kwargs))
+            # Streamed bodies are produced incrementally and never buffered
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            entry = response_cache.put(key, tip_hash, response.get_data(), response.mimetype)
+
+        body, mimetype, etag = entry
+        response = app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        # Answers If-None-Match with 304 Not Modified
+        return response.make_conditional(request)
+    return wrapper
 
 # Create some initial test transactions
 def create_test_data():
+    # Sample transfers are signed by a demo key, funded with one block reward
+    demo_key = KeyPair.generate()
+    blockchain.mine_pending_transactions(demo_key.address)
     transactions = [
-        ("Alice", "Bob", 50.0),
-        ("Bob", "Charlie", 30.0),
-        ("Charlie", "Alice", 20.0)
+        ("Bob", 5.0),
+        ("Charlie", 3.0),
+        ("Alice", 2.0)
     ]
-    
-    for sender, recipient, amount in transactions:
-        tx = tx_processor.create_transaction(sender, recipient, amount)
-        blockchain.add_pending_transaction(tx)
-    
-    blockchain.mine_pending_transactions("miner_address")
+
+    for recipient, amount in transactions:
+        transaction = Transaction(demo_key.address, recipient, amount)
+        transaction.sign(demo_key)
+        chain_state.submit(transaction)
+
+if isinstance(chain_state, LocalChainState):
+    create_test_data()
+    producer.start()
 
 # Updated HTML template with dark theme
 DASHBOARD_TEMPLATE = """
@@ -356,8 +428,8 @@ DASHBOARD_TEMPLATE = """
             <div id="alert" class="alert"></div>
             <form id="transactionForm" onsubmit="return createTransaction(event)">
                 <div class="form-group">
-                    <label for="sender">Sender Address</label>
-                    <input type="text" id="sender" name="sender" required>
+                    <label for="senderKey">Sender Private Key (hex seed, signs in this browser and is never sent)</label>
+                    <input type="password" id="senderKey" pattern="[0-9a-fA-F]{64}" autocomplete="off" required>
                 </div>
                 <div class="form-group">
                     <label for="recipient">Recipient Address</label>
@@ -604,13 +676,84 @@ DASHBOARD_TEMPLATE = """
         
         const network = new vis.Network(container, data, options);
 
+        // Transactions are signed here, so the sender's seed never leaves the page.
+        // The hash mirrors Transaction.hash_bytes for a transfer without fee or nonce:
+        // sender and recipient (16-bit length + UTF-8), amount in 1e-8 coin units
+        // and timestamp in microseconds (both big-endian int64), SHA-256'd.
+        const ED25519_PKCS8_PREFIX = '302e020100300506032b657004220420';
+
+        function hexToBytes(hex) {
+            return new Uint8Array(hex.match(/../g).map(byte => parseInt(byte, 16)));
+        }
+
+        function bytesToHex(bytes) {
+            return Array.from(new Uint8Array(bytes), byte => byte.toString(16).padStart(2, '0')).join('');
+        }
+
+        function base64UrlToBytes(value) {
+            const binary = atob(value.replace(/-/g, '+').replace(/_/g, '/'));
+            return Uint8Array.from(binary, char => char.charCodeAt(0));
+        }
+
+        function encodeString(value) {
+            const data = new TextEncoder().encode(value);
+            const encoded = new Uint8Array(2 + data.length);
+            new DataView(encoded.buffer).setUint16(0, data.length);
+            encoded.set(data, 2);
+            return encoded;
+        }
+
+        function encodeInt64(value) {
+            const encoded = new Uint8Array(8);
+            new DataView(encoded.buffer).setBigInt64(0, BigInt(value));
+            return encoded;
+        }
+
+        async function sha256(data) {
+            return new Uint8Array(await crypto.subtle.digest('SHA-256', data));
+        }
+
+        async function signTransaction(seedHex, recipient, amount) {
+            const key = await crypto.subtle.importKey(
+                'pkcs8', hexToBytes(ED25519_PKCS8_PREFIX + seedHex), { name: 'Ed25519' }, true, ['sign']
+            );
+            const publicKey = base64UrlToBytes((await crypto.subtle.exportKey('jwk', key)).x);
+            // An address is the first 20 bytes of the SHA-256 of the public key
+            const sender = bytesToHex((await sha256(publicKey)).slice(0, 20));
+            const timestamp = Date.now() / 1000;
+
+            const fields = [
+                encodeString(sender),
+                encodeString(recipient),
+                encodeInt64(Math.round(amount * 1e8)),
+                encodeInt64(Math.round(timestamp * 1e6))
+            ];
+            const data = new Uint8Array(fields.reduce((size, field) => size + field.length, 0));
+            fields.reduce((offset, field) => { data.set(field, offset); return offset + field.length; }, 0);
+            const signature = await crypto.subtle.sign({ name: 'Ed25519' }, key, await sha256(data));
+
+            const formData = new FormData();
+            formData.append('sender', sender);
+            formData.append('recipient', recipient);
+            formData.append('amount', String(amount));
+            formData.append('timestamp', String(timestamp));
+            formData.append('signature', bytesToHex(signature));
+            formData.append('public_key', bytesToHex(publicKey));
+            return formData;
+        }
+
         async function createTransaction(event) {
             event.preventDefault();
             
-            const formData = new FormData(event.target);
+            const form = event.target;
             const alert = document.getElementById('alert');
             
             try {
+                const formData = await signTransaction(
+                    form.senderKey.value.toLowerCase(),
+                    form.recipient.value,
+                    parseFloat(form.amount.value)
+                );
                 const response = await fetch('/create_transaction', {
                     method: 'POST',
                     body: formData
@@ -645,46 +788,38 @@ DASHBOARD_TEMPLATE = """
 </html>
 """
 
+def block_to_json(block):
+    """JSON-ready dictionary for a block; timestamps are epoch seconds"""
+    return {
+        'block_index': block.index,
+        'hash': block.hash,
+        'previous_hash': block.previous_hash,
+        'nonce': block.nonce,
+        'timestamp': block.timestamp,
+        'transactions': [{
+            'sender': tx.sender,
+            'recipient': tx.recipient,
+            'amount': tx.amount,
+            'fee': tx.fee,
+            'timestamp': timestamp_to_epoch(tx.timestamp)
+        } for tx in block.transactions]
+    }
+
 @app.route('/')
+@cached_by_tip
 def dashboard():
     """Display a dashboard of the blockchain"""
-    create_test_data()
+    chain_status = chain_state.status()
     
-    chain_status = {
-        'length': len(blockchain.chain),
-        'is_valid': blockchain.is_chain_valid(),
-        'difficulty': blockchain.difficulty
-    }
-    
-    blocks = []
-    for block in blockchain.chain:
-        block_dict = {
-            'block_index': block.index,
-            'hash': block.hash,
-            'previous_hash': block.previous_hash,
-            'nonce': block.nonce,
-            'timestamp': block.timestamp,
-            'transactions': [{
-                'sender': tx.sender,
-                'recipient': tx.recipient,
-                'amount': tx.amount,
-                'timestamp': tx.timestamp
-            } for tx in block.transactions]
-        }
-        blocks.append(block_dict)
+    blocks = [block_to_json(block) for block in db.iter_blocks()]
     
-    # Get all unique addresses from transactions
+    # Every address that appears in a transaction is already in the ledger
+    balances = chain_state.balances()
     addresses = set(["Alice", "Bob", "Charlie", "miner_address", "System"])
-    for block in blockchain.chain:
-        for tx in block.transactions:
-            addresses.add(tx.sender)
-            addresses.add(tx.recipient)
+    addresses.update(balances)
     
-    # Calculate balances for all known addresses
-    balances = {
-        address: tx_processor.get_balance(address, blockchain)
-        for address in addresses
-    }
+    # Look up balances for all known addresses
+    balances = {address: balances.get(address, 0.0) for address in addresses}
     
     return render_template_string(
         DASHBOARD_TEMPLATE,
@@ -695,31 +830,172 @@ def dashboard():
         datetime=datetime
     )
 
+@app.route('/visualizer')
+def visualizer():
+    """Live visualizer that loads the chain once, then follows /events"""
+    return render_template('index.html')
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_KEEPALIVE = 15
+
+@app.route('/events')
+def stream_events():
+    """
+    Server-sent events: "block" (compact header, transfers and metric deltas),
+    "transaction" (new submissions) and "resync" (this client fell behind and
+    must refetch full state). Each client has its own bounded buffer.
+    Beyond the subscriber cap the stream is refused with 503.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    try:
+        subscription = events.subscribe(last_event_id)
+    except TooManySubscribers as e:
+        response = jsonify({'success': False, 'message': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(EVENT_KEEPALIVE)
+        return response
+
+    def generate():
+        try:
+            while True:
+                batch = subscription.get(timeout=EVENT_KEEPALIVE)
+                if not batch:
+                    yield ": keep-alive\n\n"
+                for event in batch:
+                    yield format_sse(event)
+        finally:
+            subscription.close()
+
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # Keep the existing API endpoints
+@app.route('/transactions/<tx_hash>/status', methods=['GET'])
+def get_transaction_status(tx_hash):
+    """Report whether a submitted transaction is pending or confirmed"""
+    transaction = db.get_transaction_by_hash(tx_hash)
+    if transaction:
+        return jsonify({
+            'tx_hash': tx_hash,
+            'status': 'confirmed',
+            'block_index': transaction['block_index'],
+            'confirmations': chain_state.status()['tip_index'] - transaction['block_index'] + 1
+        })
+    if chain_state.is_pending(tx_hash):
+        return jsonify({'tx_hash': tx_hash, 'status': 'pending'})
+    return jsonify({'tx_hash': tx_hash, 'status': 'unknown'}), 404
+
+# Explorer queries use keyset pagination: next_cursor is passed back as
+# ?cursor= (or ?after= for blocks) to fetch the following page
+MAX_PAGE_SIZE = 500
+
+def page_limit(default=50):
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+def stream_ndjson(blocks, compress):
+    """Write one JSON document per line as blocks are read from the database"""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip framing
+    for block in blocks:
+        line = json.dumps(block_to_json(block), separators=(',', ':')).encode() + b'\n'
+        if compressor is None:
+            yield line
+        else:
+            chunk = compressor.compress(line)
+            if chunk:
+                yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
 @app.route('/blocks', methods=['GET'])
+@cached_by_tip
 def get_blocks():
-    blocks = db.get_all_blocks()
-    return jsonify(blocks)
+    """
+    Blocks with index > after, oldest first. Returns a page of at most limit
+    blocks, or with ?stream=1 (or Accept: application/x-ndjson) streams every
+    remaining block as newline-delimited JSON
+    """
+    start = request.args.get('after', -1, type=int) + 1
+    if request.args.get('stream') == '1' or request.accept_mimetypes.best == 'application/x-ndjson':
+        limit = request.args.get('limit', type=int)
+        stop = start + limit if limit else None
+        compress = request.accept_encodings['gzip'] > 0
+        response = app.response_class(
+            stream_ndjson(db.iter_blocks(start, stop), compress),
+            mimetype='application/x-ndjson'
+        )
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        return response
+
+    limit = page_limit(default=100)
+    blocks = [block_to_json(block) for block in db.iter_blocks(start, start + limit)]
+    next_cursor = blocks[-1]['block_index'] if len(blocks) == limit else None
+    return jsonify({'blocks': blocks, 'next_cursor': next_cursor})
 
 @app.route('/blocks/<int:index>', methods=['GET'])
+@cached_by_tip
 def get_block(index):
     block = db.get_block(index)
     if block:
         return jsonify(block)
     return jsonify({'error': 'Block not found'}), 404
 
+@app.route('/address/<address>/transactions', methods=['GET'])
+@cached_by_tip
+def get_address_history(address):
+    limit = page_limit()
+    cursor = request.args.get('cursor')
+    try:
+        before_id = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    transactions = db.get_address_history(address, limit, before_id)
+    next_cursor = transactions[-1]['id'] if len(transactions) == limit else None
+    return jsonify({'address': address, 'transactions': transactions, 'next_cursor': next_cursor})
+
+@app.route('/transactions', methods=['GET'])
+def get_transactions_in_window():
+    start_time = request.args.get('start', 0.0, type=float)
+    end_time = request.args.get('end', time.time(), type=float)
+    limit = page_limit()
+
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_time, after_id = cursor.split(':')
+            after = (float(after_time), int(after_id))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    transactions = db.get_transactions_in_window(start_time, end_time, limit, after)
+    next_cursor = None
+    if len(transactions) == limit:
+        last = transactions[-1]
+        next_cursor = f"{last['timestamp']!r}:{last['id']}"
+    return jsonify({'transactions': transactions, 'next_cursor': next_cursor})
+
+@app.route('/transactions/<tx_hash>', methods=['GET'])
+@cached_by_tip
+def get_transaction(tx_hash):
+    transaction = db.get_transaction_by_hash(tx_hash)
+    if transaction:
+        return jsonify(transaction)
+    return jsonify({'error': 'Transaction not found'}), 404
+
 @app.route('/balance/<address>', methods=['GET'])
+@cached_by_tip
 def get_balance(address):
-    balance = tx_processor.get_balance(address, blockchain)
+    balance = chain_state.get_balance(address)
     return jsonify({'address': address, 'balance': balance})
 
 @app.route('/chain/status', methods=['GET'])
+@cached_by_tip
 def get_chain_status():
-    return jsonify({
-        'length': len(blockchain.chain),
-        'is_valid': blockchain.is_chain_valid(),
-        'difficulty': blockchain.difficulty
-    })
+    return jsonify(chain_state.status())
 
 # Add this route to handle new transactions
 @app.route('/create_transaction', methods=['POST'])
@@ -728,12 +1004,22 @@ def create_transaction():
         sender = request.form['sender']
         recipient = request.form['recipient']
         amount = float(request.form['amount'])
+        fee = float(request.form.get('fee') or 0)
+        nonce = int(request.form['nonce']) if request.form.get('nonce') else None
+        if not all(request.form.get(name) for name in ('signature', 'public_key', 'timestamp')):
+            raise ValueError("Transactions must be signed by the sender's key, with the signed timestamp")
+        # Signed client-side over the transaction hash, which covers the timestamp
+        transaction = Transaction(sender, recipient, amount, float(request.form['timestamp']),
+                                  request.form['signature'], request.form['public_key'],
+                                  fee, nonce)
+
+        tx_hash = chain_state.submit(transaction)
         
-        tx = tx_processor.create_transaction(sender, recipient, amount)
-        blockchain.add_pending_transaction(tx)
-        blockchain.mine_pending_transactions("miner_address")
-        
-        return jsonify({'success': True, 'message': 'Transaction created and mined successfully'})
+        return jsonify({
+            'success': True,
+            'message': 'Transaction submitted; it will be included in the next block',
+            'tx_hash': tx_hash
+        }), 202
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
@@ -0,0 +1,113 @@
+import argparse
+import random
+import time
+from block import Block
+from blockchain import Blockchain
+from network_node import BlockchainNode
+from signatures import KeyPair
+from transaction import Transaction
+
+
+def copy_chain(origin: Blockchain) -> Blockchain:
+    """A separate Blockchain holding the same blocks, as a peer that is in sync would"""
+    blockchain = Blockchain(difficulty=origin.difficulty)
+    blockchain.chain = [Block.from_bytes(block.to_bytes()) for block in origin.chain]
+    blockchain.ledger.rebuild(blockchain.chain)
+    return blockchain
+
+
+def build_mesh(count: int, degree: int, seed: int) -> set:
+    """Links of a connected random graph: a ring plus random chords up to about `degree` links per node"""
+    rng = random.Random(seed)
+    links = {(i, (i + 1) % count) for i in range(count)}
+    while len(links) < count * degree // 2:
+        a, b = rng.sample(range(count), 2)
+        if (b, a) not in links:
+            links.add((a, b))
+    return links
+
+
+def traffic(nodes) -> tuple:
+    """Messages and bytes sent so far over every connection of every node"""
+    connections = [connection for node in nodes for connection in list(node.connections)]
+    return sum(c.sent for c in connections), sum(c.bytes_sent for c in connections)
+
+
+def wait_for_height(nodes, height: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while any(len(node.blockchain.chain) < height for node in nodes):
+        if time.monotonic() > deadline:
+            raise TimeoutError("Block did not reach every node")
+        time.sleep(0.001)
+
+
+def simulate(args, announce_inventory: bool) -> dict:
+    """Mine blocks on one node of a local mesh and measure what it takes to reach every node"""
+    keys = [KeyPair((j + 1).to_bytes(32, "big")) for j in range(args.transactions)]
+    origin = Blockchain(difficulty=1)
+    nodes = []
+    try:
+        for position in range(args.nodes):
+            blockchain = origin if position == 0 else copy_chain(origin)
+            node = BlockchainNode(0, blockchain, host='127.0.0.1', announce_inventory=announce_inventory,
+                                  ping_interval=3600)
+            node.start()
+            nodes.append(node)
+        links = build_mesh(args.nodes, args.degree, args.seed)
+        for a, b in links:
+            nodes[a].connect_to_peer('127.0.0.1', nodes[b].port)
+        deadline = time.monotonic() + 10
+        while sum(len(node.connections) for node in nodes) < 2 * len(links):
+            if time.monotonic() > deadline:
+                raise TimeoutError("Mesh did not connect")
+            time.sleep(0.01)
+
+        start_messages, start_bytes = traffic(nodes)
+        propagation = []
+        for round_number in range(args.blocks):
+            transactions = [Transaction(key.address, f"User{round_number}", 0.01) for key in keys]
+            for key, transaction in zip(keys, transactions):
+                transaction.sign(key)
+            block = origin.add_block(transactions)
+            started = time.perf_counter()
+            nodes[0].broadcast_block(block)
+            wait_for_height(nodes, len(origin.chain))
+            propagation.append(time.perf_counter() - started)
+        # Let any duplicate deliveries still in flight be counted
+        time.sleep(0.2)
+        messages, sent_bytes = traffic(nodes)
+        return {
+            'block_bytes': len(block.to_bytes()),
+            'links': len(links),
+            'messages': (messages - start_messages) / args.blocks,
+            'bytes': (sent_bytes - start_bytes) / args.blocks,
+            'propagation': sorted(propagation)[len(propagation) // 2]
+        }
+    finally:
+        for node in nodes:
+            node.stop(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate block gossip in a local mesh, pushing full blocks versus announcing inventory"
+    )
+    parser.add_argument("--nodes", type=int, default=12)
+    parser.add_argument("--degree", type=int, default=4, help="Average links per node")
+    parser.add_argument("--blocks", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=20, help="Signed transactions per block")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    flood = simulate(args, announce_inventory=False)
+    inventory = simulate(args, announce_inventory=True)
+    print(f"{args.nodes} nodes, {flood['links']} links, blocks of {flood['block_bytes']:,} bytes")
+    print(f"{'':>10} {'msgs/block':>11} {'KB/block':>9} {'median ms':>10}")
+    for name, result in (("push", flood), ("inventory", inventory)):
+        print(f"{name:>10} {result['messages']:>11.1f} {result['bytes'] / 1024:>9.1f} "
+              f"{result['propagation'] * 1000:>10.1f}")
+    print(f"Bandwidth saved: {1 - inventory['bytes'] / flood['bytes']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
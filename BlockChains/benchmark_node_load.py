@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from blockchain import Blockchain
+from network_node import BlockchainNode
+from peer_transport import open_peer_connection
+from transaction import Transaction
+
+
+async def run_peer(port: int, duration: float, interval: float, latencies: list, counters: dict) -> None:
+    """
+    One simulated peer: keeps a single connection open, gossips a
+    transaction and pings the node every interval, and records round trips
+    """
+    connection = await open_peer_connection('127.0.0.1', port)
+    sent_at = {}
+    ids = itertools.count()
+
+    async def read_replies():
+        async for message in connection:
+            if message.type == 'pong':
+                latencies.append(time.perf_counter() - sent_at.pop(message.header['id']))
+            else:
+                counters['gossip_received'] += 1
+
+    reader = asyncio.get_event_loop().create_task(read_replies())
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        # Unsigned, so the node rejects it after a trip through its executor
+        transaction = Transaction(f"Peer{id(connection)}", "Bob", 1.0)
+        connection.send({'type': 'new_transaction'}, transaction.to_bytes())
+        message_id = next(ids)
+        sent_at[message_id] = time.perf_counter()
+        connection.send({'type': 'ping', 'id': message_id})
+        counters['sent'] += 2
+        await asyncio.sleep(interval)
+    # Let the last pongs arrive before hanging up
+    await asyncio.sleep(min(1.0, interval * 2))
+    counters['lost'] += len(sent_at)
+    reader.cancel()
+    await connection.close()
+
+
+async def run_load(node: BlockchainNode, peers: int, duration: float, interval: float) -> dict:
+    latencies = []
+    counters = {'sent': 0, 'lost': 0, 'gossip_received': 0}
+    block = node.blockchain.get_latest_block()
+
+    async def broadcast_blocks():
+        # The node also fans a block out to every peer each second
+        while True:
+            await asyncio.sleep(1.0)
+            node.broadcast_block(block)
+
+    broadcaster = asyncio.get_event_loop().create_task(broadcast_blocks())
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_peer(node.port, duration, interval, latencies, counters) for _ in range(peers)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    broadcaster.cancel()
+
+    latencies.sort()
+    return {
+        'errors': sum(isinstance(result, Exception) for result in results),
+        'messages_per_sec': counters['sent'] / elapsed,
+        'p50': statistics.median(latencies) if latencies else float('nan'),
+        'p99': latencies[int(len(latencies) * 0.99)] if latencies else float('nan'),
+        'lost': counters['lost'],
+        'gossip_received': counters['gossip_received']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a node with many simulated peers on localhost")
+    parser.add_argument("--peers", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--interval", type=float, default=0.5,
+                        help="Seconds between each peer's messages")
+    args = parser.parse_args()
+
+    with BlockchainNode(0, Blockchain(difficulty=1), host='127.0.0.1') as node:
+        print(f"{'peers':>6} {'msgs/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'lost':>6} {'errors':>7} {'gossip rx':>10}")
+        for peers in args.peers:
+            result = asyncio.run(run_load(node, peers, args.duration, args.interval))
+            print(f"{peers:>6} {result['messages_per_sec']:>10,.0f} {result['p50'] * 1000:>8.2f} "
+                  f"{result['p99'] * 1000:>8.2f} {result['lost']:>6} {result['errors']:>7} "
+                  f"{result['gossip_received']:>10}")
+
+
+if __name__ == "__main__":
+    main()
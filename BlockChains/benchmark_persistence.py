@@ -0,0 +1,44 @@
+import argparse
+import os
+import tempfile
+import time
+from blockchain_db import BlockchainDB
+from benchmark_serialization import build_chain
+
+
+def persist(chain, db_file: str, **options) -> float:
+    """Write every block through save_block and return the elapsed time"""
+    db = BlockchainDB(db_file, **options)
+    start_time = time.perf_counter()
+    for block in chain:
+        db.save_block(block)
+    db.flush()
+    elapsed = time.perf_counter() - start_time
+    db.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-block and group-committed persistence")
+    parser.add_argument("--blocks", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=20)
+    args = parser.parse_args()
+
+    chain = build_chain(args.blocks, args.transactions)
+    configurations = [
+        ("full", {"durability": "full"}),
+        ("normal", {"durability": "normal"}),
+        ("full+group", {"durability": "full", "group_commit": True}),
+        ("normal+group", {"durability": "normal", "group_commit": True}),
+    ]
+
+    print(f"{args.blocks} blocks x {args.transactions} transactions")
+    print(f"{'mode':>14} {'time (s)':>9} {'blocks/s':>10}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, options in configurations:
+            elapsed = persist(chain, os.path.join(tmpdir, f"{name}.db"), **options)
+            print(f"{name:>14} {elapsed:>9.3f} {args.blocks / elapsed:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
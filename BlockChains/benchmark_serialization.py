@@ -0,0 +1,67 @@
+import argparse
+import json
+import time
+from block import Block
+from transaction import Transaction
+from serialization import encode_chain, decode_chain
+
+
+def build_chain(num_blocks: int, transactions_per_block: int):
+    """Build an unmined chain of blocks with dummy transactions"""
+    chain = []
+    previous_hash = "0"
+    for index in range(num_blocks):
+        transactions = [
+            Transaction(f"User{i}", f"User{i + 1}", 1.25 * i, signature=f"sig{i}")
+            for i in range(transactions_per_block)
+        ]
+        block = Block(index, transactions, previous_hash)
+        chain.append(block)
+        previous_hash = block.hash
+    return chain
+
+
+def json_decode(data: bytes):
+    """Rebuild Block objects from the JSON produced by Block.to_dict"""
+    return [
+        Block(
+            block['index'],
+            [Transaction(**tx) for tx in block['transactions']],
+            block['previous_hash'],
+            block['timestamp'],
+            block['nonce'],
+            block['hash']
+        )
+        for block in json.loads(data)
+    ]
+
+
+def timed(func, *args):
+    start_time = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and binary chain serialization")
+    parser.add_argument("--blocks", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=20)
+    args = parser.parse_args()
+
+    chain = build_chain(args.blocks, args.transactions)
+
+    json_data, json_encode_time = timed(lambda: json.dumps([b.to_dict() for b in chain]).encode())
+    _, json_decode_time = timed(json_decode, json_data)
+
+    binary_data, binary_encode_time = timed(encode_chain, chain)
+    _, binary_decode_time = timed(decode_chain, binary_data)
+
+    print(f"{args.blocks} blocks x {args.transactions} transactions")
+    print(f"{'format':>8} {'bytes':>12} {'encode (s)':>11} {'decode (s)':>11}")
+    print(f"{'json':>8} {len(json_data):>12,} {json_encode_time:>11.3f} {json_decode_time:>11.3f}")
+    print(f"{'binary':>8} {len(binary_data):>12,} {binary_encode_time:>11.3f} {binary_decode_time:>11.3f}")
+    print(f"binary payload is {len(binary_data) / len(json_data):.0%} of JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,177 @@
 from datetime import datetime
 import hashlib
-from typing import List, Any
+import struct
+from typing import List, Any, Optional, Tuple
 import time
+from merkle import MerkleTree
+from transaction import Transaction, timestamp_to_epoch
+from serialization import (
+    FORMAT_VERSION, U8, U32, BLOCK_HEADER, SerializationError, Buffer,
+    encode_hash, decode_hash
+)
+
+# index, timestamp, merkle root, previous hash; the 8-byte nonce follows
+HEADER_PREFIX_FORMAT = struct.Struct(">Qd32s32s")
+
+# Attributes covered by the block hash; assigning one reports a mutation
+HASHED_ATTRIBUTES = frozenset(
+    ('index', 'timestamp', 'previous_hash', 'nonce', 'hash', 'transactions', '_merkle_root')
+)
+
+
+def difficulty_target(difficulty: int) -> int:
+    """
+    Return the integer a SHA-256 digest must be below to have `difficulty`
+    leading zero hex digits
+    """
+    return 1 << (256 - 4 * difficulty)
+
+
+def _mutator(name: str):
+    method = getattr(list, name)
+
+    def mutate(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._changed()
+        return result
+
+    mutate.__name__ = name
+    return mutate
+
+
+class TransactionList(list):
+    """
+    A block's transactions. Changing the list itself, not just a
+    transaction in it, is reported to the block like any other mutation.
+    """
+
+    def __init__(self, block: 'Block', transactions=()):
+        super().__init__(transactions)
+        self._block = block
+
+    def _changed(self) -> None:
+        # Unset while unpickling, which refills the list before restoring it
+        block = self.__dict__.get('_block')
+        if block is None:
+            return
+        for transaction in self:
+            object.__setattr__(transaction, '_block', block)
+        block.mark_mutated()
+
+    __setitem__ = _mutator('__setitem__')
+    __delitem__ = _mutator('__delitem__')
+    __iadd__ = _mutator('__iadd__')
+    __imul__ = _mutator('__imul__')
+    append = _mutator('append')
+    extend = _mutator('extend')
+    insert = _mutator('insert')
+    pop = _mutator('pop')
+    remove = _mutator('remove')
+    clear = _mutator('clear')
+    sort = _mutator('sort')
+    reverse = _mutator('reverse')
+
 
 class Block:
     def __init__(self, index: int, transactions: List[Any], previous_hash: str, 
-                 timestamp: float = None, nonce: int = 0, hash: str = None):
+                 timestamp: float = None, nonce: int = 0, hash: str = None,
+                 merkle_root: Optional[str] = None):
         self.index = index
         self.transactions = transactions
         self.previous_hash = previous_hash
         self.timestamp = timestamp or time.time()
         self.nonce = nonce
+        # A known root (e.g. from a decoded header) defers building the tree
+        self._merkle_root = merkle_root
+        self._merkle_tree = None if merkle_root else self._build_merkle_tree()
         self.hash = hash or self.calculate_hash()
         self.difficulty = 4  # Number of leading zeros required in hash
+        for transaction in transactions:
+            object.__setattr__(transaction, '_block', self)
 
-    def calculate_hash(self) -> str:
-        """Calculate the hash of the block using SHA-256"""
-        block_content = (
-            str(self.index) +
-            str(self.timestamp) +
-            str(self.transactions) +
-            str(self.previous_hash) +
-            str(self.nonce)
+    def __setattr__(self, name, value):
+        if name == 'transactions':
+            value = TransactionList(self, value)
+        object.__setattr__(self, name, value)
+        if name in HASHED_ATTRIBUTES:
+            self.mark_mutated()
+
+    def mark_mutated(self) -> None:
+        """
+        Report a change to hashed contents to the listener set by the chain
+        holding this block, so it can re-verify just this block
+        """
+        listener = self.__dict__.get('_listener')
+        if listener is not None:
+            listener(self)
+
+    def set_listener(self, listener) -> None:
+        object.__setattr__(self, '_listener', listener)
+
+    def _build_merkle_tree(self) -> MerkleTree:
+        return MerkleTree(tx.hash_bytes() for tx in self.transactions)
+
+    @property
+    def merkle_root(self) -> str:
+        """Merkle root over the hashes of the block's transactions"""
+        if self._merkle_tree is None:
+            return self._merkle_root
+        return self._merkle_tree.root
+
+    def add_transaction(self, transaction) -> None:
+        """
+        Append a transaction while building a block template.
+        Only the Merkle path of the new leaf is rehashed.
+        """
+        if self._merkle_tree is None:
+            self._merkle_tree = self._build_merkle_tree()
+        list.append(self.transactions, transaction)
+        self._merkle_tree.append(transaction.hash_bytes())
+        object.__setattr__(transaction, '_block', self)
+        self.mark_mutated()
+
+    def compute_merkle_root(self) -> str:
+        """Recompute the Merkle root from the current transaction contents"""
+        return MerkleTree.compute_root(tx.hash_bytes() for tx in self.transactions)
+
+    def _hash_prefix(self) -> bytes:
+        """Serialize the fixed-size header fields that do not depend on the nonce"""
+        return HEADER_PREFIX_FORMAT.pack(
+            self.index,
+            timestamp_to_epoch(self.timestamp),
+            bytes.fromhex(self.merkle_root),
+            encode_hash(self.previous_hash)
         )
-        return hashlib.sha256(block_content.encode()).hexdigest()
 
-    def mine_block(self, difficulty: int) -> None:
-        """Mine the block by finding a hash with specified number of leading zeros"""
+    def calculate_hash(self) -> str:
+        """Calculate the hash of the block header using SHA-256"""
+        return hashlib.sha256(self._hash_prefix() + self.nonce.to_bytes(8, "big")).hexdigest()
+
+    def mine_block(self, difficulty: int, miner=None) -> None:
+        """
+        Mine the block by finding a hash with specified number of leading zeros.
+        If a ParallelMiner is given the nonce search is spread across its workers.
+        """
+        if miner is not None:
+            miner.mine(self, difficulty)
+            return
+
         self.difficulty = difficulty
-        target = "0" * difficulty
-        
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        target = difficulty_target(difficulty)
+
+        # Hash the fixed prefix once; each attempt only feeds the nonce bytes
+        prefix_state = hashlib.sha256(self._hash_prefix())
+        nonce = self.nonce
+        while True:
+            attempt = prefix_state.copy()
+            attempt.update(nonce.to_bytes(8, "big"))
+            digest = attempt.digest()
+            if int.from_bytes(digest, "big") < target:
+                break
+            nonce += 1
+
+        self.nonce = nonce
+        self.hash = digest.hex()
 
     def to_dict(self) -> dict:
         """Convert block to dictionary format"""
@@ -41,6 +180,59 @@ class Block:
             'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
             'transactions': [tx.to_dict() for tx in self.transactions],
             'previous_hash': self.previous_hash,
+            'merkle_root': self.merkle_root,
             'hash': self.hash,
             'nonce': self.nonce
-        } 
\ No newline at end of file
+        }
+
+    def to_bytes(self) -> bytes:
+        """Encode the block in the canonical, versioned binary format"""
+        parts = [
+            U8.pack(FORMAT_VERSION),
+            BLOCK_HEADER.pack(
+                self.index,
+                timestamp_to_epoch(self.timestamp),
+                bytes.fromhex(self.merkle_root),
+                encode_hash(self.previous_hash),
+                self.nonce,
+                encode_hash(self.hash),
+                self.difficulty
+            ),
+            U32.pack(len(self.transactions))
+        ]
+        parts.extend(tx.encode() for tx in self.transactions)
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, view: memoryview, offset: int = 0) -> Tuple['Block', int]:
+        """Decode a block starting at offset; returns the block and the next offset"""
+        try:
+            (version,) = U8.unpack_from(view, offset)
+            if version > FORMAT_VERSION:
+                raise SerializationError(f"Unsupported block format version {version}")
+            offset += U8.size
+
+            index, timestamp, merkle_root, _, nonce, _, difficulty = BLOCK_HEADER.unpack_from(view, offset)
+            previous_hash = decode_hash(view, offset + 48)
+            block_hash = decode_hash(view, offset + 88)
+            offset += BLOCK_HEADER.size
+
+            (count,) = U32.unpack_from(view, offset)
+            offset += U32.size
+            transactions = []
+            for _ in range(count):
+                transaction, offset = Transaction.decode(view, offset, version)
+                transactions.append(transaction)
+        except struct.error as e:
+            raise SerializationError(f"Truncated block: {e}") from e
+
+        block = cls(index, transactions, previous_hash, timestamp, nonce, block_hash,
+                    merkle_root=merkle_root.hex())
+        block.difficulty = difficulty
+        return block, offset
+
+    @classmethod
+    def from_bytes(cls, data: Buffer) -> 'Block':
+        """Decode a block produced by to_bytes"""
+        block, _ = cls.decode(memoryview(data))
+        return block
@@ -1,42 +1,76 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
+import threading
 from block import Block
-from transaction import Transaction
+from transaction import Transaction, COINBASE_SENDER
 from blockchain_db import BlockchainDB
+from chain_view import ChainView
 from security import BlockchainSecurity
 from transaction_processor import TransactionProcessor
+from miner import ParallelMiner
+from chain_verifier import ParallelVerifier
+from signatures import SignatureVerifier
+from ledger import BalanceLedger
+from mempool import Mempool, MempoolError
+
+# Encoded size limit of the transactions in a mined block
+MAX_BLOCK_BYTES = 1_000_000
 
 class Blockchain:
-    def __init__(self, difficulty: int = 4, db: Optional[BlockchainDB] = None):
-        self.chain: List[Block] = []
+    def __init__(self, difficulty: int = 4, db: Optional[BlockchainDB] = None,
+                 miner: Optional[ParallelMiner] = None, window_size: int = 256,
+                 verifier: Optional[ParallelVerifier] = None,
+                 signature_verifier: Optional[SignatureVerifier] = None):
+        self.chain: Union[List[Block], ChainView] = []
         self.difficulty = difficulty
-        self.pending_transactions: List[Transaction] = []
+        self._pending_lock = threading.Lock()
         self.mining_reward = 10.0
+        self.max_block_bytes = MAX_BLOCK_BYTES
         self.db = db
+        self.miner = miner
+        # Spreads full-chain scans in is_chain_valid across worker processes
+        self.verifier = verifier
+        # Batch-verifies the signatures of blocks received from peers
+        self.signature_verifier = signature_verifier
         self.transaction_processor = TransactionProcessor()
+        self.ledger = BalanceLedger()
+        self.mempool = Mempool(next_nonce=self.ledger.next_nonce)
+        # Chain position and hash of the last block verified by is_chain_valid,
+        # plus verified blocks whose contents have been mutated since
+        self._verified: Optional[Tuple[int, str]] = None
+        self._mutated: Dict[int, Block] = {}
+        self._verify_lock = threading.Lock()
         
         # If we have a database, load the existing chain or create genesis block
         if self.db:
-            existing_blocks = self.db.get_all_blocks()
-            if existing_blocks:
-                # Convert dictionary blocks to Block objects
-                self.chain = [Block(
-                    block['block_index'],
-                    block['transactions'],
-                    block['previous_hash'],
-                    block['timestamp'],
-                    block['nonce'],
-                    block['hash']
-                ) for block in existing_blocks]
-            else:
+            # Keep only the tip and a window of recent blocks in memory
+            self.chain = ChainView(self.db, window_size)
+            self.chain.set_block_listener(self._on_block_mutated)
+            if not self.chain:
                 self._create_genesis_block()
         else:
             self._create_genesis_block()
 
+        # Index balances once so lookups no longer rescan the chain
+        self.ledger.rebuild(self.chain)
+
     def _create_genesis_block(self) -> None:
         """Create the first block in the chain"""
         genesis_block = Block(0, [], "0")
-        genesis_block.mine_block(self.difficulty)
-        self.chain.append(genesis_block)
+        genesis_block.mine_block(self.difficulty, miner=self.miner)
+        self._append(genesis_block)
+
+    def _append(self, block: Block) -> None:
+        # With a database the chain view persists the block on append
+        if not isinstance(self.chain, ChainView):
+            block.set_listener(self._on_block_mutated)
+        self.chain.append(block)
+
+    def _extend(self, blocks: List[Block]) -> None:
+        # A chain view persists the blocks in one batch
+        if not isinstance(self.chain, ChainView):
+            for block in blocks:
+                block.set_listener(self._on_block_mutated)
+        self.chain.extend(blocks)
 
     def get_latest_block(self) -> Block:
         """Return the most recent block in the chain"""
@@ -44,93 +78,216 @@ class Blockchain:
 
     def add_block(self, transactions: List[Transaction]) -> Block:
         """Create a new block and add it to the chain"""
+        latest_block = self.get_latest_block()
         new_block = Block(
-            len(self.chain),
+            latest_block.index + 1,
             transactions,
-            self.get_latest_block().hash
+            latest_block.hash
         )
-        new_block.mine_block(self.difficulty)
+        new_block.mine_block(self.difficulty, miner=self.miner)
         
-        # Save to database if available
-        if self.db:
-            # Convert the block to a format suitable for database storage
-            block_data = {
-                'block_index': new_block.index,
-                'transactions': new_block.transactions,
-                'previous_hash': new_block.previous_hash,
-                'timestamp': str(new_block.timestamp),
-                'nonce': new_block.nonce,
-                'hash': new_block.hash
-            }
-            if isinstance(block_data, dict):
-                block_data = Block(
-                    index=block_data['block_index'],
-                    timestamp=block_data['timestamp'],
-                    transactions=block_data['transactions'],
-                    previous_hash=block_data['previous_hash'],
-                    nonce=block_data['nonce']
-                )
-            self.db.save_block(block_data)
-        
-        self.chain.append(new_block)
+        self._append(new_block)
+        self.ledger.apply_block(new_block)
         return new_block
 
-    def is_chain_valid(self) -> bool:
-        """Verify the integrity of the blockchain"""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
+    @property
+    def verified_height(self) -> int:
+        """Index of the last block verified by is_chain_valid, or -1"""
+        if self._verified is None:
+            return -1
+        return self.chain[0].index + self._verified[0]
 
-            # Verify current block's hash
-            if current_block.hash != current_block.calculate_hash():
-                return False
+    def _on_block_mutated(self, block: Block) -> None:
+        """Mutation listener: remember verified blocks that need re-checking"""
+        if self._verified is not None and block.index - self.chain[0].index <= self._verified[0]:
+            self._mutated[block.index] = block
 
-            # Verify chain linkage
-            if current_block.previous_hash != previous_block.hash:
-                return False
+    @staticmethod
+    def _block_is_intact(block: Block) -> bool:
+        """Check a block's contents against its Merkle root and its header against its hash"""
+        return (block.merkle_root == block.compute_merkle_root() and
+                block.hash == block.calculate_hash())
+
+    def is_chain_valid(self, deep: bool = False) -> bool:
+        """
+        Verify the integrity of the blockchain.
+
+        Blocks up to the verified watermark are trusted unless they were
+        mutated since, so a call only rehashes new or changed blocks.
+        deep=True ignores the watermark and rescans every block.
+        """
+        with self._verify_lock:
+            if not self.chain:
+                return True
+            first_index = self.chain[0].index
+            start = 1
+            if not deep and self._verified is not None:
+                position, verified_hash = self._verified
+                if position < len(self.chain) and self.chain[position].hash == verified_hash:
+                    start = position + 1
+
+            if start > 1:
+                for index, block in list(self._mutated.items()):
+                    position = index - first_index
+                    if not self._block_is_intact(block):
+                        return False
+                    if position > 0 and block.previous_hash != self.chain[position - 1].hash:
+                        return False
+                    if position + 1 < len(self.chain) and self.chain[position + 1].previous_hash != block.hash:
+                        return False
+                    del self._mutated[index]
+
+            if start == 1 and self.verifier is not None:
+                if not self.verifier.verify_chain(self.chain, proof_of_work=False, signatures=False):
+                    return False
+                tip = self.chain[-1]
+                self._verified = (tip.index - first_index, tip.hash)
+                self._mutated.clear()
+                return True
+
+            if start == 1:
+                # Stream the full scan rather than materializing the chain
+                blocks = iter(self.chain)
+                previous_block = next(blocks)
+            else:
+                previous_block = self.chain[start - 1]
+                blocks = iter(self.chain[start:])
+            for current_block in blocks:
+                # Verify the transactions still match the committed Merkle root
+                # and the current block's hash
+                if not self._block_is_intact(current_block):
+                    return False
+
+                # Verify chain linkage
+                if current_block.previous_hash != previous_block.hash:
+                    return False
+
+                previous_block = current_block
+
+            self._verified = (previous_block.index - first_index, previous_block.hash)
+            self._mutated.clear()
+            return True
 
-        return True 
+    def verify_ledger(self) -> bool:
+        """Check the balance ledger against a full rescan of the chain"""
+        return self.ledger.is_consistent(self.chain)
+
+    @property
+    def pending_transactions(self) -> List[Transaction]:
+        """Transactions waiting in the mempool, in arrival order"""
+        return self.mempool.transactions()
+
+    @property
+    def pending_spends(self) -> Dict[str, int]:
+        """Per-sender total of unconfirmed spends, in fixed-point units"""
+        return self.mempool.spends()
 
     def add_pending_transaction(self, transaction: Transaction) -> None:
-        """Add a transaction to pending transactions"""
+        """
+        Add a transaction to the mempool. Raises MempoolError if it is
+        already pending or is outbid for space or for its nonce.
+        """
         if self.transaction_processor.validate_transaction(transaction):
-            self.pending_transactions.append(transaction)
+            self.mempool.add(transaction)
+
+    def admit_transaction(self, transaction: Transaction) -> bool:
+        """
+        Verify a transaction and add it to pending transactions in one step,
+        so concurrent submissions cannot overspend the same balance
+        """
+        if not self.transaction_processor.validate_transaction(transaction):
+            return False
+        with self._pending_lock:
+            if not self.verify_transaction(transaction):
+                return False
+            try:
+                self.mempool.add(transaction)
+            except MempoolError:
+                return False
+            return True
 
-    def mine_pending_transactions(self, miner_address: str) -> None:
+    def mine_pending_transactions(self, miner_address: str, max_transactions: Optional[int] = None) -> Block:
         """
-        Mine pending transactions and create a new block
-        Reward is sent to miner_address
+        Mine a block from the top of the mempool, up to max_block_bytes
+        (and max_transactions, if given) of the highest fee-rate transactions.
+        The reward and the fees are sent to miner_address.
         """
+        new_block = self.prepare_block(miner_address, max_transactions)
+        new_block.mine_block(self.difficulty, miner=self.miner)
+        self.append_mined_block(new_block)
+        return new_block
+
+    def prepare_block(self, miner_address: str, max_transactions: Optional[int] = None) -> Block:
+        """
+        An unmined block on the current tip holding the top of the mempool and
+        the mining reward. It can be mined without holding any lock on the
+        chain, then added with append_mined_block.
+        """
+        transactions = self.mempool.block_template(self.max_block_bytes, max_transactions)
+
         # Create mining reward transaction
         reward_transaction = Transaction(
-            "System",
+            COINBASE_SENDER,
             miner_address,
             self.mining_reward
         )
 
-        # Add reward transaction to pending transactions
-        self.pending_transactions.append(reward_transaction)
+        latest_block = self.get_latest_block()
+        return Block(latest_block.index + 1, transactions + [reward_transaction], latest_block.hash)
 
-        # Create new block with all pending transactions
-        new_block = self.add_block(self.pending_transactions)
-        
-        # Clear pending transactions
-        self.pending_transactions = []
+    def append_mined_block(self, block: Block) -> bool:
+        """Append a block mined from prepare_block; False if the tip has moved on since"""
+        if block.previous_hash != self.get_latest_block().hash:
+            return False
+        self._append(block)
+        self.ledger.apply_block(block)
+
+        # The spends are in the ledger now, so stop counting them as pending.
+        # Until this point they still held back the senders' balances.
+        self.mempool.remove_confirmed(block.transactions)
+        return True
 
     def verify_block(self, block: Block) -> bool:
         """Verify a block received from peers"""
-        return BlockchainSecurity.verify_block_integrity(block)
+        # The difficulty a block states comes from the peer, so it is only a floor
+        return BlockchainSecurity.verify_block_integrity(block, self.signature_verifier, self.difficulty)
 
     def add_block_from_peer(self, block: Block) -> bool:
         """Add a verified block from a peer"""
         if self.verify_block(block) and block.previous_hash == self.get_latest_block().hash:
-            self.chain.append(block)
+            self._append(block)
+            self.ledger.apply_block(block)
+            self.mempool.remove_confirmed(block.transactions)
             return True
         return False
 
+    def add_blocks_from_peer(self, blocks: List[Block]) -> int:
+        """
+        Add consecutive blocks from a peer, such as a window downloaded while
+        syncing, persisting them together. Stops at the first block that fails
+        verification or does not extend the chain; returns how many were added.
+        """
+        previous_hash = self.get_latest_block().hash
+        accepted = []
+        for block in blocks:
+            if block.previous_hash != previous_hash or not self.verify_block(block):
+                break
+            accepted.append(block)
+            previous_hash = block.hash
+        if accepted:
+            self._extend(accepted)
+            for block in accepted:
+                self.ledger.apply_block(block)
+                self.mempool.remove_confirmed(block.transactions)
+        return len(accepted)
+
     def verify_transaction(self, transaction: Transaction) -> bool:
         """Verify a transaction before adding to pending"""
         return (
             BlockchainSecurity.verify_transaction_signature(transaction) and
-            BlockchainSecurity.detect_double_spending(self.chain, transaction)
+            BlockchainSecurity.has_sufficient_funds(
+                self.ledger,
+                self.mempool.spent_units(transaction.sender),
+                transaction
+            )
         )
\ No newline at end of file
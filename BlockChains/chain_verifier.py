@@ -0,0 +1,167 @@
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from block import Block
+from serialization import frame_chain, iter_decode_chain
+from security import BlockchainSecurity
+from worker_pool import WorkerPool
+
+
+class BlockCheck(NamedTuple):
+    """
+    Header fields of one block together with its independent checks: whether
+    its Merkle root and hash match, whether the proof of work holds, and the
+    transfers whose signatures fail
+    """
+    index: int
+    timestamp: float
+    previous_hash: str
+    hash: str
+    intact: bool
+    proof_of_work: bool
+    bad_signatures: List[str]
+
+    @property
+    def integrity(self) -> bool:
+        """Same outcome as BlockchainSecurity.verify_block_integrity"""
+        return self.intact and self.proof_of_work and not self.bad_signatures
+
+
+def _check_block(block: Block) -> BlockCheck:
+    intact = (block.compute_merkle_root() == block.merkle_root and
+              block.calculate_hash() == block.hash)
+    proof_of_work = block.hash.startswith('0' * block.difficulty)
+    bad_signatures = [
+        f'{tx.sender} -> {tx.recipient}'
+        for tx in BlockchainSecurity.block_signature_failures(block)
+    ]
+    return BlockCheck(block.index, block.timestamp, block.previous_hash, block.hash,
+                      intact, proof_of_work, bad_signatures)
+
+
+def _check_shard(data: bytes) -> List[BlockCheck]:
+    """Pool task: decode a shard of blocks and check each one"""
+    return [_check_block(block) for block in iter_decode_chain(data)]
+
+
+class ParallelVerifier(WorkerPool):
+    """
+    Verifies a chain by splitting it into shards of consecutive blocks and
+    rehashing them on a pool of worker processes. Every block's hash, Merkle
+    root, proof of work and signatures can be checked on its own; only the
+    linkage between blocks needs the whole chain, and that sequential pass
+    just compares strings.
+
+    Results match the serial BlockchainSecurity checks. The time spent in
+    each phase of the last run is kept in `timings`.
+    """
+
+    def __init__(self, workers: Optional[int] = None, shard_size: int = 500,
+                 min_parallel_blocks: int = 2000):
+        super().__init__(workers)
+        self.shard_size = shard_size
+        # Shorter chains are checked in-process
+        self.min_parallel_blocks = min_parallel_blocks
+        self.timings: Dict[str, float] = {}
+
+    def check_blocks(self, blocks: Iterable[Block]) -> List[BlockCheck]:
+        """
+        Run the per-block checks over `blocks` (a list, ChainView or any
+        iterable), in parallel when there are enough of them
+        """
+        started = time.perf_counter()
+        encode_time = 0.0
+        checks: List[BlockCheck] = []
+
+        try:
+            parallel = self.workers > 1 and len(blocks) >= self.min_parallel_blocks
+        except TypeError:
+            parallel = self.workers > 1
+
+        if not parallel:
+            checks = [_check_block(block) for block in blocks]
+        else:
+            executor = self._get_executor()
+            in_flight = deque()
+            # Workers receive encoded shards; a ChainView hands over the
+            # stored encodings so the parent never decodes those blocks
+            if hasattr(blocks, 'iter_encoded'):
+                encoded = blocks.iter_encoded()
+            else:
+                encoded = (block.to_bytes() for block in blocks)
+
+            while True:
+                encode_started = time.perf_counter()
+                shard = list(islice(encoded, self.shard_size))
+                data = frame_chain(shard) if shard else None
+                encode_time += time.perf_counter() - encode_started
+                if data is None:
+                    break
+                in_flight.append(executor.submit(_check_shard, data))
+                # Bound the encoded shards held in memory while streaming
+                if len(in_flight) >= self.workers * 2:
+                    checks.extend(in_flight.popleft().result())
+            while in_flight:
+                checks.extend(in_flight.popleft().result())
+
+        self.timings = {
+            'encode': encode_time,
+            'hash': time.perf_counter() - started - encode_time
+        }
+        return checks
+
+    def _timed(self, phase: str, started: float) -> float:
+        now = time.perf_counter()
+        self.timings[phase] = now - started
+        return now
+
+    def verify_chain(self, chain: Iterable[Block], proof_of_work: bool = True,
+                     signatures: bool = True) -> bool:
+        """
+        Parallel BlockchainSecurity.verify_chain_integrity. Turning off
+        proof_of_work and signatures leaves the hash and linkage checks
+        that Blockchain.is_chain_valid performs.
+        """
+        checks = self.check_blocks(chain)
+        started = time.perf_counter()
+        valid = True
+        for previous, check in zip(checks, checks[1:]):
+            if (check.previous_hash != previous.hash or not check.intact or
+                    (proof_of_work and not check.proof_of_work) or
+                    (signatures and check.bad_signatures)):
+                valid = False
+                break
+        self._timed('linkage', started)
+        self.timings['total'] = sum(self.timings.values())
+        return valid
+
+    def audit_chain(self, chain: Iterable[Block]) -> List[dict]:
+        """Parallel BlockchainSecurity.audit_chain; returns the same report"""
+        checks = self.check_blocks(chain)
+
+        started = time.perf_counter()
+        broken_links = {
+            position for position in range(1, len(checks))
+            if checks[position].previous_hash != checks[position - 1].hash
+        }
+        started = self._timed('linkage', started)
+
+        audit_results = []
+        for position, check in enumerate(checks):
+            issues = []
+            if not check.integrity:
+                issues.append('Block integrity compromised')
+            if position in broken_links:
+                issues.append('Invalid block linkage')
+            for transfer in check.bad_signatures:
+                issues.append(f'Invalid transaction signature: {transfer}')
+            if issues:
+                audit_results.append({
+                    'block_index': check.index,
+                    'timestamp': check.timestamp,
+                    'issues': issues
+                })
+        self._timed('report', started)
+        self.timings['total'] = sum(self.timings.values())
+        return audit_results
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+import threading
+from typing import Iterator, List, Optional, Union
+from block import Block
+from blockchain_db import BlockchainDB
+
+
+class ChainView:
+    """
+    List-like view of a chain stored in BlockchainDB.
+
+    Only the tip and a bounded LRU window of recently used blocks are kept
+    in memory; anything older is fetched from the database on demand.
+    len(), indexing (including negative indices and slices), iteration and
+    append() behave like the plain list the chain used to be. Safe to share
+    between threads: the window and tip are guarded by a lock, which is
+    never held across a database read.
+    """
+
+    def __init__(self, db: BlockchainDB, window_size: int = 256):
+        self.db = db
+        self.window_size = window_size
+        self._window: "OrderedDict[int, Block]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Set on every resident block so in-memory mutations are reported
+        self.block_listener = None
+
+        first_index, last_index = db.get_index_range()
+        # Positions map onto block indices starting at the first stored block
+        self._first_index = first_index if first_index is not None else 0
+        self._length = 0 if first_index is None else last_index - first_index + 1
+        self._tip: Optional[Block] = db.load_block(last_index) if last_index is not None else None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def _position(self, position: int) -> int:
+        if position < 0:
+            position += self._length
+        if not 0 <= position < self._length:
+            raise IndexError("chain index out of range")
+        return position
+
+    def set_block_listener(self, listener) -> None:
+        """Install a mutation listener on resident blocks and every block loaded later"""
+        with self._lock:
+            self.block_listener = listener
+            for block in self._window.values():
+                self._attach(block)
+            if self._tip is not None:
+                self._attach(self._tip)
+
+    def _attach(self, block: Block) -> Block:
+        if self.block_listener is not None:
+            block.set_listener(self.block_listener)
+        return block
+
+    def _remember(self, block: Block) -> None:
+        """Put a block in the LRU window, evicting the least recently used"""
+        with self._lock:
+            self._attach(block)
+            self._window[block.index] = block
+            self._window.move_to_end(block.index)
+            while len(self._window) > self.window_size:
+                self._window.popitem(last=False)
+
+    def _cached(self, index: int) -> Optional[Block]:
+        with self._lock:
+            if self._tip is not None and self._tip.index == index:
+                return self._tip
+            block = self._window.get(index)
+            if block is not None:
+                self._window.move_to_end(index)
+            return block
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Block, List[Block]]:
+        if isinstance(key, slice):
+            positions = range(*key.indices(self._length))
+            if positions.step != 1:
+                return [self[position] for position in positions]
+            if not positions:
+                return []
+            start = self._first_index + positions.start
+            stop = self._first_index + positions.stop
+            return [self._cached(block.index) or block for block in self.db.iter_blocks(start, stop)]
+
+        index = self._first_index + self._position(key)
+        block = self._cached(index)
+        if block is None:
+            block = self.db.load_block(index)
+            self._remember(block)
+        return block
+
+    def __iter__(self) -> Iterator[Block]:
+        """Stream blocks from the database without keeping them resident"""
+        stop = self._first_index + self._length
+        for block in self.db.iter_blocks(self._first_index, stop):
+            yield self._cached(block.index) or block
+
+    def iter_encoded(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Stream the binary encoding of the blocks at positions start to stop
+        (every block by default), straight from the database for blocks that
+        are not resident, so nothing is decoded to be re-encoded
+        """
+        stop = self._length if stop is None else min(stop, self._length)
+        for index, data in self.db.iter_encoded_blocks(self._first_index + start, self._first_index + stop):
+            block = self._cached(index)
+            yield block.to_bytes() if block is not None else data
+
+    def append(self, block: Block) -> None:
+        """Persist a new tip block and make it resident"""
+        self.db.save_block(block)
+        self._push(block)
+
+    def extend(self, blocks: List[Block]) -> None:
+        """Persist consecutive new tip blocks in a single database transaction"""
+        # Blocks queued for group commit go first, so rows commit in chain order
+        self.db.flush()
+        self.db.save_blocks(blocks)
+        for block in blocks:
+            self._push(block)
+
+    def _push(self, block: Block) -> None:
+        with self._lock:
+            if self._length == 0:
+                self._first_index = block.index
+            self._length += 1
+            if self._tip is not None:
+                self._remember(self._tip)
+            self._tip = self._attach(block)
+
+    def get_by_hash(self, block_hash: str) -> Optional[Block]:
+        """Find a block by hash, checking resident blocks before the database"""
+        with self._lock:
+            resident = list(self._window.values())
+            if self._tip is not None:
+                resident.append(self._tip)
+        for block in resident:
+            if block.hash == block_hash:
+                return block
+        block = self.db.load_block_by_hash(block_hash)
+        if block is not None:
+            self._remember(block)
+        return block
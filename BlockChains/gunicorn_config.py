@@ -3,9 +3,60 @@ import multiprocessing
 # Gunicorn configuration
 bind = "0.0.0.0:5000"
 workers = multiprocessing.cpu_count() * 2 + 1
-threads = 2
+# Each open /events stream holds a thread for as long as the client listens;
+# api.py refuses streams beyond EVENT_MAX_SUBSCRIBERS per worker so that the
+# remaining threads stay free for other requests. Keep it below threads.
+threads = 8
 worker_class = "sync"
 timeout = 120
 keepalive = 5
 max_requests = 1000
-max_requests_jitter = 50 
\ No newline at end of file
+max_requests_jitter = 50
+
+# A single chain state owner process mines and holds the authoritative chain.
+# Workers read its snapshot and the shared database file, and forward
+# submissions to it, so they all serve the same chain.
+def on_starting(server):
+    import os
+    import secrets
+    import tempfile
+    import time
+    from chain_state import run_owner
+
+    runtime_dir = tempfile.mkdtemp(prefix="blockchain-")
+    os.environ.setdefault('CHAIN_DB', os.path.join(runtime_dir, "chain.db"))
+    os.environ['CHAIN_SNAPSHOT'] = os.path.join(runtime_dir, "chain.snapshot")
+    os.environ['CHAIN_OWNER_ADDRESS'] = os.path.join(runtime_dir, "owner.sock")
+    os.environ['CHAIN_OWNER_AUTHKEY'] = secrets.token_hex(16)
+
+    context = multiprocessing.get_context("spawn")
+    server.chain_owner = context.Process(
+        target=run_owner,
+        args=(
+            os.environ['CHAIN_DB'],
+            os.environ['CHAIN_SNAPSHOT'],
+            os.environ['CHAIN_OWNER_ADDRESS'],
+            bytes.fromhex(os.environ['CHAIN_OWNER_AUTHKEY'])
+        ),
+        kwargs={
+            'block_interval': float(os.getenv('BLOCK_INTERVAL', '10')),
+            'block_max_transactions': int(os.getenv('BLOCK_MAX_TRANSACTIONS', '100')),
+            'mining_workers': int(os.getenv('MINING_WORKERS', '0')) or None
+        },
+        name="chain-owner"
+    )
+    server.chain_owner.start()
+
+    # Workers need the first snapshot and the owner's socket before serving
+    while not (os.path.exists(os.environ['CHAIN_SNAPSHOT']) and
+               os.path.exists(os.environ['CHAIN_OWNER_ADDRESS'])):
+        if not server.chain_owner.is_alive():
+            raise RuntimeError("Chain state owner exited during startup")
+        time.sleep(0.1)
+
+
+def on_exit(server):
+    owner = getattr(server, 'chain_owner', None)
+    if owner is not None:
+        owner.terminate()
+        owner.join()
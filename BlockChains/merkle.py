@@ -0,0 +1,81 @@
+import hashlib
+from typing import Iterable, List
+
+# Root of a block without transactions
+EMPTY_ROOT = b"\x00" * 32
+
+
+def hash_pair(left: bytes, right: bytes) -> bytes:
+    """Hash two child nodes into their parent"""
+    return hashlib.sha256(left + right).digest()
+
+
+class MerkleTree:
+    """
+    Binary Merkle tree over 32-byte leaf digests.
+
+    Every level is kept in memory so appending a leaf only rehashes the
+    path from that leaf to the root (O(log n)). A node without a sibling
+    is paired with itself, as in Bitcoin.
+    """
+
+    def __init__(self, leaves: Iterable[bytes] = ()):
+        self.levels: List[List[bytes]] = [[]]
+        for leaf in leaves:
+            self.append(leaf)
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def append(self, leaf: bytes) -> None:
+        """Add a leaf and update the hashes along its path to the root"""
+        self.levels[0].append(leaf)
+        self._update_path(len(self.levels[0]) - 1)
+
+    def update(self, index: int, leaf: bytes) -> None:
+        """Replace an existing leaf and rehash its path to the root"""
+        self.levels[0][index] = leaf
+        self._update_path(index)
+
+    def _update_path(self, index: int) -> None:
+        level = 0
+        while len(self.levels[level]) > 1:
+            nodes = self.levels[level]
+            parent = index // 2
+            left = nodes[parent * 2]
+            right = nodes[parent * 2 + 1] if parent * 2 + 1 < len(nodes) else left
+
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            parents = self.levels[level + 1]
+            if parent < len(parents):
+                parents[parent] = hash_pair(left, right)
+            else:
+                parents.append(hash_pair(left, right))
+
+            index = parent
+            level += 1
+
+    @property
+    def root_bytes(self) -> bytes:
+        """Return the root digest"""
+        if not self.levels[0]:
+            return EMPTY_ROOT
+        return self.levels[-1][0]
+
+    @property
+    def root(self) -> str:
+        """Return the root digest as a hex string"""
+        return self.root_bytes.hex()
+
+    @staticmethod
+    def compute_root(leaves: Iterable[bytes]) -> str:
+        """Compute a root from scratch, level by level"""
+        nodes = list(leaves)
+        if not nodes:
+            return EMPTY_ROOT.hex()
+        while len(nodes) > 1:
+            if len(nodes) % 2:
+                nodes.append(nodes[-1])
+            nodes = [hash_pair(nodes[i], nodes[i + 1]) for i in range(0, len(nodes), 2)]
+        return nodes[0].hex()
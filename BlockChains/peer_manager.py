@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+from peer_transport import PeerConnection
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class NodeInfo:
+    address: str
+    port: int
+    is_mining: bool = False
+    last_seen: float = 0
+    # Smoothed ping round trip in seconds, once measured
+    latency: Optional[float] = None
+    # Connection attempts that failed or dropped since the last success
+    failures: int = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.address}:{self.port}"
+
+
+class PeerManager:
+    """
+    Keeps one warm outbound connection to every known peer.
+
+    Each peer gets a task that connects, serves the connection until it
+    drops, and reconnects after an exponential backoff with jitter. Live
+    connections are pinged every ping_interval to measure latency, and
+    closed when a ping goes unanswered for ping_timeout so a dead peer is
+    noticed even when nothing is being sent to it. Must be used from the
+    event loop.
+    """
+
+    def __init__(self, open_connection: Callable[[NodeInfo], Awaitable[PeerConnection]],
+                 serve: Callable[[PeerConnection, NodeInfo], Awaitable[None]],
+                 connect_timeout: float = 5.0, min_backoff: float = 0.5, max_backoff: float = 30.0,
+                 ping_interval: float = 15.0, ping_timeout: float = 30.0):
+        self.open_connection = open_connection
+        self.serve = serve
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.peers: Dict[str, NodeInfo] = {}
+        self.connections: Dict[str, PeerConnection] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._connected: Dict[str, asyncio.Event] = {}
+
+    def add(self, info: NodeInfo) -> NodeInfo:
+        """Start maintaining a connection to a peer; returns its NodeInfo"""
+        info = self.peers.setdefault(info.key, info)
+        if info.key not in self._tasks:
+            self._connected[info.key] = asyncio.Event()
+            self._tasks[info.key] = asyncio.get_event_loop().create_task(self._maintain(info))
+        return info
+
+    async def wait_connected(self, key: str, timeout: Optional[float] = None) -> bool:
+        """Wait until the peer is connected; returns False on timeout"""
+        try:
+            await asyncio.wait_for(self._connected[key].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def remove(self, key: str) -> None:
+        """Forget a peer and close its connection"""
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+        self._connected.pop(key, None)
+        self.peers.pop(key, None)
+        connection = self.connections.pop(key, None)
+        if connection is not None:
+            await connection.close()
+
+    async def close(self) -> None:
+        for key in list(self._tasks):
+            task = self._tasks.pop(key)
+            task.cancel()
+        for connection in list(self.connections.values()):
+            await connection.close()
+        self.connections.clear()
+
+    def backoff(self, failures: int) -> float:
+        """Delay before the next attempt after `failures` consecutive failures"""
+        delay = min(self.max_backoff, self.min_backoff * 2 ** max(0, failures - 1))
+        # Jitter keeps peers that dropped together from reconnecting in step
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _maintain(self, info: NodeInfo) -> None:
+        while True:
+            try:
+                connection = await asyncio.wait_for(self.open_connection(info), self.connect_timeout)
+            except (OSError, asyncio.TimeoutError):
+                info.failures += 1
+                await asyncio.sleep(self.backoff(info.failures))
+                continue
+
+            info.failures = 0
+            info.last_seen = time.time()
+            self.connections[info.key] = connection
+            self._connected[info.key].set()
+            keepalive = asyncio.get_event_loop().create_task(self._keepalive(connection))
+            try:
+                await self.serve(connection, info)
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                # Connection failures, and ProtocolError or SerializationError
+                # (both ValueErrors) from a peer sending malformed messages
+                logger.warning("Dropped peer %s: %s", info.key, e)
+                await connection.close()
+            except Exception:
+                # A bug rather than a bad peer: log it in full, but keep the
+                # peer's reconnect task alive
+                logger.exception("Unexpected error serving peer %s", info.key)
+                await connection.close()
+            finally:
+                keepalive.cancel()
+                self.connections.pop(info.key, None)
+                if info.key in self._connected:
+                    self._connected[info.key].clear()
+            # Even a clean hang-up waits a little, so a peer that keeps
+            # dropping connections is not redialled in a tight loop
+            info.failures += 1
+            await asyncio.sleep(self.backoff(info.failures))
+
+    async def _keepalive(self, connection: PeerConnection) -> None:
+        while not connection.closed:
+            await asyncio.sleep(self.ping_interval)
+            if connection.oldest_ping_age() > self.ping_timeout:
+                await connection.close()
+                return
+            connection.ping()
@@ -0,0 +1,326 @@
+import asyncio
+import itertools
+import json
+import struct
+import time
+import zlib
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple, Union
+from serialization import U32, Buffer
+
+# Peer wire protocol. Every frame starts with a header of protocol version,
+# flags and body length. A message is a JSON header plus an optional binary
+# payload: its first frame body holds the length-prefixed JSON and as much
+# payload as fits, and large payloads continue in further frames flagged
+# FLAG_MORE on all but the last, so neither side has to hold them whole.
+PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct(">BBI")
+FLAG_COMPRESSED = 0x01
+FLAG_MORE = 0x02
+
+# Payloads are split into frames of this size
+CHUNK_SIZE = 256 * 1024
+MAX_FRAME_SIZE = 1024 * 1024
+# Largest payload read into memory at once; streamed payloads have no limit
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+# Frame bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 512
+# Messages buffered per peer before further ones to it are dropped
+DEFAULT_SEND_QUEUE = 256
+# Seconds a write may wait for the peer to drain before it is given up on
+DEFAULT_SEND_TIMEOUT = 10.0
+# Weight of each new ping in the smoothed latency
+LATENCY_SMOOTHING = 0.2
+
+Payload = Union[Buffer, Iterable[bytes]]
+
+
+class ProtocolError(ValueError):
+    """Raised when a peer sends something that is not a valid frame or message"""
+
+
+def _encode_frame(body: bytes, flags: int, compress: bool) -> bytes:
+    if compress and len(body) >= COMPRESS_MIN_SIZE:
+        compressed = zlib.compress(body, 1)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= FLAG_COMPRESSED
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, flags, len(body)) + body
+
+
+def _rechunk(payload: Payload) -> Iterator[bytes]:
+    """Regroup payload pieces of any size into CHUNK_SIZE chunks"""
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = (payload,)
+    buffer = bytearray()
+    for piece in payload:
+        buffer += piece
+        while len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer[:CHUNK_SIZE])
+            del buffer[:CHUNK_SIZE]
+    if buffer:
+        yield bytes(buffer)
+
+
+def encode_frames(header: dict, payload: Payload = b"", compress: bool = False) -> Iterator[bytes]:
+    """
+    Yield the frames of one message. payload is bytes or an iterable of byte
+    pieces that is only consumed as frames are taken.
+    """
+    head = json.dumps(header, separators=(',', ':')).encode()
+    if len(head) + U32.size > CHUNK_SIZE:
+        raise ProtocolError("Message header is too large")
+    body = U32.pack(len(head)) + head
+    for chunk in _rechunk(payload):
+        if len(body) + len(chunk) <= CHUNK_SIZE:
+            body += chunk
+            continue
+        yield _encode_frame(body, FLAG_MORE, compress)
+        body = chunk
+    yield _encode_frame(body, 0, compress)
+
+
+def _decode_body(flags: int, body: bytes) -> bytes:
+    if flags & FLAG_COMPRESSED:
+        decompressor = zlib.decompressobj()
+        try:
+            body = decompressor.decompress(body, MAX_FRAME_SIZE)
+        except zlib.error as e:
+            raise ProtocolError(f"Corrupt compressed frame: {e}")
+        if decompressor.unconsumed_tail:
+            raise ProtocolError("Compressed frame expands beyond the frame size limit")
+    return body
+
+
+class PeerMessage:
+    """
+    A received message. Its header is available at once; the payload is
+    read from the connection as it is consumed, either chunk by chunk with
+    chunks() or all at once with read().
+    """
+
+    def __init__(self, connection: 'PeerConnection', header: dict, first_chunk: bytes, more: bool):
+        self.connection = connection
+        self.header = header
+        self._first_chunk = first_chunk
+        self._more = more
+        self._consumed = False
+
+    @property
+    def type(self) -> str:
+        return self.header['type']
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        if self._consumed:
+            raise ProtocolError("Payload has already been read")
+        self._consumed = True
+        if self._first_chunk:
+            yield self._first_chunk
+        while self._more:
+            frame = await self.connection._read_frame()
+            if frame is None:
+                raise ProtocolError("Connection closed in the middle of a message")
+            flags, body = frame
+            self._more = bool(flags & FLAG_MORE)
+            yield body
+
+    async def read(self, max_size: int = MAX_MESSAGE_SIZE) -> bytes:
+        """The whole payload; raises ProtocolError if it exceeds max_size"""
+        data = bytearray()
+        async for chunk in self.chunks():
+            data += chunk
+            if len(data) > max_size:
+                raise ProtocolError("Message payload is too large")
+        return bytes(data)
+
+    async def discard(self) -> None:
+        """Skip whatever payload has not been read"""
+        if not self._consumed:
+            async for _ in self.chunks():
+                pass
+
+
+class PeerConnection:
+    """
+    One long-lived connection to a peer on the node's event loop.
+
+    Outgoing messages go through a bounded queue drained by a writer task,
+    so a slow peer never blocks the loop or the other peers: once its queue
+    is full, further messages to it are dropped and counted in `dropped`.
+    Large and lazily produced payloads are framed on the default executor,
+    one frame at a time, and written as the peer's socket drains. A peer
+    that does not drain within send_timeout is disconnected.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 max_queue: int = DEFAULT_SEND_QUEUE, inbound: bool = True, compress: bool = False,
+                 send_timeout: Optional[float] = DEFAULT_SEND_TIMEOUT):
+        self.reader = reader
+        self.writer = writer
+        self.inbound = inbound
+        self.compress = compress
+        self.send_timeout = send_timeout
+        # Smoothed ping round trip in seconds, once measured
+        self.latency: Optional[float] = None
+        self._pings: Dict[int, float] = {}
+        self._ping_ids = itertools.count()
+        self.address = writer.get_extra_info('peername')
+        self.sent = 0
+        self.received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.dropped = 0
+        self.closed = False
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self._writer_task: Optional[asyncio.Task] = None
+        self._current: Optional[PeerMessage] = None
+
+    def start(self) -> None:
+        """Start the writer task; must be called on the event loop"""
+        if self._writer_task is None:
+            self._writer_task = asyncio.get_event_loop().create_task(self._write_queued())
+
+    def send(self, header: dict, payload: Payload = b"") -> bool:
+        """Queue a message without waiting; returns False if it was dropped"""
+        return self._enqueue(header, payload)
+
+    def send_encoded(self, frames: bytes) -> bool:
+        """Queue a message already framed by encode_frames, such as one shared by a broadcast"""
+        return self._enqueue(None, frames)
+
+    def _enqueue(self, header: Optional[dict], payload: Payload) -> bool:
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait((header, payload))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    def ping(self) -> None:
+        """Send a ping; its pong is matched by pong_received"""
+        ping_id = next(self._ping_ids)
+        if self.send({'type': 'ping', 'id': ping_id}):
+            self._pings[ping_id] = time.monotonic()
+
+    def pong_received(self, ping_id) -> Optional[float]:
+        """Record the answer to one of our pings; returns its round trip"""
+        sent = self._pings.pop(ping_id, None)
+        if sent is None:
+            return None
+        rtt = time.monotonic() - sent
+        self.latency = rtt if self.latency is None else self.latency + LATENCY_SMOOTHING * (rtt - self.latency)
+        return rtt
+
+    def oldest_ping_age(self) -> float:
+        """Seconds the oldest unanswered ping has been waiting"""
+        return time.monotonic() - min(self._pings.values()) if self._pings else 0.0
+
+    def _write(self, data: bytes) -> None:
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+    async def _drain(self) -> None:
+        await asyncio.wait_for(self.writer.drain(), self.send_timeout)
+
+    async def _write_queued(self) -> None:
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                header, payload = await self._queue.get()
+                if header is None:
+                    self._write(payload)
+                elif isinstance(payload, (bytes, bytearray, memoryview)) and len(payload) <= CHUNK_SIZE:
+                    self._write(b"".join(encode_frames(header, payload, self.compress)))
+                else:
+                    frames = encode_frames(header, payload, self.compress)
+                    while True:
+                        frame = await loop.run_in_executor(None, next, frames, None)
+                        if frame is None:
+                            break
+                        self._write(frame)
+                        await self._drain()
+                await self._drain()
+                self.sent += 1
+        except asyncio.TimeoutError:
+            # Closing would wait to flush to a peer that is not reading
+            self.closed = True
+            self.writer.transport.abort()
+        except (ConnectionError, OSError):
+            self.closed = True
+            self.writer.close()
+        except Exception as e:
+            # A payload that failed part way leaves the stream unusable
+            print(f"Error sending to peer: {e}")
+            self.closed = True
+            self.writer.close()
+
+    async def _read_frame(self) -> Optional[Tuple[int, bytes]]:
+        try:
+            head = await self.reader.readexactly(FRAME_HEADER.size)
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise ProtocolError("Connection closed in the middle of a frame")
+        version, flags, length = FRAME_HEADER.unpack(head)
+        if version > PROTOCOL_VERSION:
+            raise ProtocolError(f"Unsupported protocol version {version}")
+        if length > MAX_FRAME_SIZE:
+            raise ProtocolError("Frame is too large")
+        try:
+            body = await self.reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            raise ProtocolError("Connection closed in the middle of a frame")
+        self.bytes_received += FRAME_HEADER.size + length
+        return flags, _decode_body(flags, body)
+
+    async def read_message(self) -> Optional[PeerMessage]:
+        """Next message from the peer, or None once it disconnects"""
+        if self._current is not None:
+            # Skip any payload the previous message's handler left unread
+            await self._current.discard()
+        frame = await self._read_frame()
+        if frame is None:
+            return None
+        flags, body = frame
+        if len(body) < U32.size:
+            raise ProtocolError("Frame does not start a message")
+        (head_length,) = U32.unpack_from(body, 0)
+        head_end = U32.size + head_length
+        try:
+            header = json.loads(body[U32.size:head_end])
+        except ValueError:
+            raise ProtocolError("Message header is not JSON")
+        if len(body) < head_end or not isinstance(header, dict) or 'type' not in header:
+            raise ProtocolError("Malformed message header")
+        self.received += 1
+        self._current = PeerMessage(self, header, body[head_end:], bool(flags & FLAG_MORE))
+        return self._current
+
+    async def __aiter__(self) -> AsyncIterator[PeerMessage]:
+        while True:
+            message = await self.read_message()
+            if message is None:
+                return
+            yield message
+
+    async def close(self) -> None:
+        self.closed = True
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def open_peer_connection(host: str, port: int, max_queue: int = DEFAULT_SEND_QUEUE,
+                               compress: bool = False,
+                               send_timeout: Optional[float] = DEFAULT_SEND_TIMEOUT) -> PeerConnection:
+    """Connect to a peer and start its writer task"""
+    reader, writer = await asyncio.open_connection(host, port)
+    connection = PeerConnection(reader, writer, max_queue, inbound=False, compress=compress,
+                                send_timeout=send_timeout)
+    connection.start()
+    return connection
@@ -0,0 +1,56 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+
+class TipCache:
+    """
+    Cache of rendered responses that are valid for one chain tip.
+
+    Entries are stored under the tip hash they were computed for; the first
+    lookup after the tip moves drops everything, so appending a block is the
+    only invalidation needed. Each entry carries a strong ETag derived from
+    its body.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.tip_hash: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def _check_tip(self, tip_hash: str) -> None:
+        if tip_hash != self.tip_hash:
+            self._entries.clear()
+            self.tip_hash = tip_hash
+
+    def get(self, key: Hashable, tip_hash: str) -> Optional[Tuple[bytes, str, str]]:
+        """Return (body, mimetype, etag) cached for this tip, or None"""
+        with self._lock:
+            self._check_tip(tip_hash)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, tip_hash: str, body: bytes, mimetype: str) -> Tuple[bytes, str, str]:
+        """Cache a body computed for tip_hash and return it with its ETag"""
+        entry = (body, mimetype, self.make_etag(body))
+        with self._lock:
+            # A response computed before the tip moved must not outlive it
+            if tip_hash == self.tip_hash:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
@@ -23,6 +23,7 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         print("\nShutting down node...")
+        node.stop()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
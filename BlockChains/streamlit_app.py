@@ -8,6 +8,7 @@ import time
 from blockchain import Blockchain
 from blockchain_db import BlockchainDB
 from transaction import TransactionProcessor
+from events import ChainSummary
 import networkx as nx
 from dotenv import load_dotenv
 
@@ -65,6 +66,14 @@ if None in (db, blockchain, tx_processor):
     st.error("Application failed to initialize properly. Please check your configuration.")
     st.stop()
 
+# Aggregates shared by every session; each run only folds in new blocks
+@st.cache_resource
+def init_summary():
+    return ChainSummary()
+
+summary = init_summary()
+summary.catch_up(db)
+
 # Set up the Streamlit page
 st.title("Blockchain Visualizer")
 
@@ -79,11 +88,10 @@ with tab1:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric("Total Blocks", len(blockchain.chain))
+        st.metric("Total Blocks", summary.total_blocks)
     
     with col2:
-        total_transactions = sum(len(block.transactions) for block in blockchain.chain)
-        st.metric("Total Transactions", total_transactions)
+        st.metric("Total Transactions", summary.total_transactions)
     
     with col3:
         st.metric("Current Difficulty", blockchain.difficulty)
@@ -92,12 +100,10 @@ with tab1:
     st.subheader("Transaction Volume Over Time")
     
     # Prepare data for the chart
-    volume_data = []
-    for block in blockchain.chain:
-        volume_data.append({
-            'timestamp': datetime.fromtimestamp(block.timestamp),
-            'transactions': len(block.transactions)
-        })
+    volume_data = [
+        {'timestamp': datetime.fromtimestamp(row['timestamp']), 'transactions': row['transactions']}
+        for row in summary.volume_rows
+    ]
     
     if volume_data:
         df = pd.DataFrame(volume_data)
@@ -146,22 +152,8 @@ with tab3:
     # Create network graph
     G = nx.DiGraph()
     
-    # Add nodes and edges
-    wallets = set()
-    transactions = []
-    
-    for block in blockchain.chain:
-        for tx in block.transactions:
-            wallets.add(tx.sender)
-            wallets.add(tx.recipient)
-            transactions.append((tx.sender, tx.recipient, tx.amount))
-    
-    # Add nodes
-    for wallet in wallets:
-        G.add_node(wallet)
-    
-    # Add edges
-    for sender, recipient, amount in transactions:
+    # Add an edge per sender/recipient pair, weighted by the total transferred
+    for (sender, recipient), amount in summary.flows.items():
         G.add_edge(sender, recipient, weight=amount)
     
     # Create Plotly figure
@@ -253,15 +245,25 @@ if st.sidebar.button("Refresh Data", use_container_width=True):
     st.session_state.last_refresh = time.time()
     st.experimental_rerun()
 
-# Automatic refresh using time-based check
-if time.time() - st.session_state.last_refresh > refresh_interval:
-    st.session_state.last_refresh = time.time()
-    st.experimental_rerun()
-
 # Footer
 st.markdown("""
     <div style='text-align: center; color: #666; padding: 20px;'>
         <p>Blockchain Visualizer v1.0</p>
         <p>Built with Streamlit 🎈</p>
     </div>
-""", unsafe_allow_html=True) 
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Wait for new blocks and rerun only when the chain has grown. Updating the
+# status line every second lets Streamlit interrupt the wait on user input.
+watch_status = st.sidebar.empty()
+next_check = time.time()
+while True:
+    if time.time() < next_check:
+        watch_status.caption(f"Up to date at block #{summary.last_index}")
+        time.sleep(1)
+        continue
+    next_check = time.time() + refresh_interval
+    _, tip_index = db.get_index_range()
+    if tip_index is not None and tip_index > summary.last_index:
+        st.session_state.last_refresh = time.time()
+        st.experimental_rerun() 
\ No newline at end of file
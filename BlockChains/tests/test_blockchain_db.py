@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from block import Block
+from blockchain import Blockchain
+from blockchain_db import BlockchainDB
+from transaction import Transaction
+
+
+class TestBlockchainDB(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmpdir.name, "chain.db")
+        self.db = BlockchainDB(self.db_file)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_bulk_load_mixes_encoded_and_legacy_rows(self):
+        """Blocks without a stored encoding are rebuilt from the transactions table"""
+        blockchain = Blockchain(difficulty=1, db=self.db)
+        blockchain.add_block([Transaction("Alice", "Bob", 5.0)])
+
+        # Simulate a row written before blocks carried their encoding
+        legacy = Block(2, [Transaction("Bob", "Charlie", 2.0), Transaction("Bob", "Dave", 1.0)],
+                       blockchain.get_latest_block().hash, timestamp=1700000000.0)
+        blockchain.chain.append(legacy)
+        with self.db._write_connection() as conn:
+            conn.execute('UPDATE blocks SET data = NULL WHERE block_index = 2')
+            conn.commit()
+        blockchain.add_block([Transaction("Charlie", "Alice", 1.0)])
+
+        loaded = list(self.db.iter_blocks())
+        self.assertEqual([b.index for b in loaded], [0, 1, 2, 3])
+        self.assertEqual([tx.recipient for tx in loaded[2].transactions], ["Charlie", "Dave"])
+        self.assertEqual(loaded[2].hash, legacy.hash)
+        self.assertEqual(loaded[2].calculate_hash(), legacy.hash)
+        self.assertEqual(len(loaded[3].transactions), 1)
+
+    def test_chain_view_keeps_a_bounded_window(self):
+        """Old blocks are evicted from memory and reloaded on demand"""
+        blockchain = Blockchain(difficulty=1, db=self.db, window_size=3)
+        for i in range(10):
+            blockchain.add_block([Transaction("Alice", f"User{i}", 1.0)])
+
+        reloaded = Blockchain(difficulty=1, db=BlockchainDB(self.db_file), window_size=3)
+        chain = reloaded.chain
+        self.assertEqual(len(chain), 11)
+        self.assertEqual(chain[-1].hash, blockchain.get_latest_block().hash)
+        self.assertEqual([b.index for b in chain[2:5]], [2, 3, 4])
+        self.assertEqual(chain.get_by_hash(blockchain.chain[4].hash).index, 4)
+        for i in range(10):
+            chain[i]
+        self.assertLessEqual(len(chain._window), 3)
+        self.assertEqual([b.index for b in chain], list(range(11)))
+        self.assertTrue(reloaded.is_chain_valid())
+        self.assertEqual(reloaded.ledger.get_balance("User9"), 1.0)
+
+    def test_chain_view_is_shared_between_threads(self):
+        """Concurrent reads that keep evicting from a small window stay consistent"""
+        blockchain = Blockchain(difficulty=1, db=self.db, window_size=2)
+        for i in range(20):
+            blockchain.add_block([Transaction("Alice", f"User{i}", 1.0)])
+        chain = Blockchain(difficulty=1, db=BlockchainDB(self.db_file), window_size=2).chain
+        expected = [block.hash for block in blockchain.chain]
+
+        errors = []
+
+        def read(offset):
+            try:
+                for i in range(300):
+                    position = (i * 7 + offset) % len(expected)
+                    if chain[position].hash != expected[position]:
+                        errors.append(position)
+                    chain.get_by_hash(expected[-position - 1])
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=read, args=(offset,)) for offset in range(8)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join(timeout=30)
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(chain._window), 2)
+
+    def test_readers_do_not_wait_for_the_writer(self):
+        """Reads on other threads proceed while the writer connection is held"""
+        blockchain = Blockchain(difficulty=1, db=self.db)
+        blockchain.add_block([Transaction("Alice", "Bob", 5.0)])
+
+        results = []
+        reader = threading.Thread(target=lambda: results.append(self.db.get_index_range()))
+        with self.db._write_connection():
+            reader.start()
+            reader.join(timeout=5)
+        self.assertEqual(results, [(0, 1)])
+        self.assertEqual(len(self.db._readers), 2)
+
+    def test_group_commit_flush_barrier(self):
+        """Queued blocks are committed in groups and visible after flush"""
+        db = BlockchainDB(os.path.join(self.tmpdir.name, "group.db"), group_commit=True, group_size=4)
+        blockchain = Blockchain(difficulty=1, db=db)
+        for i in range(10):
+            blockchain.add_block([Transaction("Alice", f"User{i}", 1.0)])
+        db.flush()
+
+        reader = BlockchainDB(db.db_file)
+        self.assertEqual(reader.get_index_range(), (0, 10))
+        self.assertEqual([b.hash for b in reader.iter_blocks()], [b.hash for b in blockchain.chain])
+        reader.close()
+        db.close()
+
+    def test_save_errors_are_raised(self):
+        """Failed writes roll back and raise instead of being swallowed"""
+        blockchain = Blockchain(difficulty=1, db=self.db)
+        genesis = blockchain.chain[0]
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.save_block(genesis)
+
+        db = BlockchainDB(os.path.join(self.tmpdir.name, "group.db"), group_commit=True)
+        db.save_block(genesis)
+        db.save_block(genesis)
+        with self.assertRaises(sqlite3.IntegrityError):
+            db.flush()
+        db.close()
+
+    def test_transaction_queries_page_by_keyset(self):
+        """Address history and time windows page through indexed keyset cursors"""
+        blockchain = Blockchain(difficulty=1, db=self.db)
+        for i in range(5):
+            blockchain.add_block([
+                Transaction("Alice", "Bob", 1.0, timestamp=1700000000.0 + i),
+                Transaction("Bob", "Alice", 0.5, timestamp=1700000000.5 + i),
+                Transaction("Charlie", "Dave", 2.0, timestamp=1700000000.5 + i)
+            ])
+
+        pages = []
+        cursor = None
+        while True:
+            page = self.db.get_address_history("Alice", limit=4, before_id=cursor)
+            pages.append(page)
+            if len(page) < 4:
+                break
+            cursor = page[-1]['id']
+        history = [tx for page in pages for tx in page]
+        self.assertEqual(len(history), 10)
+        self.assertEqual([tx['id'] for tx in history], sorted((tx['id'] for tx in history), reverse=True))
+        self.assertTrue(all("Alice" in (tx['sender'], tx['recipient']) for tx in history))
+
+        first = self.db.get_transactions_in_window(1700000001.0, 1700000003.0, limit=3)
+        rest = self.db.get_transactions_in_window(1700000001.0, 1700000003.0, limit=10,
+                                                  after=(first[-1]['timestamp'], first[-1]['id']))
+        window = first + rest
+        self.assertEqual(len(window), 6)
+        self.assertTrue(all(1700000001.0 <= tx['timestamp'] < 1700000003.0 for tx in window))
+
+        tx = blockchain.chain[3].transactions[2]
+        found = self.db.get_transaction_by_hash(tx.calculate_hash())
+        self.assertEqual((found['block_index'], found['recipient']), (3, "Dave"))
+        self.assertIsNone(self.db.get_transaction_by_hash("00" * 32))
+
+    def test_legacy_transactions_get_hashes(self):
+        """Opening a database without tx_hash adds the column and backfills it"""
+        legacy_file = os.path.join(self.tmpdir.name, "legacy.db")
+        conn = sqlite3.connect(legacy_file)
+        conn.execute('CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, block_index INTEGER, '
+                     'sender TEXT, recipient TEXT, amount REAL, timestamp REAL)')
+        conn.execute('INSERT INTO transactions (block_index, sender, recipient, amount, timestamp) '
+                     'VALUES (1, "Alice", "Bob", 5.0, 1700000000.0)')
+        conn.commit()
+        conn.close()
+
+        db = BlockchainDB(legacy_file)
+        tx_hash = Transaction("Alice", "Bob", 5.0, 1700000000.0).calculate_hash()
+        self.assertEqual(db.get_transaction_by_hash(tx_hash)['sender'], "Alice")
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
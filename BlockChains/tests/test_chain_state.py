@@ -0,0 +1,73 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from blockchain import Blockchain
+from blockchain_db import BlockchainDB
+from chain_state import ChainStateOwner, SharedChainState, SnapshotReader, write_snapshot
+from signatures import KeyPair
+from transaction import Transaction
+
+
+class TestChainState(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.tmpdir.name, "chain.snapshot")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_reader_remaps_replaced_snapshots(self):
+        """Readers see the new tip and balances once the snapshot is replaced"""
+        blockchain = Blockchain(difficulty=1)
+        blockchain.add_block([Transaction("System", "Alice", 10.0)])
+        write_snapshot(self.snapshot_path, blockchain)
+
+        reader = SnapshotReader(self.snapshot_path)
+        snapshot = reader.current()
+        self.assertEqual((snapshot.length, snapshot.tip_index), (2, 1))
+        self.assertEqual(snapshot.tip_hash, blockchain.get_latest_block().hash)
+        self.assertIs(reader.current(), snapshot)
+
+        blockchain.add_block([Transaction("Alice", "Bob", 2.5)])
+        write_snapshot(self.snapshot_path, blockchain)
+        snapshot = reader.current()
+        self.assertEqual(snapshot.length, 3)
+        self.assertEqual(snapshot.balances, {"System": -10 * 10**8, "Alice": 7.5 * 10**8, "Bob": 2.5 * 10**8})
+
+    def test_workers_share_the_owners_chain(self):
+        """Submissions forwarded by a worker are mined by the owner and visible to every worker"""
+        db_file = os.path.join(self.tmpdir.name, "chain.db")
+        address = os.path.join(self.tmpdir.name, "owner.sock")
+        owner = ChainStateOwner(db_file, self.snapshot_path, address, b"secret", difficulty=1,
+                                block_interval=60, block_max_transactions=2)
+        alice = KeyPair(bytes(31) + b"\x01")
+        owner.blockchain.mine_pending_transactions(alice.address)
+        threading.Thread(target=owner.serve_forever, daemon=True).start()
+        while not os.path.exists(address):
+            time.sleep(0.01)
+
+        workers = [SharedChainState(self.snapshot_path, address, b"secret") for _ in range(2)]
+        transfers = [Transaction(alice.address, recipient, 1.0) for recipient in ("Bob", "Charlie")]
+        for transaction in transfers:
+            transaction.sign(alice)
+        tx_hash = workers[0].submit(transfers[0])
+        self.assertTrue(workers[1].is_pending(tx_hash))
+        workers[1].submit(transfers[1])
+
+        deadline = time.monotonic() + 5
+        while workers[1].status()['length'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(workers[0].status(), workers[1].status())
+        self.assertEqual(workers[0].get_balance("Charlie"), 1.0)
+
+        reader_db = BlockchainDB(db_file)
+        self.assertEqual(reader_db.get_transaction_by_hash(tx_hash)['block_index'], 2)
+        self.assertFalse(workers[0].is_pending(tx_hash))
+        reader_db.close()
+        owner.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+from block import Block
+from blockchain import Blockchain
+from blockchain_db import BlockchainDB
+from chain_sync import (
+    BlockHeader, ChainSync, SyncError, decode_headers, encode_headers, header_record, verify_headers
+)
+from network_node import BlockchainNode
+from serialization import encode_chain
+from transaction import COINBASE_SENDER, Transaction
+
+
+def build_chain(length: int, difficulty: int = 1) -> Blockchain:
+    blockchain = Blockchain(difficulty=difficulty)
+    for i in range(length - 1):
+        blockchain.add_block([Transaction(COINBASE_SENDER, f"Miner{i % 3}", 10.0)])
+    return blockchain
+
+
+def copy_prefix(origin: Blockchain, length: int, db: BlockchainDB = None) -> Blockchain:
+    """A chain holding origin's first `length` blocks, as a lagging node would"""
+    if db is not None:
+        db.save_blocks([Block.from_bytes(block.to_bytes()) for block in origin.chain[:length]])
+        return Blockchain(difficulty=origin.difficulty, db=db)
+    blockchain = Blockchain(difficulty=origin.difficulty)
+    blockchain.chain = [Block.from_bytes(block.to_bytes()) for block in origin.chain[:length]]
+    blockchain.ledger.rebuild(blockchain.chain)
+    return blockchain
+
+
+def headers_of(blocks) -> list:
+    return decode_headers(encode_headers(block.to_bytes() for block in blocks))
+
+
+async def run_inline(func, *args):
+    return func(*args)
+
+
+class TestHeaders(unittest.TestCase):
+    def setUp(self):
+        self.blockchain = build_chain(6)
+        self.headers = headers_of(self.blockchain.chain)
+
+    def test_headers_round_trip(self):
+        block = self.blockchain.chain[3]
+        header = self.headers[3]
+        self.assertEqual(header, BlockHeader.from_block(block))
+        self.assertEqual(header.data, header_record(block.to_bytes()))
+        self.assertEqual((header.index, header.previous_hash, header.hash, header.difficulty),
+                         (3, block.previous_hash, block.hash, 1))
+
+    def test_valid_headers_verify(self):
+        self.assertTrue(verify_headers(self.headers[1:], self.headers[0], min_difficulty=1))
+
+    def test_broken_linkage_is_rejected(self):
+        self.assertFalse(verify_headers(self.headers[2:], self.headers[0], min_difficulty=1))
+
+    def test_tampered_header_is_rejected(self):
+        data = bytearray(self.headers[2].data)
+        # Flip a bit of the nonce, which the stated hash no longer matches
+        data[87] ^= 1
+        headers = list(self.headers)
+        headers[2] = BlockHeader.decode(bytes(data))
+        self.assertFalse(verify_headers(headers[1:], headers[0], min_difficulty=1))
+
+    def test_insufficient_work_is_rejected(self):
+        self.assertFalse(verify_headers(self.headers[1:], self.headers[0], min_difficulty=2))
+
+
+class TestChainSync(unittest.TestCase):
+    def setUp(self):
+        self.origin = build_chain(40)
+        self.headers = headers_of(self.origin.chain)
+
+    def sync(self, serve, target: Blockchain, peers):
+        async def request(peer, header, timeout):
+            return serve(peer, header)
+
+        async def apply_blocks(blocks):
+            return target.add_blocks_from_peer(blocks)
+
+        chain_sync = ChainSync(request, apply_blocks, run_inline, header_batch=16, window=5, max_windows_ahead=3)
+        tip = BlockHeader.from_block(target.get_latest_block())
+        return asyncio.run(chain_sync.run(peers, tip, target.difficulty))
+
+    def serve(self, peer, header):
+        blocks = self.origin.chain[header['start']:header['start'] + header['count']]
+        if header['type'] == 'getheaders':
+            return encode_headers(block.to_bytes() for block in blocks)
+        if peer == "forger":
+            blocks = [Block(block.index, [], block.previous_hash) for block in blocks]
+        return encode_chain(blocks)
+
+    def test_windows_from_a_failing_peer_go_to_the_others(self):
+        target = copy_prefix(self.origin, 1)
+        self.assertEqual(self.sync(self.serve, target, ["honest", "forger"]), 39)
+        self.assertEqual([block.hash for block in target.chain], [block.hash for block in self.origin.chain])
+        self.assertEqual(target.ledger.get_balance("Miner0"), self.origin.ledger.get_balance("Miner0"))
+
+    def test_failed_peer_gets_no_more_windows(self):
+        requests = []
+
+        def serve(peer, header):
+            if header['type'] == 'getblocks':
+                requests.append(peer)
+            return self.serve(peer, header)
+
+        target = copy_prefix(self.origin, 1)
+        self.assertEqual(self.sync(serve, target, ["forger", "honest"]), 39)
+        # Both of the forger's downloads stop once one of them fails
+        self.assertEqual(requests.count("forger"), 1)
+
+    def test_sync_fails_when_no_peer_serves_the_blocks(self):
+        target = copy_prefix(self.origin, 10)
+        with self.assertRaises(SyncError):
+            self.sync(self.serve, target, ["forger"])
+        self.assertEqual(len(target.chain), 10)
+
+    def test_headers_from_another_fork_are_ignored(self):
+        target = build_chain(3)
+        self.assertEqual(self.sync(self.serve, target, ["honest"]), 0)
+        self.assertEqual(len(target.chain), 3)
+
+
+class TestNodeSync(unittest.TestCase):
+    def test_lagging_node_catches_up_from_two_peers(self):
+        origin = build_chain(120)
+        servers = [BlockchainNode(0, copy_prefix(origin, length), host='127.0.0.1') for length in (120, 70)]
+        target_db = BlockchainDB(":memory:")
+        node = BlockchainNode(0, copy_prefix(origin, 5, target_db), host='127.0.0.1')
+        node.chain_sync.header_batch = 32
+        node.chain_sync.window = 10
+        try:
+            for server in servers:
+                server.start()
+            node.start()
+            for server in servers:
+                node.connect_to_peer('127.0.0.1', server.port)
+            self.assertEqual(node.sync(timeout=30), 115)
+            self.assertEqual(node.sync(timeout=30), 0)
+        finally:
+            node.stop(timeout=5)
+            for server in servers:
+                server.stop(timeout=5)
+
+        self.assertEqual(node.blockchain.get_latest_block().hash, origin.get_latest_block().hash)
+        # Every block was persisted
+        self.assertEqual(target_db.get_index_range(), (0, 119))
+        self.assertTrue(node.blockchain.is_chain_valid())
+        self.assertTrue(node.blockchain.verify_ledger())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from blockchain import Blockchain
+from blockchain_db import BlockchainDB
+from events import ChainSummary, EventBroadcaster, TooManySubscribers, block_event, format_sse
+from transaction import Transaction
+
+
+class TestEventBroadcaster(unittest.TestCase):
+    def setUp(self):
+        self.events = EventBroadcaster(history_size=4, max_events_per_client=3)
+
+    def test_every_subscriber_gets_each_event(self):
+        first, second = self.events.subscribe(), self.events.subscribe()
+        self.events.publish('block', {'index': 1})
+        self.assertEqual(first.get(timeout=0), [(1, 'block', {'index': 1})])
+        self.assertEqual(second.get(timeout=0), [(1, 'block', {'index': 1})])
+        first.close()
+        self.assertEqual(self.events.subscriber_count, 1)
+
+    def test_subscribers_are_capped(self):
+        events = EventBroadcaster(max_subscribers=2)
+        first = events.subscribe()
+        events.subscribe()
+        with self.assertRaises(TooManySubscribers):
+            events.subscribe()
+        # A closed stream frees its place
+        first.close()
+        events.subscribe()
+        self.assertEqual(events.subscriber_count, 2)
+
+    def test_slow_client_is_told_to_resync(self):
+        """A full buffer drops the oldest events instead of blocking the publisher"""
+        subscription = self.events.subscribe()
+        for i in range(5):
+            self.events.publish('transaction', {'n': i})
+        events = subscription.get(timeout=0)
+        self.assertEqual(events[0], (None, 'resync', {'dropped': 2}))
+        self.assertEqual([data['n'] for _, _, data in events[1:]], [2, 3, 4])
+        self.assertEqual(subscription.get(timeout=0), [])
+
+    def test_reconnect_replays_missed_events(self):
+        for i in range(3):
+            self.events.publish('block', {'index': i})
+        replayed = self.events.subscribe(last_event_id=1).get(timeout=0)
+        self.assertEqual([event_id for event_id, _, _ in replayed], [2, 3])
+
+        for i in range(3, 6):
+            self.events.publish('block', {'index': i})
+        # Events 2 and older have left the history, so replay is not enough
+        stale = self.events.subscribe(last_event_id=1).get(timeout=0)
+        self.assertEqual(stale[0][1], 'resync')
+
+    def test_sse_format(self):
+        self.assertEqual(format_sse((7, 'block', {'index': 1})), 'id: 7\nevent: block\ndata: {"index":1}\n\n')
+        self.assertEqual(format_sse((None, 'resync', {})), 'event: resync\ndata: {}\n\n')
+
+
+class TestChainSummary(unittest.TestCase):
+    def test_catch_up_only_reads_new_blocks(self):
+        db = BlockchainDB(":memory:")
+        blockchain = Blockchain(difficulty=1, db=db)
+        blockchain.add_block([Transaction("Alice", "Bob", 2.0)])
+
+        summary = ChainSummary()
+        self.assertEqual(summary.catch_up(db), 2)
+        blockchain.add_block([Transaction("Alice", "Bob", 3.0), Transaction("Bob", "Carol", 1.0)])
+        self.assertEqual(summary.catch_up(db), 1)
+        self.assertEqual(summary.catch_up(db), 0)
+
+        self.assertEqual((summary.total_blocks, summary.total_transactions), (3, 3))
+        self.assertEqual(summary.flows, {("Alice", "Bob"): 5.0, ("Bob", "Carol"): 1.0})
+
+        # Pushed events and catch-up agree, so neither double counts
+        summary.apply(block_event(blockchain.get_latest_block()))
+        self.assertEqual(summary.total_transactions, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
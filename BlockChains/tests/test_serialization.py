@@ -0,0 +1,94 @@
+import unittest
+from block import Block
+from transaction import Transaction
+from blockchain_db import BlockchainDB
+from serialization import (
+    FORMAT_VERSION, ChainStreamDecoder, SerializationError, encode_chain, decode_chain
+)
+
+
+class TestSerialization(unittest.TestCase):
+    def make_block(self) -> Block:
+        transactions = [
+            Transaction("Alice", "Bob", 50.0, signature="abc123"),
+            Transaction("Bob", "Zoë", 0.1)
+        ]
+        block = Block(1, transactions, "0" * 64, timestamp=1700000000.25)
+        block.mine_block(2)
+        return block
+
+    def test_transaction_round_trip(self):
+        """A transaction survives encoding with the same hash and fields"""
+        tx = Transaction("Alice", "Bob", 12.34567891, signature="sig")
+        decoded = Transaction.from_bytes(memoryview(tx.to_bytes()))
+
+        self.assertEqual(decoded.sender, tx.sender)
+        self.assertEqual(decoded.amount, tx.amount)
+        self.assertEqual(decoded.signature, "sig")
+        self.assertEqual(decoded.calculate_hash(), tx.calculate_hash())
+
+    def test_block_round_trip(self):
+        """A decoded block keeps its header, difficulty and transactions"""
+        block = self.make_block()
+        decoded = Block.from_bytes(block.to_bytes())
+
+        self.assertEqual(decoded.hash, block.hash)
+        self.assertEqual(decoded.calculate_hash(), block.hash)
+        self.assertEqual(decoded.merkle_root, decoded.compute_merkle_root())
+        self.assertEqual(decoded.difficulty, 2)
+        self.assertEqual(len(decoded.transactions), 2)
+
+    def test_genesis_previous_hash(self):
+        """The genesis "0" previous hash round-trips unchanged"""
+        genesis = Block(0, [], "0")
+        self.assertEqual(Block.from_bytes(genesis.to_bytes()).previous_hash, "0")
+
+    def test_chain_snapshot(self):
+        """A chain snapshot decodes to the same blocks"""
+        blocks = [self.make_block(), Block(2, [], "0" * 64)]
+        decoded = decode_chain(encode_chain(blocks))
+        self.assertEqual([b.hash for b in decoded], [b.hash for b in blocks])
+
+    def test_chain_stream_decoder(self):
+        """A snapshot fed in small chunks yields each block once it is complete"""
+        blocks = [self.make_block(), Block(2, [], "0" * 64)]
+        data = encode_chain(blocks)
+        decoder = ChainStreamDecoder()
+        decoded = []
+        for i in range(0, len(data), 7):
+            decoded.extend(decoder.feed(data[i:i + 7]))
+        self.assertTrue(decoder.done)
+        self.assertEqual([b.hash for b in decoded], [b.hash for b in blocks])
+
+    def test_rejects_newer_version(self):
+        """Encodings from a newer format version are refused"""
+        data = bytearray(self.make_block().to_bytes())
+        data[0] = FORMAT_VERSION + 1
+        with self.assertRaises(SerializationError):
+            Block.from_bytes(data)
+
+    def test_rejects_truncated_encodings(self):
+        """Cutting an encoding short raises SerializationError at every length"""
+        block = self.make_block()
+        data = block.to_bytes()
+        for length in range(len(data)):
+            with self.assertRaises(SerializationError):
+                Block.from_bytes(data[:length])
+        tx = block.transactions[0].to_bytes()
+        for length in range(len(tx)):
+            with self.assertRaises(SerializationError):
+                Transaction.from_bytes(tx[:length])
+
+    def test_database_stores_encoding(self):
+        """Blocks saved to SQLite decode from their stored encoding"""
+        db = BlockchainDB(":memory:")
+        block = self.make_block()
+        db.save_block(block)
+
+        stored = db.get_block(1)
+        self.assertEqual(stored['hash'], block.hash)
+        self.assertEqual(stored['transactions'][0].signature, "abc123")
+
+
+if __name__ == '__main__':
+    unittest.main()
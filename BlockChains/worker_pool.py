@@ -0,0 +1,36 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+class WorkerPool:
+    """
+    Base for engines that spread work over worker processes. The pool is
+    started on first use and kept until shutdown(), so its start-up cost is
+    paid once rather than on every call; small jobs that would not repay
+    even a round trip to it should run in-process instead.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor
+
+    def shutdown(self) -> None:
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()